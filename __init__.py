@@ -32,18 +32,57 @@ TODO:
 # reload everything
 if "bpy" in locals():
 	import imp
+	if 'lazy' in locals():
+		imp.reload(lazy)
+	if 'core' in locals():
+		imp.reload(core)
+	if 'geometry' in locals():
+		imp.reload(geometry)
+	if 'writer' in locals():
+		imp.reload(writer)
+	if 'lod' in locals():
+		imp.reload(lod)
+	if 'chunks' in locals():
+		imp.reload(chunks)
+	if 'parallel' in locals():
+		imp.reload(parallel)
+	if 'cache' in locals():
+		imp.reload(cache)
+	if 'stats' in locals():
+		imp.reload(stats)
+	if 'tasks' in locals():
+		imp.reload(tasks)
+	if 'evaluated' in locals():
+		imp.reload(evaluated)
 	if 'export_dnm' in locals():
 		imp.reload(export_dnm)
+	if 'watch' in locals():
+		imp.reload(watch)
 	if 'export_srf' in locals():
 		imp.reload(export_srf)
+	if 'export_chunks' in locals():
+		imp.reload(export_chunks)
 	if 'explode_srf' in locals():
 		imp.reload(explode_srf)	
+	if 'export_variants' in locals():
+		imp.reload(export_variants)
+	if 'reader' in locals():
+		imp.reload(reader)
+	if 'import_srf' in locals():
+		imp.reload(import_srf)
+	if 'import_dnm' in locals():
+		imp.reload(import_dnm)
 
 import bpy
 
+from . import evaluated, watch
 from .export_dnm import ExportDNM
 from .export_srf import ExportSRF
+from .export_chunks import ExportChunkedDNM
 from .explode_srf import ExplodeSRF
+from .export_variants import ExportVariants
+from .import_srf import ImportSRF
+from .import_dnm import ImportDNM, ImportDNMParts
 # Make game property visual
 # from .space_view3d_game_props_visualiser import 
 
@@ -56,6 +95,11 @@ class VIEW3D_PT_ysfs_export_dnm(bpy.types.Panel):
     bl_category = "YSFS 2.0"
     def draw(self, context):
         self.layout.operator(ExportDNM.bl_idname, text = "DNM Model (.dnm)")
+        self.layout.prop(context.scene, "ysfs_watch_path", text = "")
+        if watch.state.running:
+            self.layout.operator(watch.WatchDNM.bl_idname, text = "Stop Auto Export", depress = True)
+        else:
+            self.layout.operator(watch.WatchDNM.bl_idname, text = "Auto Export")
 
 class VIEW3D_PT_ysfs_export_srf(bpy.types.Panel):
     bl_label = "Export one selected object"
@@ -64,6 +108,7 @@ class VIEW3D_PT_ysfs_export_srf(bpy.types.Panel):
     bl_category = "YSFS 2.0"
     def draw(self, context):
         self.layout.operator(ExportSRF.bl_idname, text = "SURF Model (.srf)")
+        self.layout.operator(ExportChunkedDNM.bl_idname, text = "Chunked DNM (.dnm)")
         
 class VIEW3D_PT_ysfs_explode_srf(bpy.types.Panel):
     bl_label = "Export all as parts"
@@ -72,6 +117,17 @@ class VIEW3D_PT_ysfs_explode_srf(bpy.types.Panel):
     bl_category = "YSFS 2.0"    
     def draw(self, context):
         self.layout.operator(ExplodeSRF.bl_idname, text = "DNM Parts (.srf)")
+        self.layout.operator(ExportVariants.bl_idname, text = "DNM, Parts and Merged SRF")
+
+class VIEW3D_PT_ysfs_import_srf(bpy.types.Panel):
+    bl_label = "Import model"
+    bl_space_type = "VIEW_3D"
+    bl_region_type = "TOOLS"
+    bl_category = "YSFS 2.0"
+    def draw(self, context):
+        self.layout.operator(ImportDNM.bl_idname, text = "DNM Model (.dnm)")
+        self.layout.operator(ImportSRF.bl_idname, text = "SURF Model (.srf)")
+        self.layout.operator(ImportDNMParts.bl_idname, text = "Load Part Geometry")
 
 # Menu Button
 def menu_func_export_dnm(self, context):
@@ -80,23 +136,47 @@ def menu_func_export_dnm(self, context):
 def menu_func_export_srf(self, context):
     self.layout.operator(ExportSRF.bl_idname, text = "SURF Model (.srf)")
     
+def menu_func_export_chunks(self, context):
+    self.layout.operator(ExportChunkedDNM.bl_idname, text = "Chunked DNM (.dnm)")
+
 def menu_func_explode_srf(self, context):
     self.layout.operator(ExplodeSRF.bl_idname, text = "DNM Parts (.srf)")
 
+def menu_func_export_variants(self, context):
+    self.layout.operator(ExportVariants.bl_idname, text = "DNM, Parts and Merged SRF (.dnm)")
+
+def menu_func_import_dnm(self, context):
+    self.layout.operator(ImportDNM.bl_idname, text = "DNM Model (.dnm)")
+
+def menu_func_import_srf(self, context):
+    self.layout.operator(ImportSRF.bl_idname, text = "SURF Model (.srf)")
+
 
 # Regist
 def register():
     bpy.utils.register_module(__name__)
     bpy.types.INFO_MT_file_export.append(menu_func_export_dnm)
     bpy.types.INFO_MT_file_export.append(menu_func_export_srf)
+    bpy.types.INFO_MT_file_export.append(menu_func_export_chunks)
     bpy.types.INFO_MT_file_export.append(menu_func_explode_srf)
+    bpy.types.INFO_MT_file_export.append(menu_func_export_variants)
+    bpy.types.INFO_MT_file_import.append(menu_func_import_dnm)
+    bpy.types.INFO_MT_file_import.append(menu_func_import_srf)
+    evaluated.register()
+    watch.register()
         
 # Unregist
 def unregister():
     bpy.utils.unregister_module(__name__)
     bpy.types.INFO_MT_file_export.remove(menu_func_export_dnm)
     bpy.types.INFO_MT_file_export.remove(menu_func_export_srf)
+    bpy.types.INFO_MT_file_export.remove(menu_func_export_chunks)
     bpy.types.INFO_MT_file_export.remove(menu_func_explode_srf)
+    bpy.types.INFO_MT_file_export.remove(menu_func_export_variants)
+    bpy.types.INFO_MT_file_import.remove(menu_func_import_dnm)
+    bpy.types.INFO_MT_file_import.remove(menu_func_import_srf)
+    evaluated.unregister()
+    watch.unregister()
     
 if __name__ == "__main__":
     register()
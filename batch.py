@@ -0,0 +1,182 @@
+# ========================================
+# YSFS 2.0 - Batch Conversion
+# Convert many .blend files without the UI:
+#   blender --background --python batch.py -- --format DNM --jobs 4 models/*.blend
+# Every file is exported by its own Blender process running the same
+# operators as File > Export (ExportDNM, ExportSRF, ExplodeSRF, ...).
+# ========================================
+import os
+import sys
+import glob
+import json
+import time
+import argparse
+import tempfile
+import traceback
+import subprocess
+import concurrent.futures
+
+# Format -> (operator, extension)
+FORMATS = {
+    'DNM': ('dnm', '.dnm'),
+    'SRF': ('srf', '.srf'),
+    'CHUNKS': ('chunkdnm', '.dnm'),
+    'EXPLODE': ('expsrf', '.srf'),
+    'VARIANTS': ('variants', '.dnm'),
+}
+# Formats writing a folder of files per .blend
+FOLDERS = ('EXPLODE', 'VARIANTS')
+
+def arguments(argv):
+    parser = argparse.ArgumentParser(prog='batch.py', description='Convert .blend files to YSFlight DNM/SRF.')
+    parser.add_argument('files', nargs='+', help='.blend files or glob patterns')
+    parser.add_argument('--format', default='DNM', type=str.upper, choices=sorted(FORMATS))
+    parser.add_argument('--output', help='output folder (default: next to each .blend)')
+    parser.add_argument('--jobs', type=int, default=os.cpu_count() or 1, help='Blender processes at once')
+    parser.add_argument('--timeout', type=float, default=None, help='seconds allowed per file')
+    parser.add_argument('--summary', help='write the summary as JSON')
+    parser.add_argument('--blender', help='Blender executable (default: the running one)')
+    # Used by the worker processes only
+    parser.add_argument('--convert', help=argparse.SUPPRESS)
+    parser.add_argument('--result', help=argparse.SUPPRESS)
+    return parser.parse_args(argv)
+
+# Output file of a .blend (exploded parts go into a folder per file)
+def target(blend, fmt, output=None):
+    stem = os.path.splitext(os.path.basename(blend))[0]
+    folder = output or os.path.dirname(os.path.abspath(blend))
+    if fmt in FOLDERS:
+        folder = os.path.join(folder, stem)
+    return os.path.join(folder, stem + FORMATS[fmt][1])
+
+# Size of everything a conversion wrote
+def output_bytes(path, fmt):
+    if fmt in FOLDERS:
+        folder = os.path.dirname(path)
+        return sum(os.path.getsize(p) for pattern in ('*.srf', '*.dnm') for p in glob.glob(os.path.join(folder, pattern)))
+    return os.path.getsize(path)
+
+# ==============================
+# Worker (inside the Blender process of one file)
+# ==============================
+def convert(args):
+    result = {'status': 'FAILED', 'error': None}
+    try:
+        import bpy
+        # Operators of this add-on (registered already if it is enabled)
+        addon = os.path.dirname(os.path.abspath(__file__))
+        name = os.path.basename(addon)
+        if name not in sys.modules:
+            sys.path.insert(0, os.path.dirname(addon))
+            __import__(name).register()
+
+        filepath = args.convert
+        operator = getattr(bpy.ops.export_model, FORMATS[args.format][0])
+        status = operator(filepath=filepath)
+        if 'FINISHED' in status:
+            result['status'] = 'FINISHED'
+        else:
+            result['error'] = 'operator returned {}'.format(sorted(status))
+    except Exception:
+        result['error'] = traceback.format_exc()
+    with open(args.result, 'w') as fp:
+        json.dump(result, fp)
+
+# ==============================
+# Controller
+# ==============================
+def run(blender, blend, fmt, output, timeout):
+    path = target(blend, fmt, output)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    fd, result_path = tempfile.mkstemp(prefix='ysfs_batch_', suffix='.json')
+    os.close(fd)
+    entry = {'file': blend, 'output': path, 'status': 'FAILED', 'error': None, 'bytes': 0}
+    start = time.perf_counter()
+    try:
+        command = [blender, '--background', '--factory-startup', blend,
+                   '--python', os.path.abspath(__file__), '--',
+                   '--format', fmt, '--convert', path, '--result', result_path, blend]
+        # subprocess.run needs Python 3.5 (Blender 2.75-2.77 ship 3.4)
+        process = subprocess.Popen(command, stdout=subprocess.PIPE, stderr=subprocess.STDOUT)
+        try:
+            stdout = process.communicate(timeout=timeout)[0]
+        except subprocess.TimeoutExpired:
+            process.kill()
+            process.communicate()
+            raise
+        try:
+            with open(result_path) as fp:
+                result = json.load(fp)
+        except ValueError:
+            result = {'status': 'FAILED', 'error': 'Blender exited with {:d}:\n{}'.format(
+                process.returncode, stdout.decode('utf-8', 'replace')[-2000:])}
+        entry.update(result)
+        if entry['status'] == 'FINISHED':
+            entry['bytes'] = output_bytes(path, fmt)
+    except OSError as error:
+        entry['status'] = 'FAILED'
+        entry['error'] = str(error)
+    except subprocess.TimeoutExpired:
+        entry['error'] = 'timed out after {:.0f}s'.format(timeout)
+    finally:
+        os.remove(result_path)
+    entry['seconds'] = time.perf_counter() - start
+    return entry
+
+def main(args):
+    # Blender expands no globs itself, shells on Windows do neither
+    files = []
+    for pattern in args.files:
+        matches = sorted(glob.glob(pattern)) if glob.has_magic(pattern) else [pattern]
+        files.extend(m for m in matches if m not in files)
+    if args.blender:
+        blender = args.blender
+    else:
+        try:
+            import bpy
+            blender = bpy.app.binary_path
+        except ImportError:
+            blender = 'blender'
+
+    start = time.perf_counter()
+    entries = []
+    with concurrent.futures.ThreadPoolExecutor(max_workers=max(1, args.jobs)) as pool:
+        futures = [pool.submit(run, blender, blend, args.format, args.output, args.timeout) for blend in files]
+        for future in concurrent.futures.as_completed(futures):
+            entry = future.result()
+            entries.append(entry)
+            print('{:<8} {:7.2f}s {}'.format(entry['status'], entry['seconds'], entry['file']))
+    wall = time.perf_counter() - start
+
+    # Summary
+    entries.sort(key=lambda entry: files.index(entry['file']))
+    failed = [entry for entry in entries if entry['status'] != 'FINISHED']
+    nbytes = sum(entry['bytes'] for entry in entries)
+    summary = {
+        'format': args.format,
+        'jobs': args.jobs,
+        'files': len(entries),
+        'failed': len(failed),
+        'bytes': nbytes,
+        'wall': wall,
+        'files_per_second': len(entries) / wall if wall else 0.0,
+        'bytes_per_second': nbytes / wall if wall else 0.0,
+        'entries': entries,
+    }
+    print('Converted {:d} of {:d} files, {:d} bytes in {:.1f}s ({:.2f} files/s)'.format(
+        len(entries) - len(failed), len(entries), nbytes, wall, summary['files_per_second']))
+    for entry in failed:
+        lines = (entry['error'] or '').strip().splitlines()
+        print('FAILED {}: {}'.format(entry['file'], lines[-1] if lines else 'unknown error'))
+    if args.summary:
+        with open(args.summary, 'w') as fp:
+            json.dump(summary, fp, indent=2)
+    return 1 if failed else 0
+
+if __name__ == '__main__':
+    # Arguments after '--' when run through blender --background --python
+    args = arguments(sys.argv[sys.argv.index('--') + 1:] if '--' in sys.argv else sys.argv[1:])
+    if args.convert:
+        convert(args)
+    else:
+        sys.exit(main(args))
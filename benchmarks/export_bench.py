@@ -0,0 +1,241 @@
+# ========================================
+# YSFS 2.0 - Exporter Benchmark
+# Runs the bpy-free core on synthetic meshes:
+#   python benchmarks/export_bench.py [--quick] [--output result.json]
+#   blender --background --python benchmarks/export_bench.py -- [options]
+# ========================================
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import tempfile
+import platform
+import tracemalloc
+import numpy as np
+
+# Exporter core lives in the add-on folder
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import core
+import writer
+
+# Blender -> YSFlight Axis
+YS_MATRIX = np.array((
+    (-1.0,  0.0,  0.0,  0.0),
+    ( 0.0,  0.0,  1.0,  0.0),
+    ( 0.0, -1.0,  0.0,  0.0),
+    ( 0.0,  0.0,  0.0,  1.0),
+), dtype=np.float32)
+
+# ==============================
+# Synthetic Meshes
+# ==============================
+# Quad grid with about nverts vertexs
+def grid(nverts, materials=False, seed=0):
+    rng = np.random.RandomState(seed)
+    cols = max(2, int(np.sqrt(nverts)))
+    rows = max(2, nverts // cols)
+    x, y = np.meshgrid(np.arange(cols, dtype=np.float32), np.arange(rows, dtype=np.float32))
+    z = rng.uniform(-0.5, 0.5, size=x.shape).astype(np.float32)
+    co = np.column_stack((x.ravel(), y.ravel(), z.ravel()))
+
+    # Faces
+    corner = (np.arange(rows - 1)[:, None] * cols + np.arange(cols - 1)).ravel().astype(np.int32)
+    quads = np.column_stack((corner, corner + 1, corner + cols + 1, corner + cols))
+    nfaces = len(quads)
+    loop_verts = quads.ravel()
+    loop_start = np.arange(nfaces, dtype=np.int32) * 4
+    loop_total = np.full(nfaces, 4, dtype=np.int32)
+
+    # Edges
+    pairs = np.concatenate([np.sort(quads[:, [i, (i + 1) % 4]], axis=1) for i in range(4)]).astype(np.int64)
+    keys = np.unique(pairs[:, 0] * len(co) + pairs[:, 1])
+    edge_verts = np.column_stack(divmod(keys, len(co))).astype(np.int32)
+
+    # Mixed smoothing
+    edge_sharp = rng.uniform(size=len(edge_verts)) < 0.1
+    face_smooth = rng.uniform(size=nfaces) < 0.5
+
+    # Materials (with transparency and self lighting)
+    if materials:
+        table = []
+        for i in range(4):
+            color = tuple(float(c) for c in np.float32(rng.uniform(size=3)) * np.float32(255.0))
+            table.append((color, i == 1, 0.5 if i == 2 else 1.0))
+        material_index = rng.randint(0, len(table), size=nfaces).astype(np.int32)
+    else:
+        table = None
+        material_index = np.zeros(nfaces, dtype=np.int32)
+
+    raw = core.Raw(co, edge_verts, edge_sharp, loop_verts, loop_start, loop_total, face_smooth, material_index)
+    return raw, table
+
+def world(seed):
+    matrix = np.eye(4, dtype=np.float32)
+    matrix[:3, 3] = np.random.RandomState(seed).uniform(-10.0, 10.0, size=3)
+    return np.dot(YS_MATRIX, matrix)
+
+# ==============================
+# Export Paths
+# ==============================
+class Timer:
+    def __init__(self):
+        self.phases = {}
+
+    def run(self, phase, func, *args):
+        start = time.perf_counter()
+        result = func(*args)
+        self.phases[phase] = self.phases.get(phase, 0.0) + time.perf_counter() - start
+        return result
+
+def build(timer, parts):
+    return [timer.run('mesh', core.mesh, raw, world(i), None, table) for i, (raw, table) in enumerate(parts)]
+
+def save(path, data):
+    with open(path, 'wb') as fp:
+        fp.write(data)
+    return len(data)
+
+# Single SRF
+def run_srf(timer, parts, tmpdir):
+    mesh = build(timer, parts)[0]
+    data = timer.run('format', lambda: core.srf(mesh).encode('utf-8'))
+    return timer.run('write', save, os.path.join(tmpdir, 'model.srf'), data)
+
+# DNM, streamed to the file as the exporter does (one phase: formatting
+# and writing interleave)
+def run_dnm(timer, parts, tmpdir):
+    meshes = build(timer, parts)
+    names = ['{:d}.srf'.format(i) for i in range(len(meshes))]
+    nodes = [(i, name, (0.0, 0.0, 0.0), (0.0, 0.0, 0.0), []) for i, name in enumerate(names)]
+
+    def write_dnm():
+        with open(os.path.join(tmpdir, 'model.dnm'), 'wb') as fp:
+            out = writer.Writer(fp)
+            core.write_dnm(out, zip(names, meshes), nodes)
+            out.flush()
+            return out.tell()
+    return timer.run('write', write_dnm)
+
+# Exploded SRF parts
+def run_explode(timer, parts, tmpdir):
+    meshes = build(timer, parts)
+    datas = timer.run('format', lambda: [core.srf(mesh).encode('utf-8') for mesh in meshes])
+    def write_all():
+        for i, data in enumerate(datas):
+            writer.save_if_changed(os.path.join(tmpdir, '{:d}.srf'.format(i)), data)
+        return sum(len(data) for data in datas)
+    return timer.run('write', write_all)
+
+PATHS = {'srf': run_srf, 'dnm': run_dnm, 'explode': run_explode}
+
+# ==============================
+# Cases
+# ==============================
+def cases(quick):
+    sizes = (1000, 10000) if quick else (1000, 10000, 100000, 1000000)
+    counts = (1, 10) if quick else (1, 10, 100, 1000)
+    for nverts in sizes:
+        for materials in (False, True):
+            yield ('srf', nverts, 1, materials)
+    for nparts in counts:
+        for materials in (False, True):
+            yield ('dnm', 1000, nparts, materials)
+            yield ('explode', 1000, nparts, materials)
+
+def run_case(path, nverts, nparts, materials, memory, repeat=3):
+    parts = [grid(nverts, materials, seed=i) for i in range(nparts)]
+    tmpdir = tempfile.mkdtemp(prefix='ysfs_bench_')
+    try:
+        # Best of several runs
+        wall = None
+        for i in range(repeat):
+            run = Timer()
+            start = time.perf_counter()
+            nbytes = PATHS[path](run, parts, tmpdir)
+            elapsed = time.perf_counter() - start
+            if wall is None or elapsed < wall:
+                wall, timer = elapsed, run
+
+        # Second run only to measure memory, tracing slows everything down
+        peak = None
+        if memory:
+            tracemalloc.start()
+            PATHS[path](Timer(), parts, tmpdir)
+            peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+    finally:
+        shutil.rmtree(tmpdir, ignore_errors=True)
+
+    vertices = sum(len(raw.co) for raw, table in parts)
+    return {
+        'path': path,
+        'vertices': vertices,
+        'faces': sum(len(raw.loop_start) for raw, table in parts),
+        'parts': nparts,
+        'materials': materials,
+        'bytes': nbytes,
+        'wall': wall,
+        'phases': timer.phases,
+        'vertices_per_second': vertices / wall,
+        'bytes_per_second': nbytes / wall,
+        'peak_memory': peak,
+    }
+
+# ==============================
+# Baseline
+# ==============================
+def compare(results, baseline, threshold):
+    regressions = []
+    for name, result in sorted(results.items()):
+        base = baseline.get(name)
+        if base is None:
+            continue
+        ratio = result['wall'] / base['wall']
+        flag = ''
+        if ratio > 1.0 + threshold:
+            flag = '  REGRESSION'
+            regressions.append(name)
+        print('{:<36} {:8.3f}s  baseline {:8.3f}s  x{:.2f}{}'.format(name, result['wall'], base['wall'], ratio, flag))
+    return regressions
+
+def main(argv):
+    parser = argparse.ArgumentParser(description='Benchmark SRF/DNM export throughput and memory.')
+    parser.add_argument('--quick', action='store_true', help='small meshes only')
+    parser.add_argument('--output', default='bench_output.json', help='result JSON file')
+    parser.add_argument('--baseline', help='JSON of an earlier run to compare against')
+    parser.add_argument('--threshold', type=float, default=0.10, help='allowed slowdown against the baseline (0.10 = 10%%)')
+    parser.add_argument('--repeat', type=int, default=3, help='runs per case, the fastest one is kept')
+    parser.add_argument('--no-memory', action='store_true', help='skip the peak memory pass')
+    args = parser.parse_args(argv)
+
+    results = {}
+    for path, nverts, nparts, materials in cases(args.quick):
+        name = '{}-{:d}v-{:d}p{}'.format(path, nverts, nparts, '-mat' if materials else '')
+        result = run_case(path, nverts, nparts, materials, not args.no_memory, max(1, args.repeat))
+        results[name] = result
+        phases = ' '.join('{}={:.3f}s'.format(k, v) for k, v in sorted(result['phases'].items()))
+        memory = '' if result['peak_memory'] is None else ' peak={:.1f}MiB'.format(result['peak_memory'] / 1048576.0)
+        print('{:<36} {:8.3f}s {:12.0f} v/s {:8.1f} MB/s  {}{}'.format(
+            name, result['wall'], result['vertices_per_second'], result['bytes_per_second'] / 1e6, phases, memory))
+
+    with open(args.output, 'w') as fp:
+        json.dump({
+            'python': platform.python_version(),
+            'numpy': np.__version__,
+            'machine': platform.machine(),
+            'cases': results,
+        }, fp, indent=2, sort_keys=True)
+
+    if args.baseline:
+        with open(args.baseline) as fp:
+            baseline = json.load(fp)['cases']
+        if compare(results, baseline, args.threshold):
+            return 1
+    return 0
+
+if __name__ == '__main__':
+    # Arguments after '--' when run through blender --background --python
+    argv = sys.argv[sys.argv.index('--') + 1:] if '--' in sys.argv else sys.argv[1:]
+    sys.exit(main(argv))
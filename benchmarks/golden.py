@@ -0,0 +1,502 @@
+# ========================================
+# YSFS 2.0 - Golden Output Check
+# Runs every optimized export path on random meshes and compares the text
+# with a frozen reference implementation (the original BMesh exporters,
+# face by face in plain Python):
+#   python benchmarks/golden.py [--cases 200] [--seed 0]
+#   python benchmarks/golden.py --save golden/   (freeze today's output)
+#   python benchmarks/golden.py --check golden/  (compare with it later)
+# ========================================
+import io
+import os
+import sys
+import glob
+import difflib
+import types
+import shutil
+import argparse
+import tempfile
+import importlib
+import numpy as np
+
+# Exporter modules as a package, without its __init__ (that one needs bpy)
+ADDON = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PACKAGE = 'ysfs_golden'
+if PACKAGE not in sys.modules:
+    package = types.ModuleType(PACKAGE)
+    package.__path__ = [ADDON]
+    sys.modules[PACKAGE] = package
+core = importlib.import_module(PACKAGE + '.core')
+writer = importlib.import_module(PACKAGE + '.writer')
+parallel = importlib.import_module(PACKAGE + '.parallel')
+
+# Blender -> YSFlight Axis
+YS_MATRIX = np.array((
+    (-1.0,  0.0,  0.0,  0.0),
+    ( 0.0,  0.0,  1.0,  0.0),
+    ( 0.0, -1.0,  0.0,  0.0),
+    ( 0.0,  0.0,  0.0,  1.0),
+), dtype=np.float32)
+
+F32 = np.float32
+
+# ==============================
+# Random Cases
+# ==============================
+# One object: (name, raw, materials, world, location, parent index)
+def random_part(rng, name, parent):
+    nverts = rng.randint(3, 40)
+    co = rng.uniform(-10.0, 10.0, size=(nverts, 3)).astype(np.float32)
+    # Values printed as 0.0000 and -0.0000, and halves at the 4th decimal
+    co[rng.uniform(size=co.shape) < 0.05] = 0.0
+    co[rng.uniform(size=co.shape) < 0.05] = -1.0e-6
+    co[rng.uniform(size=co.shape) < 0.05] = 0.00005
+
+    # Random n-gons, loops stored in any order
+    faces = []
+    for i in range(rng.randint(1, 60)):
+        size = min(nverts, rng.choice([3, 3, 4, 4, 5, 6, 8, 10]))
+        faces.append(rng.choice(nverts, size, replace=False).tolist())
+    order = rng.permutation(len(faces))
+    loop_verts = []
+    loop_start = np.zeros(len(faces), dtype=np.int32)
+    for index in order:
+        loop_start[index] = len(loop_verts)
+        loop_verts.extend(faces[index])
+    loop_total = np.array([len(face) for face in faces], dtype=np.int32)
+    edges = sorted({tuple(sorted((face[i - 1], face[i]))) for face in faces for i in range(len(face))})
+    # A loose edge
+    edges.append((0, nverts - 1) if (0, nverts - 1) not in edges else edges[0])
+    edge_verts = np.array(edges, dtype=np.int32).reshape(-1, 2)
+
+    # Material slots with every emit/alpha combination
+    materials = None
+    nslots = rng.choice([0, 1, 3, 5])
+    if nslots:
+        materials = []
+        for i in range(nslots):
+            color = tuple(float(c) for c in rng.uniform(size=3).astype(np.float32) * F32(255.0))
+            materials.append((color, bool(rng.randint(2)), float(F32(rng.choice([1.0, 0.75, 0.5, 0.3, 0.0])))))
+
+    raw = core.Raw(co, edge_verts, rng.uniform(size=len(edge_verts)) < 0.2,
+                   np.array(loop_verts, dtype=np.int32), loop_start, loop_total,
+                   rng.uniform(size=len(faces)) < 0.6,
+                   rng.randint(0, max(1, nslots), size=len(faces)).astype(np.int32))
+
+    # Location (sometimes at the origin) and a rotated, scaled world matrix
+    location = np.zeros(3) if rng.uniform() < 0.2 else rng.uniform(-5.0, 5.0, size=3)
+    world = np.eye(4)
+    world[:3, :3] = rng.uniform(-2.0, 2.0, size=(3, 3))
+    world[:3, 3] = location
+    return (name, raw, materials, np.dot(YS_MATRIX, world.astype(np.float32)), location, parent)
+
+# Objects of one scene, children after their parents
+def random_case(seed):
+    rng = np.random.RandomState(seed)
+    parts = []
+    for i in range(rng.randint(1, 6)):
+        parent = rng.randint(0, i) if i and rng.uniform() < 0.5 else None
+        parts.append(random_part(rng, 'part{:d}'.format(i), parent))
+    return parts
+
+def axis(location):
+    return np.dot(YS_MATRIX[:3, :3], np.asarray(location, dtype=np.float32)).astype(np.float32)
+
+# ==============================
+# Reference Implementation
+# ==============================
+# The original exporters, with BMesh replaced by the same float32 steps
+# done one vertex and one face at a time. Keep as is: it is the oracle.
+def reference_srf(raw, materials, world, local_axis):
+    co = [None] * len(raw.co)
+    for i, (x, y, z) in enumerate(raw.co):
+        co[i] = [x * world[r, 0] + y * world[r, 1] + world[r, 2] * z + world[r, 3] for r in range(3)]
+    faces = [raw.loop_verts[start:start + total].tolist()
+             for start, total in zip(raw.loop_start, raw.loop_total)]
+    output = ''
+    za = ''
+    zacount = 0
+
+    # Header
+    output += 'SURF\n'
+
+    # Vertexs
+    link_faces = [[] for v in co]
+    for index, face in enumerate(faces):
+        for v in face:
+            link_faces[v].append(index)
+    sharp = [False] * len(co)
+    for (a, b), edge_sharp in zip(raw.edge_verts.tolist(), raw.edge_sharp.tolist()):
+        if edge_sharp:
+            sharp[a] = sharp[b] = True
+    for v, vertex in enumerate(co):
+        output += 'V {:.4f} {:.4f} {:.4f} '.format(*(vertex[i] - local_axis[i] for i in range(3)))
+        # Smoothing
+        if not sharp[v]:
+            for index in link_faces[v]:
+                if raw.face_smooth[index]:
+                    output += 'R'
+                    break
+        output += '\n'
+
+    # Faces
+    for index, face in enumerate(faces):
+        output += 'F\n'
+
+        # Has Material?
+        if materials is not None:
+            color, emit, alpha = materials[raw.material_index[index]]
+            output += 'C {:.0f} {:.0f} {:.0f}\n'.format(*color)
+            # Lighting
+            if emit:
+                output += 'B\n'
+            # Transparent
+            if alpha < 1.0:
+                if zacount == 0:
+                    za += 'ZA {:d} {:.0f}'.format(index, (1.0 - alpha) * 228.0)
+                elif zacount % 8 == 0:
+                    za += '\nZA {:d} {:.0f}'.format(index, (1.0 - alpha) * 228.0)
+                else:
+                    za += ' {:d} {:.0f}'.format(index, (1.0 - alpha) * 228.0)
+                zacount = zacount + 1
+
+        # Median and Normal
+        points = [co[v] for v in face]
+        median = center_median_weighted(points)
+        normal = face_normal(points)
+        output += 'N {:.4f} {:.4f} {:.4f} '.format(*(median[i] - local_axis[i] for i in range(3)))
+        output += '{:.4f} {:.4f} {:.4f}\n'.format(*(-n for n in normal))
+
+        # Vertexs consist Face
+        output += 'V'
+        for v in face:
+            output += ' {:d}'.format(v)
+        output += '\n'
+        output += 'E\n'
+
+    # Footer
+    output += 'E\n'
+
+    # For Transparent
+    if za != '':
+        output += za + '\n'
+    return output
+
+def reference_pck(name, text):
+    length = len(text.split('\n')) - 1
+    return 'PCK {} {:d}\n{}\n'.format(name, length, text)
+
+def reference_node(uid, name, local_axis, parent_axis, children):
+    output = ''
+    output += 'SRF "{:d}"\n'.format(uid)
+    output += 'FIL {}\n'.format(name)
+    output += 'CLA 0\n'
+    output += 'NST 0\n'
+    if parent_axis is not None:
+        local_axis_pos = [local_axis[i] - parent_axis[i] for i in range(3)]
+        if tuple(parent_axis) == (0, 0, 0):
+            output += 'POS 0.0000 0.0000 0.0000 0 0 0 1\n'
+            output += 'CNT {:.4f} {:.4f} {:.4f}\n'.format(*local_axis)
+        else:
+            output += 'POS {:.4f} {:.4f} {:.4f} 0 0 0 1\n'.format(*local_axis_pos)
+            output += 'CNT 0.0000 0.0000 0.0000\n'
+    else:
+        output += 'POS 0.0000 0.0000 0.0000 0 0 0 1\n'
+        output += 'CNT {:.4f} {:.4f} {:.4f}\n'.format(*local_axis)
+    output += 'REL DEP\n'
+    output += 'NCH {:d}\n'.format(len(children))
+    for uid in children:
+        output += 'CLD "{:d}"\n'.format(uid)
+    output += 'END\n'
+    return output
+
+def reference_dnm(parts):
+    output = 'DYNAMODEL\nDNMVER 1\n'
+    for name, raw, materials, world, location, parent in parts:
+        output += reference_pck(name + '.srf', reference_srf(raw, materials, world, axis(location)))
+    for uid, (name, raw, materials, world, location, parent) in enumerate(parts):
+        parent_axis = None if parent is None else axis(parts[parent][4])
+        children = [i for i, part in enumerate(parts) if part[5] == uid]
+        output += reference_node(uid, name + '.srf', axis(location), parent_axis, children)
+    output += 'END\n'
+    return output.encode('utf-8')
+
+# calc_center_median_weighted
+def center_median_weighted(points):
+    length = [edge_length(points[i], points[(i + 1) % len(points)]) for i in range(len(points))]
+    center = [F32(0.0)] * 3
+    total = F32(0.0)
+    w_prev = length[-1]
+    for point, w_curr in zip(points, length):
+        w = w_curr + w_prev
+        center = [center[i] + point[i] * w for i in range(3)]
+        total += w
+        w_prev = w_curr
+    if total != 0.0:
+        center = [c * (F32(1.0) / total) for c in center]
+    return center
+
+def edge_length(a, b):
+    d = [a[i] - b[i] for i in range(3)]
+    return np.sqrt(d[0] * d[0] + d[1] * d[1] + d[2] * d[2])
+
+# BM_face_calc_normal
+def face_normal(points):
+    if len(points) == 3:
+        n = cross([points[0][i] - points[1][i] for i in range(3)], [points[1][i] - points[2][i] for i in range(3)])
+    elif len(points) == 4:
+        n = cross([points[0][i] - points[2][i] for i in range(3)], [points[1][i] - points[3][i] for i in range(3)])
+    else:
+        n = [F32(0.0)] * 3
+        v_prev = points[-1]
+        for v_curr in points:
+            n[0] += (v_prev[1] - v_curr[1]) * (v_prev[2] + v_curr[2])
+            n[1] += (v_prev[2] - v_curr[2]) * (v_prev[0] + v_curr[0])
+            n[2] += (v_prev[0] - v_curr[0]) * (v_prev[1] + v_curr[1])
+            v_prev = v_curr
+    d = n[0] * n[0] + n[1] * n[1] + n[2] * n[2]
+    if d > F32(1.0e-35):
+        return [c * (F32(1.0) / np.sqrt(d)) for c in n]
+    return [F32(0.0)] * 3
+
+def cross(a, b):
+    return [a[1] * b[2] - a[2] * b[1], a[2] * b[0] - a[0] * b[2], a[0] * b[1] - a[1] * b[0]]
+
+# ==============================
+# Export Paths
+# ==============================
+# Every path returns the bytes it writes for a whole case
+def meshes(parts):
+    return [core.mesh(raw, world, axis(location), materials)
+            for name, raw, materials, world, location, parent in parts]
+
+def nodes(parts):
+    result = []
+    for uid, (name, raw, materials, world, location, parent) in enumerate(parts):
+        # Surface.srf
+        pos = (0.0, 0.0, 0.0)
+        cnt = axis(location)
+        if parent is not None:
+            parent_axis = axis(parts[parent][4])
+            if tuple(parent_axis) != (0, 0, 0):
+                pos = cnt - parent_axis
+                cnt = (0.0, 0.0, 0.0)
+        children = [i for i, part in enumerate(parts) if part[5] == uid]
+        result.append((uid, name + '.srf', pos, cnt, children))
+    return result
+
+# SRF text of the first part (ExportSRF)
+def path_srf(parts, tmpdir):
+    return core.srf(meshes(parts[:1])[0]).encode('utf-8')
+
+# Same, streamed through a Writer flushing every few bytes
+def path_writer(parts, tmpdir):
+    fp = io.BytesIO()
+    out = writer.Writer(fp, chunk_size=61)
+    core.write_srf(out, meshes(parts[:1])[0])
+    out.flush()
+    return fp.getvalue()
+
+# Whole DNM in one pass (Surface.pck)
+def path_dnm(parts, tmpdir):
+    fp = io.BytesIO()
+    out = writer.Writer(fp, chunk_size=509)
+    names = [part[0] + '.srf' for part in parts]
+    core.write_dnm(out, zip(names, meshes(parts)), nodes(parts))
+    out.flush()
+    return fp.getvalue()
+
+# DNM with PCK blocks formatted from spilled arrays (ExportDNM workers)
+def path_spill(parts, tmpdir, pool=None):
+    jobs = []
+    for uid, ((name, raw, materials, world, location, parent), mesh) in enumerate(zip(parts, meshes(parts))):
+        path = os.path.join(tmpdir, '{:d}.bin'.format(uid))
+        layout = parallel.spill(mesh, path)
+        jobs.append((name + '.srf', path, layout, materials, os.path.join(tmpdir, '{:d}.pck'.format(uid)), []))
+    if pool is None:
+        results = [parallel.format_pck(job) for job in jobs]
+    else:
+        results = pool.map(parallel.format_pck, jobs)
+    fp = io.BytesIO()
+    out = writer.Writer(fp)
+    out.write('DYNAMODEL\nDNMVER 1\n')
+    for result, lods in results:
+        out.append(result)
+    for node in nodes(parts):
+        out.write(core.srf_node(*node))
+    out.write('END\n')
+    out.flush()
+    return fp.getvalue()
+
+# SRF part files written by workers (ExplodeSRF), joined for comparison
+def path_explode(parts, tmpdir, pool=None):
+    jobs = []
+    for uid, ((name, raw, materials, world, location, parent), mesh) in enumerate(zip(parts, meshes(parts))):
+        path = os.path.join(tmpdir, '{:d}.bin'.format(uid))
+        layout = parallel.spill(mesh, path)
+        jobs.append((path, layout, materials, os.path.join(tmpdir, name + '.srf'), []))
+    if pool is None:
+        for job in jobs:
+            parallel.format_srf(job)
+    else:
+        pool.map(parallel.format_srf, jobs)
+    data = b''
+    for job in jobs:
+        with open(job[3], 'rb') as fp:
+            data += fp.read()
+    return data
+
+def reference_explode(parts):
+    return ''.join(reference_srf(raw, materials, world, axis(location))
+                   for name, raw, materials, world, location, parent in parts).encode('utf-8')
+
+# Path -> (function, reference, uses the process pool)
+PATHS = {
+    'srf': (path_srf, lambda parts: reference_srf(*parts[0][1:4], axis(parts[0][4])).encode('utf-8'), False),
+    'writer': (path_writer, lambda parts: reference_srf(*parts[0][1:4], axis(parts[0][4])).encode('utf-8'), False),
+    'dnm': (path_dnm, reference_dnm, False),
+    'spill': (path_spill, reference_dnm, False),
+    'pool': (path_spill, reference_dnm, True),
+    'explode': (path_explode, reference_explode, True),
+}
+
+# ==============================
+# Structural Diff
+# ==============================
+# Records of SRF/DNM text: [(where, line)], so a difference names the
+# block, face or ZA entry it belongs to instead of a byte offset.
+def records(text):
+    result = []
+    block = 'file'
+    vertex = face = 0
+    in_face = False
+    for line in text.split('\n'):
+        key = line.split(' ', 1)[0]
+        if key in ('PCK', 'SURF', 'SRF'):
+            # SURF of a PCK block keeps the block name (not its line count)
+            if not (key == 'SURF' and block.startswith('PCK')):
+                block = ' '.join(line.split()[:2])
+            vertex = face = 0
+            in_face = False
+            result.append((block, line))
+        elif key == 'F':
+            in_face = True
+            result.append(('{} face {:d}'.format(block, face), line))
+        elif key == 'E' and in_face:
+            result.append(('{} face {:d}'.format(block, face), line))
+            face += 1
+            in_face = False
+        elif key == 'V' and not in_face:
+            result.append(('{} vertex {:d}'.format(block, vertex), line))
+            vertex += 1
+        elif key == 'ZA':
+            # One record per entry, then the line itself for the wrapping
+            values = line.split()[1:]
+            for i in range(0, len(values), 2):
+                result.append(('{} ZA face {}'.format(block, values[i]), ' '.join(values[i:i + 2])))
+            result.append(('{} ZA line'.format(block), '{:d} entries'.format(len(values) // 2)))
+        elif in_face:
+            result.append(('{} face {:d}'.format(block, face), line))
+        else:
+            result.append((block, line))
+    return result
+
+# First differences between two outputs (empty if equal)
+def diff(expected, actual, limit=10):
+    if expected == actual:
+        return []
+    a = records(expected.decode('utf-8', 'replace'))
+    b = records(actual.decode('utf-8', 'replace'))
+    result = []
+    # Aligned, so one extra or missing record does not shift the rest
+    matcher = difflib.SequenceMatcher(None, a, b, autojunk=False)
+    for tag, a0, a1, b0, b1 in matcher.get_opcodes():
+        if tag == 'equal':
+            continue
+        for i in range(max(a1 - a0, b1 - b0)):
+            if a0 + i >= a1:
+                where, line = b[b0 + i]
+                result.append('{}: unexpected {!r}'.format(where, line))
+            elif b0 + i >= b1:
+                where, line = a[a0 + i]
+                result.append('{}: missing {!r}'.format(where, line))
+            else:
+                result.append('{}: expected {!r}, got {!r}'.format(a[a0 + i][0], a[a0 + i][1], b[b0 + i][1]))
+            if len(result) >= limit:
+                return result
+    if not result:
+        result.append('same records, different bytes (line endings or trailing text)')
+    return result
+
+# ==============================
+# Main
+# ==============================
+def main(argv):
+    parser = argparse.ArgumentParser(description='Compare export paths with the reference SRF/DNM output.')
+    parser.add_argument('--cases', type=int, default=200, help='random scenes to check')
+    parser.add_argument('--seed', type=int, default=0, help='seed of the first scene')
+    parser.add_argument('--paths', default=','.join(PATHS), help='comma separated paths ({})'.format(', '.join(PATHS)))
+    parser.add_argument('--jobs', type=int, default=2, help='processes for the pool paths')
+    parser.add_argument('--limit', type=int, default=10, help='differences shown per failure')
+    parser.add_argument('--save', help='write the output of every path and case to this folder')
+    parser.add_argument('--check', help='compare with the output saved by --save instead of the reference')
+    args = parser.parse_args(argv)
+    paths = [path for path in args.paths.split(',') if path]
+    for path in paths:
+        if path not in PATHS:
+            parser.error('unknown path: {}'.format(path))
+    if args.save:
+        os.makedirs(args.save, exist_ok=True)
+
+    failed = 0
+    checked = 0
+    tmpdir = tempfile.mkdtemp(prefix='ysfs_golden_')
+    pool = None
+    if any(PATHS[path][2] for path in paths):
+        pool, reason = parallel.start(max(1, args.jobs), sys.executable)
+        if pool is None:
+            print('Could not start workers: {}'.format(reason))
+            return 1
+    try:
+        for seed in range(args.seed, args.seed + args.cases):
+            parts = random_case(seed)
+            reference = {}
+            for path in paths:
+                func, expect, pooled = PATHS[path]
+                name = '{:d}.{}'.format(seed, path)
+                if pooled:
+                    actual = func(parts, tmpdir, pool)
+                else:
+                    actual = func(parts, tmpdir)
+                if args.save:
+                    with open(os.path.join(args.save, name), 'wb') as fp:
+                        fp.write(actual)
+                if args.check:
+                    with open(os.path.join(args.check, name), 'rb') as fp:
+                        expected = fp.read()
+                else:
+                    if expect not in reference:
+                        reference[expect] = expect(parts)
+                    expected = reference[expect]
+                checked += 1
+                differences = diff(expected, actual, args.limit)
+                if differences:
+                    failed += 1
+                    print('FAILED case {:d} path {}'.format(seed, path))
+                    for line in differences:
+                        print('    ' + line)
+            for path in glob.glob(os.path.join(tmpdir, '*')):
+                os.remove(path)
+    finally:
+        if pool is not None:
+            pool.close()
+        shutil.rmtree(tmpdir, ignore_errors=True)
+
+    print('{:d} of {:d} outputs match ({:d} cases, paths: {})'.format(
+        checked - failed, checked, args.cases, ', '.join(paths)))
+    return 1 if failed else 0
+
+if __name__ == '__main__':
+    # Arguments after '--' when run through blender --background --python
+    argv = sys.argv[sys.argv.index('--') + 1:] if '--' in sys.argv else sys.argv[1:]
+    sys.exit(main(argv))
@@ -0,0 +1,106 @@
+# ========================================
+# YSFS 2.0 - Add-on Startup Benchmark
+# Starts headless Blender processes with and without the add-on enabled
+# and measures what enabling it costs:
+#   python benchmarks/import_time.py --blender /path/to/blender [--runs 10]
+#   python benchmarks/import_time.py --blender blender --addon ../old/  (another checkout)
+# ========================================
+import os
+import sys
+import json
+import time
+import argparse
+import tempfile
+import statistics
+import subprocess
+
+ADDON = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Implementation modules the exporters load on first use
+DEFERRED = ('core', 'geometry', 'writer', 'parallel', 'cache', 'stats', 'lod', 'chunks', 'reader')
+
+# Runs inside Blender: import and register the add-on, optionally load
+# what the first export needs, and save the timings as JSON
+PROBE = '''
+import sys, json, time, importlib, importlib.machinery
+addon, result, use, package = {addon!r}, {result!r}, {use!r}, 'ysfs_startup'
+before = set(sys.modules)
+start = time.perf_counter()
+if addon:
+    # load_module, not module_from_spec: Blender 2.75-2.77 run Python 3.4
+    module = importlib.machinery.SourceFileLoader(package, addon + '/__init__.py').load_module()
+    module.register()
+registered = time.perf_counter()
+loaded = sorted(set(sys.modules) - before)
+if addon and use:
+    for name in {deferred!r}:
+        importlib.import_module(package + '.' + name)
+if addon:
+    module.unregister()
+with open(result, 'w') as fp:
+    json.dump({{
+        'register': registered - start,
+        'first_use': time.perf_counter() - registered,
+        'modules': len(loaded),
+        'numpy': 'numpy' in loaded,
+    }}, fp)
+'''
+
+# One Blender process: (wall seconds, probe result)
+# addon: add-on folder, '' for Blender alone; use: also load the exporters
+def run(blender, addon, use=False):
+    fd, result = tempfile.mkstemp(suffix='.json')
+    os.close(fd)
+    try:
+        probe = PROBE.format(addon=addon, result=result, use=use, deferred=DEFERRED)
+        start = time.perf_counter()
+        subprocess.check_call([blender, '--background', '--factory-startup', '--python-expr', probe],
+                              stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        wall = time.perf_counter() - start
+        with open(result) as fp:
+            return wall, json.load(fp)
+    finally:
+        os.remove(result)
+
+def main(argv):
+    parser = argparse.ArgumentParser(description='Measure the Blender startup cost of the add-on.')
+    parser.add_argument('--blender', default='blender', help='Blender executable')
+    parser.add_argument('--addon', default=ADDON, help='add-on folder (default: this checkout)')
+    parser.add_argument('--runs', type=int, default=10, help='Blender processes per variant, the median is kept')
+    parser.add_argument('--output', help='write the result as JSON')
+    args = parser.parse_args(argv)
+
+    # Alternate the variants so drift hits both alike
+    addon = os.path.abspath(args.addon)
+    bare, enabled, used = [], [], []
+    for i in range(max(1, args.runs)):
+        bare.append(run(args.blender, ''))
+        enabled.append(run(args.blender, addon))
+        used.append(run(args.blender, addon, use=True))
+
+    def median(samples, key):
+        return statistics.median(key(sample) for sample in samples)
+    result = {
+        'addon': addon,
+        'runs': len(bare),
+        'blender': median(bare, lambda s: s[0]),
+        'blender_with_addon': median(enabled, lambda s: s[0]),
+        'register': median(enabled, lambda s: s[1]['register']),
+        'first_use': median(used, lambda s: s[1]['first_use']),
+        'modules': enabled[0][1]['modules'],
+        'numpy': enabled[0][1]['numpy'],
+    }
+    print('Blender without add-on  {:8.3f}s'.format(result['blender']))
+    print('Blender with add-on     {:8.3f}s ({:+.3f}s)'.format(
+        result['blender_with_addon'], result['blender_with_addon'] - result['blender']))
+    print('Import and register     {:8.3f}s ({:d} modules loaded, numpy {})'.format(
+        result['register'], result['modules'], 'loaded' if result['numpy'] else 'not loaded'))
+    print('First export imports    {:8.3f}s'.format(result['first_use']))
+
+    if args.output:
+        with open(args.output, 'w') as fp:
+            json.dump(result, fp, indent=2, sort_keys=True)
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
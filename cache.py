@@ -0,0 +1,57 @@
+import os
+
+# Bump when the PCK output format changes, so old entries are never reused
+VERSION = 1
+
+# PCK Block Cache
+# Keeps formatted PCK blocks in '<file>.dnm.cache/<hash>.pck'. Entries not
+# used by the latest export are stale and removed by evict().
+class Cache:
+    def __init__(self, filepath):
+        self.dir = '{}.cache'.format(filepath)
+        self.used = set()
+        self.hits = 0
+        self.misses = 0
+        os.makedirs(self.dir, exist_ok=True)
+
+    # Hash -> Key
+    def key(self, h):
+        h.update('ysfs-pck-{:d}'.format(VERSION).encode('ascii'))
+        return h.hexdigest()
+
+    def path(self, key):
+        return os.path.join(self.dir, '{}.pck'.format(key))
+
+    # Temporary file a missing entry is formatted into
+    def temp(self, key):
+        return os.path.join(self.dir, '{}.tmp'.format(key))
+
+    # Cached PCK block, or None
+    def lookup(self, key):
+        path = self.path(key)
+        self.used.add(key)
+        if os.path.exists(path):
+            self.hits += 1
+            return path
+        self.misses += 1
+        return None
+
+    # Publish a formatted PCK block
+    def store(self, key, temp):
+        path = self.path(key)
+        os.replace(temp, path)
+        return path
+
+    # Remove stale entries
+    def evict(self):
+        removed = 0
+        for filename in os.listdir(self.dir):
+            key, ext = os.path.splitext(filename)
+            if ext == '.pck' and key in self.used:
+                continue
+            os.remove(os.path.join(self.dir, filename))
+            removed += 1
+        return removed
+
+    def summary(self):
+        return 'Cache: {:d} hit, {:d} miss'.format(self.hits, self.misses)
@@ -0,0 +1,102 @@
+import numpy as np
+from . import core
+
+# Deepest octree level (cells of 1/4096 of the model size)
+MAX_DEPTH = 12
+
+# ==============================
+# Chunk Assignment
+# ==============================
+# Both return one chunk index per face, from the face median, numbered
+# 0..n-1 in cell order so the output does not depend on the face order.
+
+# Uniform Grid: cubes of size (YSFlight units)
+def grid(mesh, size):
+    if not len(mesh.face_total):
+        return np.zeros(0, dtype=np.int64)
+    cell = np.floor(mesh.median.astype(np.float64) / size).astype(np.int64)
+    cell -= cell.min(axis=0)
+    # One integer per cell (far faster to sort than rows)
+    dims = cell.max(axis=0) + 1
+    if float(dims[0]) * float(dims[1]) * float(dims[2]) < 2.0 ** 62:
+        key = (cell[:, 0] * dims[1] + cell[:, 1]) * dims[2] + cell[:, 2]
+    else:
+        key = core.row_keys(cell)
+    _, chunk = np.unique(key, return_inverse=True)
+    return chunk.ravel()
+
+# Adaptive Octree: cells holding more than max_faces faces are split in
+# eight, one level at a time for all faces together
+def octree(mesh, max_faces, max_depth=MAX_DEPTH):
+    nfaces = len(mesh.face_total)
+    if not nfaces:
+        return np.zeros(0, dtype=np.int64)
+    median = mesh.median.astype(np.float64)
+    low = median.min(axis=0)
+    size = float((median.max(axis=0) - low).max())
+    # Lower corner of the cell of every face
+    corner = np.tile(low, (nfaces, 1))
+    node = np.zeros(nfaces, dtype=np.int64)
+    for depth in range(max_depth):
+        _, node, count = np.unique(node, return_inverse=True, return_counts=True)
+        node = node.ravel()
+        split = count[node] > max_faces
+        if not split.any() or size == 0.0:
+            break
+        size *= 0.5
+        upper = median[split] >= corner[split] + size
+        corner[split] += upper * size
+        # Child ids stay unique: 9 * parent + octant + 1
+        node = node * 9
+        node[split] += 1 + upper[:, 0] + 2 * upper[:, 1] + 4 * upper[:, 2]
+    _, chunk = np.unique(node, return_inverse=True)
+    return chunk.ravel()
+
+# ==============================
+# Split
+# ==============================
+# Mesh -> [(center, Mesh)] per chunk, vertexs and medians relative to the
+# center of the chunk's bounding box (its CNT in the DNM). Faces keep their
+# order inside a chunk, vertexs their order in the mesh.
+def split(mesh, chunk):
+    if not len(chunk):
+        return []
+    nchunks = int(chunk.max()) + 1
+    nverts = len(mesh.co)
+
+    # Faces sorted by chunk
+    order = np.argsort(chunk, kind='mergesort')
+    total = mesh.face_total[order]
+    start = np.zeros(len(order), dtype=np.int64)
+    np.cumsum(total[:-1], out=start[1:])
+    ncorners = int(total.sum())
+    corners = np.repeat(mesh.face_start[order] - start, total) + np.arange(ncorners)
+    verts = mesh.face_verts[corners].astype(np.int64)
+    face_first = np.searchsorted(chunk[order], np.arange(nchunks + 1))
+
+    # Vertexs of every chunk: unique (chunk, vertex) pairs
+    corner_chunk = np.repeat(chunk[order], total)
+    keys, local = np.unique(corner_chunk * nverts + verts, return_inverse=True)
+    local = local.ravel()
+    source = keys % nverts
+    vert_first = np.searchsorted(keys // nverts, np.arange(nchunks + 1))
+    local -= vert_first[corner_chunk]
+
+    # Bounding box centers
+    co = mesh.co[source]
+    center = (np.minimum.reduceat(co, vert_first[:-1]) + np.maximum.reduceat(co, vert_first[:-1])) * np.float32(0.5)
+
+    median = mesh.median[order]
+    normal = mesh.normal[order]
+    material_index = mesh.material_index[order]
+    parts = []
+    for i in range(nchunks):
+        f0, f1 = face_first[i], face_first[i + 1]
+        v0, v1 = vert_first[i], vert_first[i + 1]
+        c0 = start[f0]
+        c1 = start[f1] if f1 < len(start) else ncorners
+        parts.append((center[i], core.Mesh(
+            co[v0:v1] - center[i], mesh.smooth[source[v0:v1]],
+            (start[f0:f1] - c0).astype(np.int32), total[f0:f1], local[c0:c1].astype(np.int32),
+            median[f0:f1] - center[i], normal[f0:f1], material_index[f0:f1], mesh.materials)))
+    return parts
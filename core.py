@@ -0,0 +1,792 @@
+import numpy as np
+
+# ==============================
+# Mesh Model
+# ==============================
+# Mesh in YSFlight space, ready to be written as SRF.
+# All arithmetic is done in single precision and in the same order
+# as BMesh (bm.transform, normal_update, calc_center_median_weighted),
+# so the output matches the BMesh based exporters.
+class Mesh:
+    __slots__ = ('co', 'smooth', 'face_start', 'face_total', 'face_verts',
+                 'median', 'normal', 'material_index', 'materials')
+
+    # Arrays handed over to worker processes
+    ARRAYS = ('co', 'smooth', 'face_start', 'face_total', 'face_verts', 'median', 'normal', 'material_index')
+
+    def __init__(self, co, smooth, face_start, face_total, face_verts, median, normal, material_index, materials):
+        # Vertexs
+        self.co = co
+        self.smooth = smooth
+        # Faces (vertex indices of face i are face_verts[face_start[i]:face_start[i] + face_total[i]])
+        self.face_start = face_start
+        self.face_total = face_total
+        self.face_verts = face_verts
+        self.median = median
+        self.normal = normal
+        self.material_index = material_index
+        # Material Table: one (color * 255, emit, alpha) per slot (None for
+        # an empty slot), None if the object has no material slots
+        self.materials = materials
+
+# Mesh Data as stored in Blender (object space, loops in any order)
+class Raw:
+    __slots__ = ('co', 'edge_verts', 'edge_sharp', 'loop_verts',
+                 'loop_start', 'loop_total', 'face_smooth', 'material_index')
+
+    def __init__(self, co, edge_verts, edge_sharp, loop_verts, loop_start, loop_total, face_smooth, material_index):
+        self.co = co
+        self.edge_verts = edge_verts
+        self.edge_sharp = edge_sharp
+        self.loop_verts = loop_verts
+        self.loop_start = loop_start
+        self.loop_total = loop_total
+        self.face_smooth = face_smooth
+        self.material_index = material_index
+
+    # Feed all arrays to a hashlib object
+    def update_hash(self, h):
+        for name in self.__slots__:
+            h.update(np.ascontiguousarray(getattr(self, name)).tobytes())
+
+# Phase of an optional stats.Profile
+class Idle:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+IDLE = Idle()
+
+def phase(profile, name):
+    return IDLE if profile is None else profile.phase(name)
+
+# Raw -> Mesh
+# matrix: 4x4 float32 (YS axis * world), local_axis: float32 offset or None
+def mesh(raw, matrix, local_axis, materials, profile=None):
+    loop_verts = raw.loop_verts
+    loop_start = raw.loop_start
+    loop_total = raw.loop_total
+    nverts = len(raw.co)
+    nloops = len(loop_verts)
+    nfaces = len(loop_start)
+
+    # Face Ordered Loops
+    face_start = np.zeros(nfaces, dtype=np.int32)
+    np.cumsum(loop_total[:-1], out=face_start[1:])
+    loops = np.repeat(loop_start - face_start, loop_total) + np.arange(nloops, dtype=np.int32)
+    face_verts = loop_verts[loops]
+
+    # ==============================
+    # Transform
+    # ==============================
+    with phase(profile, 'transform'):
+        co = transform(raw.co, matrix)
+
+    # ==============================
+    # Smoothing
+    # ==============================
+    # Vertex is smooth if no linked edge is sharp and any linked face is smooth
+    with phase(profile, 'smoothing'):
+        sharp = np.zeros(nverts, dtype=np.bool_)
+        sharp[raw.edge_verts[raw.edge_sharp].ravel()] = True
+        smooth = np.zeros(nverts, dtype=np.bool_)
+        smooth[face_verts[np.repeat(raw.face_smooth, loop_total)]] = True
+        smooth &= ~sharp
+
+    # ==============================
+    # Median and Normal
+    # ==============================
+    with phase(profile, 'normals'):
+        median = np.zeros((nfaces, 3), dtype=np.float32)
+        normal = np.zeros((nfaces, 3), dtype=np.float32)
+        for size in np.unique(loop_total):
+            index = np.flatnonzero(loop_total == size)
+            loops = face_start[index, None] + np.arange(size, dtype=np.int32)
+            fco = co[face_verts[loops]]
+            median[index] = median_weighted(fco)
+            normal[index] = face_normal(fco)
+        normal = -normal
+
+    mesh = Mesh(co, smooth, face_start, loop_total.copy(), face_verts, median, normal, raw.material_index, materials)
+    return mesh if local_axis is None else moved(mesh, local_axis)
+
+# Mesh with vertexs and medians relative to local_axis (float32 offset)
+def moved(mesh, local_axis):
+    return Mesh(mesh.co - local_axis, mesh.smooth, mesh.face_start, mesh.face_total, mesh.face_verts,
+                mesh.median - local_axis, mesh.normal, mesh.material_index, mesh.materials)
+
+# Meshes -> one Mesh
+# Vertex numbers and material slots are shifted per mesh; meshes without
+# material slots get one empty slot if any other mesh has some.
+def combine(meshes):
+    verts = np.cumsum([0] + [len(m.co) for m in meshes])
+    corners = np.cumsum([0] + [len(m.face_verts) for m in meshes])
+    face_verts = np.concatenate([m.face_verts + base for m, base in zip(meshes, verts.tolist())])
+    face_start = np.concatenate([m.face_start + base for m, base in zip(meshes, corners.tolist())])
+    if all(m.materials is None for m in meshes):
+        materials = None
+        material_index = np.concatenate([m.material_index for m in meshes])
+    else:
+        materials = []
+        material_index = []
+        for m in meshes:
+            table = m.materials if m.materials is not None else [None]
+            material_index.append(np.clip(m.material_index, 0, len(table) - 1) + len(materials))
+            materials.extend(table)
+        material_index = np.concatenate(material_index).astype(meshes[0].material_index.dtype)
+    return Mesh(np.concatenate([m.co for m in meshes]), np.concatenate([m.smooth for m in meshes]),
+                face_start.astype(np.int32), np.concatenate([m.face_total for m in meshes]),
+                face_verts.astype(np.int32), np.concatenate([m.median for m in meshes]),
+                np.concatenate([m.normal for m in meshes]), material_index, materials)
+
+# Matrix * Vertexs (mul_m4_v3)
+def transform(co, m):
+    x, y, z = co[:, 0], co[:, 1], co[:, 2]
+    result = np.empty_like(co)
+    for i in range(3):
+        result[:, i] = x * m[i, 0] + y * m[i, 1] + z * m[i, 2] + m[i, 3]
+    return result
+
+# Edge Length Weighted Median (calc_center_median_weighted)
+def median_weighted(fco):
+    size = fco.shape[1]
+    d = fco - np.roll(fco, -1, axis=1)
+    length = np.sqrt(d[..., 0] * d[..., 0] + d[..., 1] * d[..., 1] + d[..., 2] * d[..., 2])
+    center = np.zeros((len(fco), 3), dtype=np.float32)
+    total = np.zeros(len(fco), dtype=np.float32)
+    w_prev = length[:, size - 1]
+    for i in range(size):
+        w = length[:, i] + w_prev
+        center += fco[:, i] * w[:, None]
+        total += w
+        w_prev = length[:, i]
+    nonzero = total != 0.0
+    center[nonzero] *= (np.float32(1.0) / total[nonzero])[:, None]
+    return center
+
+# Face Normal (normal_update)
+def face_normal(fco):
+    size = fco.shape[1]
+    if size == 3:
+        n1 = fco[:, 0] - fco[:, 1]
+        n2 = fco[:, 1] - fco[:, 2]
+        n = cross(n1, n2)
+    elif size == 4:
+        n1 = fco[:, 0] - fco[:, 2]
+        n2 = fco[:, 1] - fco[:, 3]
+        n = cross(n1, n2)
+    else:
+        # Newell's Method
+        n = np.zeros((len(fco), 3), dtype=np.float32)
+        v_prev = fco[:, size - 1]
+        for i in range(size):
+            v_curr = fco[:, i]
+            n[:, 0] += (v_prev[:, 1] - v_curr[:, 1]) * (v_prev[:, 2] + v_curr[:, 2])
+            n[:, 1] += (v_prev[:, 2] - v_curr[:, 2]) * (v_prev[:, 0] + v_curr[:, 0])
+            n[:, 2] += (v_prev[:, 0] - v_curr[:, 0]) * (v_prev[:, 1] + v_curr[:, 1])
+            v_prev = v_curr
+    # Normalize
+    d = n[:, 0] * n[:, 0] + n[:, 1] * n[:, 1] + n[:, 2] * n[:, 2]
+    valid = d > np.float32(1.0e-35)
+    result = np.zeros_like(n)
+    result[valid] = n[valid] * (np.float32(1.0) / np.sqrt(d[valid]))[:, None]
+    return result
+
+def cross(n1, n2):
+    n = np.empty_like(n1)
+    n[:, 0] = n1[:, 1] * n2[:, 2] - n1[:, 2] * n2[:, 1]
+    n[:, 1] = n1[:, 2] * n2[:, 0] - n1[:, 0] * n2[:, 2]
+    n[:, 2] = n1[:, 0] * n2[:, 1] - n1[:, 1] * n2[:, 0]
+    return n
+
+# ==============================
+# Optimization
+# ==============================
+# Powers of ten for counting digits
+POW10 = 10 ** np.arange(1, 19, dtype=np.int64)
+
+# Decimal digits of non-negative integers
+def digits(n):
+    return np.searchsorted(POW10, n, side='right') + 1
+
+# One int64 per row, equal for equal rows and ordered as the rows
+# (np.unique(axis=0) needs NumPy 1.13; Blender 2.7x ships 1.9/1.10).
+# Columns are ranked one at a time and packed into the key so far.
+def row_keys(rows):
+    key = np.zeros(len(rows), dtype=np.int64)
+    for column in np.asarray(rows).T:
+        _, rank = np.unique(column, return_inverse=True)
+        _, key = np.unique(key * (int(rank.max()) + 1 if len(rank) else 1) + rank.ravel(), return_inverse=True)
+        key = key.ravel().astype(np.int64)
+    return key
+
+# Bytes of 'V x y z R' records
+def vertex_bytes(co, smooth):
+    value = co.astype(np.float64)
+    whole = np.round(np.abs(value) * 1.0e4).astype(np.int64) // 10000
+    # ' ' + [-] + digits + '.0000' per coordinate
+    numbers = (1 + np.signbit(value) + digits(whole) + 5).sum(axis=1)
+    return int((1 + numbers + 1 + smooth + 1).sum())
+
+# Vertex Welder
+# Welds vertexs printed the same (4 decimals, same R flag) and drops
+# vertexs no face uses. Coordinates are hashed to grid cells of the
+# output precision; equal cells are found in one vectorized pass.
+# Corners welded onto the next corner of their face are dropped, and so
+# are faces left with fewer than 3 distinct vertexs (slivers in YSFlight).
+class Welder:
+    def __init__(self):
+        self.vertices = 0
+        self.faces = 0
+        self.bytes = 0
+
+    def apply(self, mesh):
+        nverts = len(mesh.co)
+        used = np.zeros(nverts, dtype=np.bool_)
+        used[mesh.face_verts] = True
+        keep = np.flatnonzero(used)
+
+        # Grid cell (and smoothing) of every used vertex
+        cell = np.empty((len(keep), 4), dtype=np.int64)
+        cell[:, :3] = np.round(mesh.co[keep].astype(np.float64) * 1.0e4)
+        cell[:, 3] = mesh.smooth[keep]
+        if len(keep):
+            _, first, inverse = np.unique(row_keys(cell), return_index=True, return_inverse=True)
+        else:
+            first = inverse = np.zeros(0, dtype=np.int64)
+        if len(first) == nverts:
+            return mesh
+
+        # New vertexs in the order they first appear
+        order = np.argsort(first)
+        rank = np.empty_like(order)
+        rank[order] = np.arange(len(order))
+        remap = np.full(nverts, -1, dtype=np.int32)
+        remap[keep] = rank[inverse.ravel()]
+        source = keep[first[order]]
+        co = mesh.co[source]
+        smooth = mesh.smooth[source]
+        welded = Mesh(co, smooth, mesh.face_start, mesh.face_total, remap[mesh.face_verts],
+                      mesh.median, mesh.normal, mesh.material_index, mesh.materials)
+
+        # Savings
+        self.vertices += nverts - len(source)
+        self.bytes += (vertex_bytes(mesh.co, mesh.smooth) - vertex_bytes(co, smooth)
+                       + int(digits(mesh.face_verts).sum() - digits(welded.face_verts).sum()))
+
+        # Faces with a repeated corner
+        nfaces = len(mesh.face_total)
+        total = mesh.face_total.astype(np.int64)
+        start = np.zeros(nfaces, dtype=np.int64)
+        np.cumsum(total[:-1], out=start[1:])
+        ncorners = int(total.sum())
+        corner_face = np.repeat(np.arange(nfaces), total)
+        verts = welded.face_verts[np.repeat(mesh.face_start - start, total) + np.arange(ncorners)]
+        following = np.arange(1, ncorners + 1)
+        last = total > 0
+        following[(start + total - 1)[last]] = start[last]
+        corner = verts != verts[following]
+        pairs = np.unique(corner_face[corner] * len(source) + verts[corner])
+        faces = np.bincount(pairs // max(len(source), 1), minlength=nfaces) >= 3
+        corner &= faces[corner_face]
+        if corner.all():
+            return welded
+
+        # Faces without the repeated corners
+        changed = np.bincount(corner_face[~corner], minlength=nfaces) > 0
+        face_total = np.bincount(corner_face[corner], minlength=nfaces)[faces].astype(mesh.face_total.dtype)
+        face_start = np.zeros(len(face_total), dtype=np.int32)
+        np.cumsum(face_total[:-1], out=face_start[1:])
+        result = Mesh(co, smooth, face_start, face_total, verts[corner].astype(np.int32),
+                      mesh.median[faces], mesh.normal[faces], mesh.material_index[faces], mesh.materials)
+        self.faces += nfaces - int(faces.sum())
+        self.bytes += (face_bytes(welded, np.flatnonzero(changed)) - face_bytes(result, np.flatnonzero(changed[faces]))
+                       + za_bytes(welded) - za_bytes(result))
+        # Again for the vertexs only dropped faces used
+        return self.apply(result)
+
+    def summary(self):
+        return 'Welded {:d} vertexs, dropped {:d} faces, {:d} bytes saved'.format(self.vertices, self.faces, self.bytes)
+
+# Bytes of the F ... E records of the faces in index
+def face_bytes(mesh, index):
+    lines = slots = None
+    if mesh.materials is not None:
+        table = MaterialTable(mesh.materials)
+        lines = table.lines
+        slots = table.slots(mesh)[index]
+    return len(face_text(lines, slots, mesh.face_start[index], mesh.face_total[index], mesh.face_verts,
+                         mesh.median[index], mesh.normal[index]))
+
+# Bytes of the ZA lines (' face za' entries, 8 per line)
+def za_bytes(mesh):
+    if mesh.materials is None:
+        return 0
+    table = MaterialTable(mesh.materials)
+    slots = table.slots(mesh)
+    index = np.flatnonzero(table.transparent[slots])
+    za = np.array([len(value or '') for value in table.za], dtype=np.int64)
+    return int((1 + digits(index) + 1 + za[slots[index]]).sum()) + 3 * ((len(index) + 7) // 8)
+
+# Largest polygon the merger builds (keeps every join test short)
+MAX_SIDES = 64
+# Planes closer than half the output precision count as the same
+PLANE_DISTANCE = 5.0e-5
+PLANE_COS = 1.0 - 1.0e-9
+
+# Coplanar Face Merger
+# Merges neighbouring faces of the same material lying in one plane into
+# convex polygons. Neighbours come from a half-edge index (edge a->b of a
+# face meets edge b->a of the face next to it), so every face is tried a
+# few times at most. All vertexs on a polygon border are kept, so no
+# T-junction appears, and faces around a smooth (R) vertex are merged only
+# if all of them are coplanar, so no vertex normal changes.
+class Merger:
+    def __init__(self):
+        self.faces = 0
+        self.polygons = 0
+
+    def apply(self, mesh):
+        nfaces = len(mesh.face_total)
+        if nfaces < 2:
+            return mesh
+        co = mesh.co.astype(np.float64)
+        normal = mesh.normal.astype(np.float64)
+        total = mesh.face_total.astype(np.int64)
+        first = np.zeros(nfaces, dtype=np.int64)
+        np.cumsum(total[:-1], out=first[1:])
+        ncorners = int(total.sum())
+        corner_face = np.repeat(np.arange(nfaces), total)
+        corners = np.repeat(mesh.face_start - first, total) + np.arange(ncorners)
+        verts = mesh.face_verts[corners].astype(np.int64)
+        following = np.arange(1, ncorners + 1)
+        following[first + total - 1] = first
+
+        # ==============================
+        # Planes
+        # ==============================
+        length = np.sqrt((normal * normal).sum(axis=1))
+        flat = length > 0.5
+        normal[flat] /= length[flat, None]
+        offset = -(normal * co[verts[first]]).sum(axis=1)
+        distance = np.abs((normal[corner_face] * co[verts]).sum(axis=1) + offset[corner_face])
+        np.logical_and.at(flat, corner_face, distance < PLANE_DISTANCE)
+
+        # Smooth vertexs need all their faces in one plane
+        order = np.argsort(verts, kind='mergesort')
+        _, head = np.unique(verts[order], return_index=True)
+        owner = np.empty(ncorners, dtype=np.int64)
+        owner[order] = corner_face[order[np.repeat(head, np.diff(np.append(head, ncorners)))]]
+        same = ((normal[corner_face] * normal[owner]).sum(axis=1) >= PLANE_COS) & flat[corner_face]
+        same &= np.abs((normal[owner] * co[verts]).sum(axis=1) + offset[owner]) < PLANE_DISTANCE
+        curved = np.zeros(len(co), dtype=np.bool_)
+        curved[verts[~same]] = True
+        curved &= mesh.smooth
+        mergeable = flat.copy()
+        np.logical_and.at(mergeable, corner_face, ~curved[verts])
+
+        # ==============================
+        # Half-Edge Index
+        # ==============================
+        # Face across every corner edge, -1 on borders and non-manifold edges
+        nverts = len(co)
+        edge = verts * nverts + verts[following]
+        twin = verts[following] * nverts + verts
+        sort = np.argsort(edge)
+        found = np.searchsorted(edge[sort], twin)
+        found = np.minimum(found, ncorners - 1)
+        unique = np.ones(ncorners, dtype=np.bool_)
+        repeated = edge[sort][1:] == edge[sort][:-1]
+        unique[sort[1:][repeated]] = False
+        unique[sort[:-1][repeated]] = False
+        match = sort[found]
+        across = np.where((edge[match] == twin) & unique & unique[match], corner_face[match], -1)
+
+        # ==============================
+        # Region Growing
+        # ==============================
+        # Faces printed with the same C/B lines and ZA value match
+        material = mesh.material_index.tolist()
+        if mesh.materials is not None:
+            table = MaterialTable(mesh.materials)
+            keys = list(zip(table.lines, table.za))
+            material = [keys[slot] for slot in table.slots(mesh).tolist()]
+        points = co.tolist()
+        normals = normal.tolist()
+        offsets = offset.tolist()
+        mergeable = mergeable.tolist()
+        corner_verts = verts
+        verts = verts.tolist()
+        across = across.tolist()
+        first = first.tolist()
+        total = total.tolist()
+        for face in range(nfaces):
+            if mergeable[face] and total[face] > 3:
+                loop = verts[first[face]:first[face] + total[face]]
+                mergeable[face] = all(turns(loop, i, points, normals[face]) for i in range(len(loop)))
+        region = [-1] * nfaces
+        polygons = []
+        for seed in range(nfaces):
+            if region[seed] >= 0:
+                continue
+            region[seed] = seed
+            loop = verts[first[seed]:first[seed] + total[seed]]
+            count = 1
+            if mergeable[seed]:
+                n = normals[seed]
+                d = offsets[seed]
+                stack = across[first[seed]:first[seed] + total[seed]]
+                while stack:
+                    face = stack.pop()
+                    if face < 0 or region[face] >= 0 or not mergeable[face] or material[face] != material[seed]:
+                        continue
+                    m = normals[face]
+                    p = points[verts[first[face]]]
+                    if (n[0] * m[0] + n[1] * m[1] + n[2] * m[2] < PLANE_COS
+                            or abs(n[0] * p[0] + n[1] * p[1] + n[2] * p[2] + d) >= PLANE_DISTANCE):
+                        continue
+                    joined = join(loop, verts[first[face]:first[face] + total[face]])
+                    if joined is None:
+                        continue
+                    # Only the corners at both ends of the shared edge change
+                    joined, i, j = joined
+                    if not (turns(joined, i, points, n) and turns(joined, j, points, n)):
+                        continue
+                    loop = joined
+                    region[face] = seed
+                    count += 1
+                    stack.extend(across[first[face]:first[face] + total[face]])
+            polygons.append((seed, loop, count))
+        if len(polygons) == nfaces:
+            return mesh
+
+        # ==============================
+        # Output
+        # ==============================
+        seeds = np.array([seed for seed, loop, count in polygons], dtype=np.int64)
+        face_total = np.array([len(loop) for seed, loop, count in polygons], dtype=np.int32)
+        face_verts = np.fromiter((v for seed, loop, count in polygons for v in loop), dtype=np.int64, count=int(face_total.sum()))
+        merged = np.array([count > 1 for seed, loop, count in polygons], dtype=np.bool_)
+        face_start = np.zeros(len(polygons), dtype=np.int32)
+        np.cumsum(face_total[:-1], out=face_start[1:])
+        self.faces += sum(count for seed, loop, count in polygons if count > 1)
+        self.polygons += int(merged.sum())
+
+        # Vertexs left inside merged polygons are dropped, all others stay
+        grown = np.zeros(nfaces, dtype=np.bool_)
+        grown[seeds[merged]] = True
+        inside = np.zeros(nverts, dtype=np.bool_)
+        inside[corner_verts[grown[np.array(region, dtype=np.int64)][corner_face]]] = True
+        used = np.zeros(nverts, dtype=np.bool_)
+        used[face_verts] = True
+        used |= ~inside
+        remap = np.cumsum(used, dtype=np.int32) - 1
+        new_co = mesh.co[used]
+        face_verts = remap[face_verts]
+
+        # Merged polygons get a new median, every face keeps its normal
+        median = mesh.median[seeds]
+        for size in np.unique(face_total[merged]):
+            index = np.flatnonzero(merged & (face_total == size))
+            fco = new_co[face_verts[face_start[index, None] + np.arange(size, dtype=np.int32)]]
+            median[index] = median_weighted(fco)
+
+        return Mesh(new_co, mesh.smooth[used], face_start, face_total, face_verts,
+                    median, mesh.normal[seeds], mesh.material_index[seeds], mesh.materials)
+
+    def summary(self):
+        return 'Merged {:d} faces into {:d} polygons'.format(self.faces, self.polygons)
+
+# Polygon loop + face across one shared edge: (loop, i, j) where i and j
+# are the ends of the old edge in the new loop, or None
+def join(loop, face):
+    size = len(loop)
+    if size + len(face) - 2 > MAX_SIDES:
+        return None
+    shared = []
+    for k in range(len(face)):
+        b = face[k - 1]
+        a = face[k]
+        if a in loop and b in loop:
+            i = loop.index(a)
+            if loop[(i + 1) % size] == b:
+                shared.append(i)
+    if len(shared) != 1:
+        return None
+    i = shared[0]
+    j = face.index(loop[i])
+    middle = (face[j:] + face[:j])[1:-1]
+    if not set(middle).isdisjoint(loop):
+        return None
+    return loop[:i + 1] + middle + loop[i + 1:], i, (i + len(middle) + 1) % (size + len(middle))
+
+# Corner i of a loop is convex or straight
+# (face normals point against the loop order, see mesh)
+def turns(loop, i, points, n):
+    a = points[loop[i - 1]]
+    b = points[loop[i]]
+    c = points[loop[(i + 1) % len(loop)]]
+    ux, uy, uz = b[0] - a[0], b[1] - a[1], b[2] - a[2]
+    vx, vy, vz = c[0] - b[0], c[1] - b[1], c[2] - b[2]
+    turn = n[0] * (uy * vz - uz * vy) + n[1] * (uz * vx - ux * vz) + n[2] * (ux * vy - uy * vx)
+    return turn <= 1.0e-9 * ((ux * ux + uy * uy + uz * uz) * (vx * vx + vy * vy + vz * vz)) ** 0.5
+
+# Optional passes over an output mesh (Welder, Merger or None)
+def optimize(mesh, welder=None, merger=None, profile=None):
+    if welder is not None:
+        with phase(profile, 'weld'):
+            mesh = welder.apply(mesh)
+    if merger is not None:
+        with phase(profile, 'merge'):
+            mesh = merger.apply(mesh)
+    return mesh
+
+# ==============================
+# SRF Output
+# ==============================
+# Slot without a material (Blender draws it in its default gray)
+DEFAULT_MATERIAL = ((204.0, 204.0, 204.0), False, 1.0)
+
+# Material Table
+# Pre-formatted C/B lines and ZA value of every slot, so faces only look
+# their slot up. Faces past the last slot use the last one, as in Blender.
+class MaterialTable:
+    def __init__(self, materials):
+        self.lines = []
+        self.emit = np.zeros(len(materials), dtype=np.bool_)
+        self.za = []
+        for i, material in enumerate(materials):
+            color, emit, alpha = DEFAULT_MATERIAL if material is None else material
+            self.lines.append('C {:.0f} {:.0f} {:.0f}\n{}'.format(color[0], color[1], color[2], 'B\n' if emit else ''))
+            self.emit[i] = emit
+            self.za.append('{:.0f}'.format((1.0 - alpha) * 228.0) if alpha < 1.0 else None)
+        self.transparent = np.array([za is not None for za in self.za], dtype=np.bool_)
+
+    # Slot of every face
+    def slots(self, mesh):
+        return np.clip(mesh.material_index, 0, len(self.lines) - 1)
+
+# Bulk Text
+# Numbers are written '{:.4f}'. Whole arrays are scaled to integer
+# 1/10000 units in float64; values too close to a rounding tie for the
+# float64 product to be trusted are formatted by Python and read back,
+# so the text is exactly what str.format writes ('-0.0000' included).
+# Records are built as byte matrices, 0 marking empty cells, and joined
+# by dropping the empty cells.
+
+# Rows formatted at once (bounds the size of the byte matrices)
+TEXT_BLOCK = 1 << 16
+# Larger magnitudes (and nan/inf) are formatted record by record
+FIXED_LIMIT = 1.0e11
+
+# float array -> (sign bits, units of 1/10000) as '{:.4f}' rounds them,
+# None if some value can't be written in bulk
+def fixed4(values):
+    values = np.asarray(values, dtype=np.float64)
+    scaled = np.abs(values) * 1.0e4
+    if scaled.size and not scaled.max() < FIXED_LIMIT * 1.0e4:
+        return None
+    units = np.floor(scaled + 0.5)
+    tie = np.abs(scaled - np.floor(scaled) - 0.5) <= scaled * 2.0 ** -50
+    units = units.astype(np.int64)
+    if tie.any():
+        flat = units.reshape(-1)
+        for i, value in zip(np.flatnonzero(tie).tolist(), values.reshape(-1)[tie.reshape(-1)].tolist()):
+            whole, part = '{:.4f}'.format(value).lstrip('-').split('.')
+            flat[i] = int(whole) * 10000 + int(part)
+    return np.signbit(values), units
+
+# Non-negative integers -> right aligned ASCII digits
+def decimal_matrix(n):
+    width = int(digits(n.max())) if len(n) else 1
+    count = digits(n)
+    out = np.zeros((len(n), width), dtype=np.uint8)
+    for k in range(width):
+        power = width - 1 - k
+        out[:, k] = np.where(count > power, 48 + (n // 10 ** power) % 10, 0)
+    return out
+
+# (sign bits, units) -> '[-]digits.dddd' cells
+def fixed_matrix(negative, units):
+    part = units % 10000
+    fraction = np.empty((len(units), 5), dtype=np.uint8)
+    fraction[:, 0] = 46
+    for k in range(4):
+        fraction[:, 1 + k] = 48 + (part // 10 ** (3 - k)) % 10
+    sign = np.where(negative, 45, 0).astype(np.uint8)[:, None]
+    return np.concatenate([sign, decimal_matrix(units // 10000), fraction], axis=1)
+
+# Columns (byte matrices, or bytes repeated on every row) -> one byte
+# matrix; the cells actually written are the non-zero ones
+def row_matrix(columns, nrows):
+    return np.concatenate([
+        np.tile(np.frombuffer(column, dtype=np.uint8), (nrows, 1))
+        if isinstance(column, bytes) else column for column in columns], axis=1)
+
+# Space separated '{:.4f}' cells of every column of values
+def fixed_columns(values):
+    result = fixed4(values)
+    if result is None:
+        return None
+    negative, units = result
+    columns = []
+    for i in range(values.shape[1]):
+        columns += [b' ', fixed_matrix(negative[:, i], units[:, i])]
+    return columns[1:]
+
+# 'V x y z R' records of a block of vertexs
+def vertex_text(co, smooth):
+    numbers = fixed_columns(co)
+    if numbers is None:
+        return ''.join('V {:.4f} {:.4f} {:.4f} {}\n'.format(x, y, z, 'R' if s else '')
+                       for (x, y, z), s in zip(co.tolist(), smooth.tolist()))
+    flag = np.where(smooth, 82, 0).astype(np.uint8)[:, None]
+    cells = row_matrix([b'V '] + numbers + [b' ', flag, b'\n'], len(co)).ravel()
+    return cells[cells != 0].tobytes().decode('ascii')
+
+# 'F ... E' records of a block of faces: the F/C/B/N/V head of every face
+# and the ' vid' tokens of its corners are interleaved by offsets
+def face_text(lines, slots, start, total, face_verts, median, normal):
+    nfaces = len(total)
+    numbers = fixed_columns(np.concatenate([median, normal], axis=1))
+    if numbers is None or not total.all():
+        heads = [lines[slot] for slot in slots.tolist()] if lines is not None else [''] * nfaces
+        face_verts = face_verts.tolist()
+        return ''.join(
+            'F\n{}N {:.4f} {:.4f} {:.4f} {:.4f} {:.4f} {:.4f}\nV{}\nE\n'.format(
+                head, mx, my, mz, nx, ny, nz, ''.join(' {:d}'.format(vid) for vid in face_verts[s:s + t]))
+            for head, s, t, (mx, my, mz), (nx, ny, nz)
+            in zip(heads, start.tolist(), total.tolist(), median.tolist(), normal.tolist()))
+
+    # F, material lines, N, 'V'
+    columns = [b'F\n']
+    if lines is not None:
+        encoded = [line.encode('ascii') for line in lines]
+        table = np.zeros((len(encoded), max(len(line) for line in encoded) or 1), dtype=np.uint8)
+        for i, line in enumerate(encoded):
+            table[i, :len(line)] = np.frombuffer(line, dtype=np.uint8)
+        columns.append(table[slots])
+    head = row_matrix(columns + [b'N '] + numbers + [b'\nV'], nfaces)
+    head_length = (head != 0).sum(axis=1)
+    head = head.ravel()
+    head = head[head != 0]
+
+    # ' vid' per corner
+    ncorners = int(total.sum())
+    first = np.zeros(nfaces, dtype=np.int64)
+    np.cumsum(total[:-1], out=first[1:])
+    verts = face_verts[np.repeat(start - first, total) + np.arange(ncorners)].astype(np.int64)
+    token = row_matrix([b' ', decimal_matrix(verts)], ncorners)
+    token_length = np.add.reduceat((token != 0).sum(axis=1), first)
+    token = token.ravel()
+    token = token[token != 0]
+
+    # Head, tokens, '\nE\n' of face after face
+    length = head_length + token_length + 3
+    offset = np.zeros(nfaces, dtype=np.int64)
+    np.cumsum(length[:-1], out=offset[1:])
+    out = np.empty(int(length.sum()), dtype=np.uint8)
+    head_first = np.cumsum(head_length) - head_length
+    out[np.repeat(offset - head_first, head_length) + np.arange(len(head))] = head
+    token_first = np.cumsum(token_length) - token_length
+    out[np.repeat(offset + head_length - token_first, token_length) + np.arange(len(token))] = token
+    tail = (offset + head_length + token_length)[:, None] + np.arange(3)
+    out[tail] = np.frombuffer(b'\nE\n', dtype=np.uint8)
+    return out.tobytes().decode('ascii')
+
+# Number of lines the SRF records of a mesh take (for the PCK header)
+def line_count(mesh):
+    nfaces = len(mesh.face_total)
+    # SURF, V..., F/N/V/E per face, E
+    count = 1 + len(mesh.co) + 4 * nfaces + 1
+    if mesh.materials is not None and nfaces:
+        table = MaterialTable(mesh.materials)
+        slots = table.slots(mesh)
+        # C, B and ZA (8 entries per line)
+        count += nfaces + int(table.emit[slots].sum())
+        count += (int(table.transparent[slots].sum()) + 7) // 8
+    return count
+
+# SRF Records (in blocks of TEXT_BLOCK vertexs or faces)
+def records(mesh):
+    yield 'SURF\n'
+
+    # Vertexs
+    for i in range(0, len(mesh.co), TEXT_BLOCK):
+        yield vertex_text(mesh.co[i:i + TEXT_BLOCK], mesh.smooth[i:i + TEXT_BLOCK])
+
+    # Faces (with the C/B lines of their material)
+    nfaces = len(mesh.face_total)
+    lines = slots = None
+    if mesh.materials is not None:
+        table = MaterialTable(mesh.materials)
+        slots = table.slots(mesh)
+        lines = table.lines
+    for i in range(0, nfaces, TEXT_BLOCK):
+        block = slice(i, i + TEXT_BLOCK)
+        yield face_text(lines, None if slots is None else slots[block], mesh.face_start[block],
+                        mesh.face_total[block], mesh.face_verts, mesh.median[block], mesh.normal[block])
+
+    # Footer
+    yield 'E\n'
+
+    # For Transparent: all ZA entries in one pass (8 entries per line)
+    if mesh.materials is not None:
+        index = np.flatnonzero(table.transparent[slots])
+        za = table.za
+        entries = [' {:d} {}'.format(i, za[slot]) for i, slot in zip(index.tolist(), slots[index].tolist())]
+        for i in range(0, len(entries), 8):
+            yield 'ZA{}\n'.format(''.join(entries[i:i + 8]))
+
+# SRF File
+def write_srf(out, mesh):
+    for record in records(mesh):
+        out.write(record)
+
+# PCK Node
+def write_pck(out, name, mesh):
+    out.write('PCK {} {:d}\n'.format(name, line_count(mesh)))
+    write_srf(out, mesh)
+    out.write('\n')
+
+# SRF Text (whole surface as one string)
+def srf(mesh):
+    return ''.join(records(mesh))
+
+# ==============================
+# DNM Output
+# ==============================
+# SRF Node (pos, cnt in YSFlight space, children as uids)
+def srf_node(uid, name, pos, cnt, children, cla=0):
+    output = []
+
+    # Status
+    output.append('SRF "{:d}"\n'.format(uid))
+    output.append('FIL {}\n'.format(name))
+    output.append('CLA {:d}\n'.format(cla))
+    output.append('NST 0\n')
+
+    # Axis
+    output.append('POS {:.4f} {:.4f} {:.4f} 0 0 0 1\n'.format(*pos))
+    output.append('CNT {:.4f} {:.4f} {:.4f}\n'.format(*cnt))
+
+    # Parent-Children Relation
+    output.append('REL DEP\n')
+    output.append('NCH {:d}\n'.format(len(children)))
+    for child in children:
+        output.append('CLD "{:d}"\n'.format(child))
+    output.append('END\n')
+
+    return ''.join(output)
+
+# Whole DNM: parts are (name, mesh), nodes are srf_node arguments
+def write_dnm(out, parts, nodes):
+    out.write('DYNAMODEL\n')
+    out.write('DNMVER 1\n')
+    for name, part in parts:
+        write_pck(out, name, part)
+    for node in nodes:
+        out.write(srf_node(*node))
+    out.write('END\n')
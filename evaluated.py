@@ -0,0 +1,116 @@
+import collections
+import bpy
+from bpy.app.handlers import persistent
+from . import lazy
+
+# Loaded on first export
+geometry = lazy.Module('.geometry')
+
+# Memory the session cache may use
+LIMIT = 512 << 20
+
+# Evaluated Mesh Cache
+# Object space arrays of meshes with modifiers applied, least recently
+# used first. Keys are (object name, change counter), so an entry is
+# never reused after its object changed; old entries age out.
+class MeshCache:
+    def __init__(self, limit=LIMIT):
+        self.limit = limit
+        self.entries = collections.OrderedDict()
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        raw = self.entries.get(key)
+        if raw is None:
+            self.misses += 1
+            return None
+        self.entries.move_to_end(key)
+        self.hits += 1
+        return raw
+
+    def put(self, key, raw):
+        nbytes = raw_size(raw)
+        if nbytes > self.limit:
+            return
+        if key in self.entries:
+            self.size -= raw_size(self.entries.pop(key))
+        self.entries[key] = raw
+        self.size += nbytes
+        while self.size > self.limit:
+            self.size -= raw_size(self.entries.popitem(last=False)[1])
+
+    def clear(self):
+        self.entries.clear()
+        self.size = 0
+
+def raw_size(raw):
+    return sum(getattr(raw, name).nbytes for name in raw.__slots__)
+
+# Session State
+session = MeshCache()
+counters = {}
+material_changes = 0
+# PCK cache keys (and vertex/face counts) of objects by stamp(), so parts
+# unchanged since their last export are neither read nor hashed again
+keys = {}
+
+# Count changes of every object (transform, data, modifiers) and of the
+# materials
+@persistent
+def scene_update(scene):
+    global material_changes
+    if bpy.data.materials.is_updated:
+        material_changes += 1
+    if not (bpy.data.objects.is_updated or bpy.data.meshes.is_updated):
+        return
+    for obj in scene.objects:
+        if obj.is_updated or obj.is_updated_data:
+            counters[obj.name] = counters.get(obj.name, 0) + 1
+
+# Undo and file loads replace data without update tags
+@persistent
+def reset(dummy):
+    global material_changes
+    session.clear()
+    counters.clear()
+    keys.clear()
+    material_changes = 0
+
+# Equal stamps: object, mesh data and materials unchanged this session
+def stamp(obj):
+    return (obj.name, counters.get(obj.name, 0), material_changes)
+
+# Mesh data of an object with modifiers applied
+def read(obj, scene):
+    key = (obj.name, counters.get(obj.name, 0))
+    raw = session.get(key)
+    if raw is None:
+        me = obj.to_mesh(scene, True, 'PREVIEW')
+        try:
+            raw = geometry.read(me)
+        finally:
+            bpy.data.meshes.remove(me)
+        session.put(key, raw)
+    return raw
+
+HANDLERS = (
+    (bpy.app.handlers.scene_update_post, scene_update),
+    (bpy.app.handlers.load_post, reset),
+    (bpy.app.handlers.undo_post, reset),
+    (bpy.app.handlers.redo_post, reset),
+)
+
+# Regist
+def register():
+    for handlers, handler in HANDLERS:
+        if handler not in handlers:
+            handlers.append(handler)
+
+# Unregist
+def unregister():
+    for handlers, handler in HANDLERS:
+        if handler in handlers:
+            handlers.remove(handler)
+    reset(None)
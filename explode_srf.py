@@ -1,9 +1,19 @@
 import os
+import time
+import shutil
 import bpy
-import bmesh
-import mathutils
-from bpy.props import (BoolProperty, FloatProperty, StringProperty, EnumProperty)
+from bpy.props import (BoolProperty, FloatProperty, IntProperty, StringProperty, EnumProperty)
 from bpy_extras.io_utils import (ImportHelper, ExportHelper, unpack_list, unpack_face_list, axis_conversion)
+from . import tasks, evaluated, lazy
+
+# Loaded on first export
+core = lazy.Module('.core')
+geometry = lazy.Module('.geometry')
+writer = lazy.Module('.writer')
+parallel = lazy.Module('.parallel')
+stats = lazy.Module('.stats')
+lod = lazy.Module('.lod')
+tempfile = lazy.Module('tempfile')
 
 # Infomation
 bl_info = {
@@ -30,125 +40,189 @@ class ExplodeSRF(bpy.types.Operator, ExportHelper):
     )
     check_extension = True
     filename_ext = '.srf'
+    workers = IntProperty(
+        name = 'Workers',
+        description = 'Number of processes writing part files (1 = no parallel export)',
+        default = 1,
+        min = 1,
+        max = 64,
+    )
+    use_modifiers = BoolProperty(
+        name = 'Apply Modifiers',
+        description = 'Export meshes with their modifiers applied (the .blend is not changed)',
+        default = False,
+    )
+    use_weld = BoolProperty(
+        name = 'Weld Vertexs',
+        description = 'Merge vertexs printed at the same position with the same smoothing, and drop vertexs no face uses',
+        default = False,
+    )
+    use_merge = BoolProperty(
+        name = 'Merge Coplanar Faces',
+        description = 'Join neighbouring faces with the same material in one plane into convex polygons (no visual change)',
+        default = False,
+    )
+    lod_levels = IntProperty(
+        name = 'LOD Levels',
+        description = 'Number of reduced-detail files written next to every part (<part>_lod1.srf, ...)',
+        default = 0,
+        min = 0,
+        max = 4,
+    )
+    lod_ratio = FloatProperty(
+        name = 'LOD Ratio',
+        description = 'Share of the triangles every LOD level keeps of the level before',
+        default = 0.5,
+        min = 0.05,
+        max = 0.95,
+    )
+    use_profile = BoolProperty(
+        name = 'Profile Export',
+        description = 'Time every phase and part, report a summary and save <file>.profile.json next to the output',
+        default = False,
+    )
+    use_cprofile = BoolProperty(
+        name = 'Dump cProfile',
+        description = 'With Profile Export, also save <file>.prof for pstats',
+        default = False,
+    )
+    use_background = BoolProperty(
+        name = 'Run in Background',
+        description = 'Export in slices with a progress bar, the view can be moved meanwhile (Esc cancels)',
+        default = False,
+    )
 
     # On Click Save Button
     def execute(self, context):
+        return tasks.start(self, context, self.steps(context.scene), self.use_background)
+
+    def modal(self, context, event):
+        return tasks.step(self, context, event)
+
+    # Export Steps
+    # Yields (done, total) after every part. Each part file is replaced
+    # atomically, so cancelling (Esc) never leaves a half-written one.
+    def steps(self, scene):
         # ==============================
         # Getting Data
         # ==============================
-        # Currently Scene
-        scene = context.scene
         # Rotation(Option)
-        global_matrix = mathutils.Matrix((
-            (-1.0,  0.0,  0.0,  0.0),
-            ( 0.0,  0.0,  1.0,  0.0),
-            ( 0.0, -1.0,  0.0,  0.0),
-            ( 0.0,  0.0,  0.0,  1.0),
-        ))
-        # Selected Object
-        for object in scene.objects:
-            export(object, self.filepath, global_matrix)
-        return {'FINISHED'}
-
-def export(object, filepath, global_matrix):
-    me = object.data
-    for objects in object.children:
-        export(objects, filepath, global_matrix)
-    if isinstance(me, bpy.types.Mesh):
-        # Convert to BMesh(For N-Sided Polygon)
-        bm = bmesh.new()
-        bm.from_mesh(me)
-        # Rotation(Option)
-        bm.transform(global_matrix * object.matrix_world)
-        bm.normal_update()
-
-        # Vertexs and Faces
-        verts = bm.verts
-        faces = bm.faces
+        global_matrix = geometry.ys_matrix
+        # Selected Object (scene.objects already holds every child once)
+        objects = [ob for ob in scene.objects if isinstance(ob.data, bpy.types.Mesh)]
+        profile = stats.Profile(self.filepath, self.use_cprofile) if self.use_profile else None
+        if profile is not None:
+            profile.start()
+        welder = core.Welder() if self.use_weld else None
+        merger = core.Merger() if self.use_merge else None
+        ratios = [self.lod_ratio] * self.lod_levels
 
         # ==============================
         # Output
         # ==============================
-        # Save File
-        filepath = '{0}/{1}.srf'.format(os.path.dirname(filepath), object.name)
-        filepath = os.fsencode(filepath)
-        fp = open(filepath, 'w')
-
-        # For Transparent
-        za = ''
-        zacount = 0
-
-        # Header
-        fp.write('SURF\n')
-
-        # Vertexs
-        for vert in verts:
-            fp.write('V {:.4f} {:.4f} {:.4f} '.format(*vert.co))
-            # Smoothing
-            smooth = True
-            for edge in vert.link_edges:
-                if edge.smooth == False:
-                    smooth = False
-                    break
-            if smooth:
-                for face in vert.link_faces:
-                    if face.smooth:
-                        fp.write('R')
-                        break
-            fp.write('\n')
-
-        # Faces
-        for face in faces:
-            fp.write('F\n')
-
-            # Has Material?
-            if len(object.material_slots):
-                # Getting Material
-                material = object.material_slots[face.material_index].material
-                # Color
-                color = material.diffuse_color * 255.0
-                fp.write('C {:.0f} {:.0f} {:.0f}\n'.format(*color))
-                # Lighting
-                if material.emit > 0.0:
-                    fp.write('B\n')
-                # Transparent
-                if material.alpha < 1.0:
-                    if zacount == 0:
-                        za = 'ZA {:d} {:.0f}'.format(face.index, (1.0 - material.alpha) * 228.0)
-                    elif zacount % 8 == 0:
-                        za += '\nZA {:d} {:.0f}'.format(face.index, (1.0 - material.alpha) * 228.0)
-                    else:
-                        za += ' {:d} {:.0f}'.format(face.index, (1.0 - material.alpha) * 228.0)
-                    zacount = zacount + 1
-
-            # Median and Normal
-            median = face.calc_center_median_weighted()
-            normal = -face.normal
-            fp.write('N {:.4f} {:.4f} {:.4f} '.format(*median))
-            fp.write('{:.4f} {:.4f} {:.4f}\n'.format(*normal))
-
-            # Vertexs consist Face
-            fp.write('V')
-            for vid in face.verts:
-                fp.write(' {:d}'.format(vid.index))
-            fp.write('\n')
-
-            fp.write('E\n')
-
-        # Footer
-        fp.write('E\n')
-
-        # For Transparent
-        if za != '':
-            fp.write(za + '\n')
-
-        # ==============================
-        # Close
-        # ==============================
-        fp.close()
-        bm.free()
-
-        return {'FINISHED'}
+        pool = None
+        if self.workers > 1:
+            pool, reason = parallel.start(self.workers, bpy.app.binary_path_python)
+            if pool is None:
+                self.report({'WARNING'}, 'Exporting without workers: {}'.format(reason))
+        try:
+            if pool is not None:
+                written = yield from self.export_parallel(scene, pool, objects, global_matrix, profile, welder, merger, ratios)
+            else:
+                written = 0
+                for i, object in enumerate(objects):
+                    raw = self.read(scene, object, profile)
+                    written += export(object, self.filepath, global_matrix, profile, raw, welder, merger, ratios)
+                    yield i + 1, len(objects)
+        finally:
+            if profile is not None:
+                profile.stop()
+        self.report({'INFO'}, 'Wrote {:d} of {:d} parts ({:d} unchanged)'.format(
+            written, len(objects), len(objects) - written))
+        if welder is not None:
+            self.report({'INFO'}, welder.summary())
+        if merger is not None:
+            self.report({'INFO'}, merger.summary())
+
+        if profile is not None:
+            profile.save()
+            self.report({'INFO'}, profile.summary())
+
+    # Parallel Export
+    # Blender data is only read here; workers map the spilled arrays,
+    # format the part files and write those whose content changed.
+    # Profiled part times cover the main process side only.
+    # Yields (done, total) and returns the number of files written.
+    # pool: a started parallel.Pool, terminated when done
+    def export_parallel(self, scene, pool, objects, global_matrix, profile=None, welder=None, merger=None, ratios=()):
+        tmpdir = tempfile.mkdtemp(prefix='ysfs_')
+        try:
+            with pool:
+                results = []
+                total = 2 * len(objects)
+                for i, object in enumerate(objects):
+                    start = time.perf_counter()
+                    raw = self.read(scene, object, profile)
+                    mesh = geometry.extract(object, offset=False, matrix=global_matrix, raw=raw, profile=profile)
+                    mesh = core.optimize(mesh, welder, merger, profile)
+                    path = os.path.join(tmpdir, '{:d}.bin'.format(i))
+                    with core.phase(profile, 'spill'):
+                        layout = parallel.spill(mesh, path)
+                    target = part_path(self.filepath, object)
+                    job = (path, layout, mesh.materials, target, ratios)
+                    counts = (len(mesh.co), len(mesh.face_total))
+                    results.append((object.name, target, counts, time.perf_counter() - start,
+                                    pool.submit(parallel.format_srf, job)))
+                    yield i + 1, total
+                written = 0
+                for i, (name, target, counts, seconds, result) in enumerate(results):
+                    with core.phase(profile, 'workers'):
+                        written += result.get()
+                    if profile is not None:
+                        profile.part(name, counts[0], counts[1], os.path.getsize(target), seconds)
+                    yield len(objects) + i + 1, total
+                return written
+        finally:
+            shutil.rmtree(tmpdir, ignore_errors=True)
+
+    # Evaluated mesh data, or None to read obj.data
+    def read(self, scene, object, profile=None):
+        if not self.use_modifiers:
+            return None
+        with core.phase(profile, 'read'):
+            return evaluated.read(object, scene)
+
+# Part File
+def part_path(filepath, object):
+    return '{0}/{1}.srf'.format(os.path.dirname(filepath), object.name)
+
+# Returns True if the file was written, False if it was already up to date
+# ratios: one per LOD level, each simplified from the one before
+def export(object, filepath, global_matrix, profile=None, raw=None, welder=None, merger=None, ratios=()):
+    start = time.perf_counter()
+    mesh = geometry.extract(object, offset=False, matrix=global_matrix, raw=raw, profile=profile)
+    mesh = core.optimize(mesh, welder, merger, profile)
+    written = save(object, filepath, mesh, profile, ratios)
+    if profile is not None:
+        profile.part(object.name, len(mesh.co), len(mesh.face_total),
+                     os.path.getsize(part_path(filepath, object)), time.perf_counter() - start)
+    return written
+
+# Part file (and its LOD files) of an exported mesh
+# Returns True if the part file was written
+def save(object, filepath, mesh, profile=None, ratios=()):
+    with core.phase(profile, 'format'):
+        data = core.srf(mesh).encode('utf-8')
+    with core.phase(profile, 'write'):
+        written = writer.save_if_changed(part_path(filepath, object), data)
+    for level, ratio in enumerate(ratios, 1):
+        with core.phase(profile, 'lod'):
+            mesh = lod.simplify(mesh, ratio)
+        with core.phase(profile, 'format'):
+            lod_data = core.srf(mesh).encode('utf-8')
+        with core.phase(profile, 'write'):
+            writer.save_if_changed(lod.path(part_path(filepath, object), level), lod_data)
+    return written
 
 # Menu Button
 def menu_func_export(self, context):
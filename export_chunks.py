@@ -0,0 +1,135 @@
+import os
+import bpy
+from bpy.props import (BoolProperty, FloatProperty, IntProperty, StringProperty, EnumProperty)
+from bpy_extras.io_utils import (ImportHelper, ExportHelper, unpack_list, unpack_face_list, axis_conversion)
+from . import evaluated, lazy
+
+# Loaded on first export
+core = lazy.Module('.core')
+geometry = lazy.Module('.geometry')
+writer = lazy.Module('.writer')
+chunks = lazy.Module('.chunks')
+
+# Infomation
+bl_info = {
+    'name'       : 'YSFS 2.0 - Chunked DNM file',
+    'description': 'YSFlight scripts | Export single selected object to DNM file split into chunks.',
+    'author'     : 'Symbian9, Mr Mofumofu',
+    'version'    : (2, 0, 1),
+    'blender'    : (2, 75, 0),
+    'location'   : 'File > Import-Export',
+    'warning'    : '',
+    'wiki_url'   : '',
+    'tracker_url': 'http://github.com/Symbian9/ysfs_2_0/issues/new',
+    'category'   : 'Airplanes 3D',
+}
+
+# Mesh -> [(center, Mesh)] per chunk
+def split(mesh, mode, size, max_faces):
+    if mode == 'GRID':
+        chunk = chunks.grid(mesh, size)
+    else:
+        chunk = chunks.octree(mesh, max_faces)
+    return chunks.split(mesh, chunk)
+
+# Whole DNM: one top level part per chunk, pivot at the chunk center
+def export(obj, fp, parts):
+    out = writer.Writer(fp)
+    names = ['{}_{:d}.srf'.format(obj.name, i) for i in range(len(parts))]
+    nodes = [(uid, name, (0.0, 0.0, 0.0), tuple(center.tolist()), [])
+             for uid, (name, (center, part)) in enumerate(zip(names, parts))]
+    core.write_dnm(out, [(name, part) for name, (center, part) in zip(names, parts)], nodes)
+    out.flush()
+    return out.written
+
+# Export Form
+class ExportChunkedDNM(bpy.types.Operator, ExportHelper):
+    # Settings
+    bl_idname = 'export_model.chunkdnm'
+    bl_label = 'Export Chunked DNM'
+    filter_glob = StringProperty(
+        default = '*.dnm',
+        options = {'HIDDEN'},
+    )
+    check_extension = True
+    filename_ext = '.dnm'
+    chunk_mode = EnumProperty(
+        name = 'Chunks',
+        description = 'How the mesh is split into parts the game can cull',
+        items = (
+            ('GRID', 'Uniform Grid', 'Cubes of Chunk Size'),
+            ('OCTREE', 'Octree', 'Cells split until they hold at most Faces per Chunk'),
+        ),
+        default = 'GRID',
+    )
+    chunk_size = FloatProperty(
+        name = 'Chunk Size',
+        description = 'Edge of the grid cubes (Uniform Grid)',
+        default = 100.0,
+        min = 0.01,
+    )
+    max_faces = IntProperty(
+        name = 'Faces per Chunk',
+        description = 'Most faces an octree cell keeps before it is split (Octree)',
+        default = 2000,
+        min = 1,
+    )
+    use_modifiers = BoolProperty(
+        name = 'Apply Modifiers',
+        description = 'Export meshes with their modifiers applied (the .blend is not changed)',
+        default = False,
+    )
+    use_weld = BoolProperty(
+        name = 'Weld Vertexs',
+        description = 'Merge vertexs printed at the same position with the same smoothing, and drop vertexs no face uses',
+        default = False,
+    )
+    use_merge = BoolProperty(
+        name = 'Merge Coplanar Faces',
+        description = 'Join neighbouring faces with the same material in one plane into convex polygons (no visual change)',
+        default = False,
+    )
+
+    # On Click Save Button
+    def execute(self, context):
+        # Currently Scene
+        scene = context.scene
+
+        # Selected Object
+        obj = scene.objects.active
+        raw = evaluated.read(obj, scene) if self.use_modifiers else None
+
+        # Geometry in YSFlight space, chunks get their own pivots
+        welder = core.Welder() if self.use_weld else None
+        merger = core.Merger() if self.use_merge else None
+        mesh = geometry.extract(obj, offset=False, raw=raw)
+        mesh = core.optimize(mesh, welder, merger)
+        parts = split(mesh, self.chunk_mode, self.chunk_size, self.max_faces)
+
+        filepath = os.fsencode(self.filepath)
+        with open(filepath, 'wb') as fp:
+            export(obj, fp, parts)
+        self.report({'INFO'}, 'Split {:d} faces into {:d} chunks'.format(len(mesh.face_total), len(parts)))
+        if welder is not None:
+            self.report({'INFO'}, welder.summary())
+        if merger is not None:
+            self.report({'INFO'}, merger.summary())
+
+        return {'FINISHED'}
+
+# Menu Button
+def menu_func_export(self, context):
+    self.layout.operator(ExportChunkedDNM.bl_idname, text = 'Chunked DNM (.dnm)')
+
+# Regist
+def register():
+    bpy.utils.register_module(__name__)
+    bpy.types.INFO_MT_file_export.append(menu_func_export)
+
+# Unregist
+def unregister():
+    bpy.utils.unregister_module(__name__)
+    bpy.types.INFO_MT_file_export.remove(menu_func_export)
+
+if __name__ == '__main__':
+    register()
@@ -1,9 +1,22 @@
 import os
+import time
+import shutil
+import contextlib
 import bpy
-import bmesh
-import mathutils
-from bpy.props import (BoolProperty, FloatProperty, StringProperty, EnumProperty)
+from bpy.props import (BoolProperty, FloatProperty, IntProperty, StringProperty, EnumProperty)
 from bpy_extras.io_utils import (ImportHelper, ExportHelper, unpack_list, unpack_face_list, axis_conversion)
+from . import tasks, evaluated, lazy
+
+# Loaded on first export
+core = lazy.Module('.core')
+geometry = lazy.Module('.geometry')
+writer = lazy.Module('.writer')
+parallel = lazy.Module('.parallel')
+cache = lazy.Module('.cache')
+stats = lazy.Module('.stats')
+lod = lazy.Module('.lod')
+tempfile = lazy.Module('tempfile')
+tracemalloc = lazy.Module('tracemalloc')
 
 # Infomation
 bl_info = {
@@ -22,209 +35,200 @@ bl_info = {
 # Surface Class
 class Surface:
     # Getting Data
-    def __init__(self, obj, scene):
+    def __init__(self, obj, uid):
         self.obj = obj
         self.location = obj.location
         self.name = '{}.srf'.format(self.obj.name)
-        self.uid = SurfMan().getUID()
-        SurfMan().addUID()
+        self.uid = uid
         self.children = []
-
-        for objs in (ob for ob in obj.children if ob.is_visible(scene) and ob.type == 'MESH'):
-            self.children.append(SurfMan().getUID())
-            SurfMan().addList(Surface(objs, scene))
+        # Surface whose PCK block this one shares (itself if not an instance)
+        self.source = self
+        # Scene to apply modifiers in, None to export obj.data as is
+        self.scene = None
+        # (vertexs, faces) once the mesh was read
+        self.counts = (0, 0)
+
+    # Mesh data
+    def read(self, profile=None):
+        with core.phase(profile, 'read'):
+            if self.scene is None:
+                raw = geometry.read(self.obj.data)
+            else:
+                raw = evaluated.read(self.obj, self.scene)
+        self.counts = (len(raw.co), len(raw.loop_start))
+        return raw
+
+    # Output Geometry
+    def mesh(self, raw, profile=None, welder=None, merger=None):
+        mesh = geometry.extract(self.obj, raw=raw, profile=profile)
+        return core.optimize(mesh, welder, merger, profile)
+
+    # Cache Key, cached PCK block (or None) and mesh data (None if it was
+    # not read: the key of an object unchanged since it was last hashed is
+    # kept for the session)
+    def lookup(self, cache, profile=None, welder=None, merger=None):
+        stamp = evaluated.stamp(self.obj) + (self.scene is not None, welder is not None, merger is not None)
+        known = evaluated.keys.get(stamp)
+        raw = None
+        if known is None:
+            raw = self.read(profile)
+            with core.phase(profile, 'cache'):
+                h = geometry.fingerprint(self.obj, raw, self.name)
+                if welder is not None:
+                    h.update(b'weld')
+                if merger is not None:
+                    h.update(b'merge')
+                key = cache.key(h)
+            evaluated.keys[stamp] = (key, self.counts)
+        else:
+            key, self.counts = known
+        with core.phase(profile, 'cache'):
+            return key, cache.lookup(key), raw
 
     # PCK Node
-    def pck(self):
-        # ==============================
-        # Getting Data
-        # ==============================
-        # Convert to BMesh(For N-Sided Polygon)
-        bm = bmesh.new()
-        bm.from_mesh(self.obj.data)
-        # Transform
-        ys_matrix = mathutils.Matrix((
-            (-1.0,  0.0,  0.0,  0.0),
-            ( 0.0,  0.0,  1.0,  0.0),
-            ( 0.0, -1.0,  0.0,  0.0),
-            ( 0.0,  0.0,  0.0,  1.0),
-        ))
-        bm.transform(ys_matrix * self.obj.matrix_world)
-        bm.normal_update()
-        # Set Axis
-        local_axis = ys_matrix.to_3x3() * self.obj.location
-        # Vertexs and Faces
-        verts = bm.verts
-        faces = bm.faces
-
-        # ==============================
-        # Output
-        # ==============================
-        output = ''
-        za = ''
-        zacount = 0
-
-        # Header
-        output += 'SURF\n'
-
-        # Vertexs
-        for vert in verts:
-            vertex = vert.co - local_axis
-            output += 'V {:.4f} {:.4f} {:.4f} '.format(*vertex)
-            # Smoothing
-            smooth = True
-            for edge in vert.link_edges:
-                if edge.smooth == False:
-                    smooth = False
-                    break
-            if smooth:
-                for face in vert.link_faces:
-                    if face.smooth:
-                        output += 'R'
-                        break
-            output += '\n'
-
-        # Faces
-        for face in faces:
-            output += 'F\n'
-
-            # Has Material?
-            if len(self.obj.material_slots):
-                # Getting Material
-                material = self.obj.material_slots[face.material_index].material
-                # Color
-                color = material.diffuse_color * 255.0
-                output += 'C {:.0f} {:.0f} {:.0f}\n'.format(*color)
-                # Lighting
-                if material.emit > 0.0:
-                    output += 'B\n'
-                # Transparent
-                if material.alpha < 1.0:
-                    if zacount == 0:
-                        za += 'ZA {:d} {:.0f}'.format(face.index, (1.0 - material.alpha) * 228.0)
-                    elif zacount % 8 == 0:
-                        za += '\nZA {:d} {:.0f}'.format(face.index, (1.0 - material.alpha) * 228.0)
-                    else:
-                        za += ' {:d} {:.0f}'.format(face.index, (1.0 - material.alpha) * 228.0)
-                    zacount = zacount + 1
-
-            # Median and Normal
-            median = face.calc_center_median_weighted() - local_axis
-            normal = -face.normal
-            output += 'N {:.4f} {:.4f} {:.4f} '.format(*median)
-            output += '{:.4f} {:.4f} {:.4f}\n'.format(*normal)
-
-            # Vertexs consist Face
-            output += 'V'
-            for vid in face.verts:
-                output += ' {:d}'.format(vid.index)
-            output += '\n'
-            output += 'E\n'
-
-        # Footer
-        output += 'E\n'
-
-        # For Transparent
-        if za != '':
-            output += za + '\n'
-
-        # Finalize
-        length = len(output.split('\n')) - 1
-        result = 'PCK {} {:d}\n{}\n'.format(self.name, length, output)
-
-        # ==============================
-        # Close
-        # ==============================
-        bm.free()
-
-        return result
+    # lods: (ratio, writer) per LOD level, each simplified from the one before
+    def pck(self, out, cache=None, profile=None, welder=None, merger=None, lods=()):
+        start = time.perf_counter()
+        before = out.tell()
+        mesh = None
+        if cache is None:
+            # Geometry lives only while this part is written
+            raw = self.read(profile)
+            mesh = self.mesh(raw, profile, welder, merger)
+            with core.phase(profile, 'format'):
+                core.write_pck(out, self.name, mesh)
+        else:
+            # Reuse unchanged part
+            key, path, raw = self.lookup(cache, profile, welder, merger)
+            if path is None:
+                raw = raw or self.read(profile)
+                mesh = self.mesh(raw, profile, welder, merger)
+                temp = cache.temp(key)
+                with core.phase(profile, 'format'), open(temp, 'wb') as fp:
+                    part = writer.Writer(fp, profile=profile)
+                    core.write_pck(part, self.name, mesh)
+                    part.flush()
+                path = cache.store(key, temp)
+            out.append(path)
+
+        # LOD blocks from the same geometry
+        if lods and mesh is None:
+            # Fresh passes: a cached part is not counted again
+            raw = raw or self.read(profile)
+            mesh = self.mesh(raw, profile, core.Welder() if welder is not None else None,
+                             core.Merger() if merger is not None else None)
+        write_lods(self.name, mesh, lods, profile)
+        if profile is not None:
+            profile.part(self.name, self.counts[0], self.counts[1], out.tell() - before, time.perf_counter() - start)
+
+    # PCK Node Job (formatted by a worker process)
+    # Returns (cache key, cached path, job); job is None on a cache hit
+    # without LOD levels, and formats LOD blocks only on a hit with them.
+    def pck_job(self, tmpdir, cache=None, profile=None, welder=None, merger=None, ratios=()):
+        raw = None
+        key = None
+        cached = None
+        result = os.path.join(tmpdir, '{:d}.pck'.format(self.uid))
+        if cache is not None:
+            key, cached, raw = self.lookup(cache, profile, welder, merger)
+            if cached is not None:
+                if not ratios:
+                    return (key, cached, None)
+                result = None
+                welder = core.Welder() if welder is not None else None
+                merger = core.Merger() if merger is not None else None
+            else:
+                result = cache.temp(key)
+        raw = raw or self.read(profile)
+        mesh = self.mesh(raw, profile, welder, merger)
+        path = os.path.join(tmpdir, '{:d}.bin'.format(self.uid))
+        with core.phase(profile, 'spill'):
+            layout = parallel.spill(mesh, path)
+        lods = [(ratio, os.path.join(tmpdir, '{:d}.lod{:d}.pck'.format(self.uid, level)))
+                for level, ratio in enumerate(ratios, 1)]
+        return (key, cached, (self.name, path, layout, mesh.materials, result, lods))
 
     #　SRF Node
     def srf(self):
-        # ==============================
-        # Getting Data
-        # ==============================
-        # Transform
-        ys_matrix = mathutils.Matrix((
-            (-1.0,  0.0,  0.0,  0.0),
-            ( 0.0,  0.0,  1.0,  0.0),
-            ( 0.0, -1.0,  0.0,  0.0),
-            ( 0.0,  0.0,  0.0,  1.0),
-        ))
         # Set Axis
-        local_axis = ys_matrix.to_3x3() * self.obj.location
-
-        # ==============================
-        # Output
-        # ==============================
-        output = ''
-
-        # Status
-        output += 'SRF "{:d}"\n'.format(self.uid)
-        output += 'FIL {}\n'.format(self.name)
-        output += 'CLA 0\n'
-        output += 'NST 0\n'
+        local_axis = geometry.ys_matrix.to_3x3() * self.obj.location
+        pos = (0.0, 0.0, 0.0)
+        cnt = local_axis
 
         # Support Axis Export
         if not isinstance(self.obj.parent, type(None)):
-            local_axis_parent = ys_matrix.to_3x3() * self.obj.parent.location
-            local_axis_pos = local_axis - local_axis_parent
-            if local_axis_parent == (0, 0, 0):
-                output += 'POS 0.0000 0.0000 0.0000 0 0 0 1\n'
-                output += 'CNT {:.4f} {:.4f} {:.4f}\n'.format(*local_axis)
-            else:
-                output += 'POS {:.4f} {:.4f} {:.4f} 0 0 0 1\n'.format(*local_axis_pos)
-                output += 'CNT 0.0000 0.0000 0.0000\n'
-        else:
-            output += 'POS 0.0000 0.0000 0.0000 0 0 0 1\n'
-            output += 'CNT {:.4f} {:.4f} {:.4f}\n'.format(*local_axis)
-
-        # Support Parent-Children Relation Export
-        output += 'REL DEP\n'
-        output += 'NCH {:d}\n'.format(len(self.children))
-        for uid in self.children:
-            output += 'CLD "{:d}"\n'.format(uid)
-        output += 'END\n'
-
-        return output
-
-# Surface Manager
-class SurfMan(object):
-    _instance = None
-    _list = []
-    _saved = []
-    _uid = 0
-
-    # Singleton
-    def __new__(this, *argarray, **argdict):
-        if this._instance is None:
-            this._instance = object.__new__(this, *argarray, **argdict)
-        return this._instance
-
-    # Add List
-    def addList(self, obj):
-        if not obj.name in self._saved:
-            self._list.append(obj)
-            self._saved.append(obj.name)
-
-
-    # Get List
-    def getList(self):
-        return self._list
-
-    # Add UID
-    def addUID(self):
-        self._uid = self._uid + 1
-
-    # Get UID
-    def getUID(self):
-        return self._uid
-
-    # Finalize
-    def free(self):
-        self._list = []
-        self._saved = []
-        self._uid = 0
+            local_axis_parent = geometry.ys_matrix.to_3x3() * self.obj.parent.location
+            if local_axis_parent != (0, 0, 0):
+                pos = local_axis - local_axis_parent
+                cnt = (0.0, 0.0, 0.0)
+
+        return core.srf_node(self.uid, self.source.name, pos, cnt, self.children)
+
+# LOD PCK Nodes
+# lods: (ratio, writer) per LOD level, each simplified from the one before
+def write_lods(name, mesh, lods, profile=None):
+    for ratio, lod_out in lods:
+        with core.phase(profile, 'lod'):
+            mesh = lod.simplify(mesh, ratio)
+        with core.phase(profile, 'format'):
+            core.write_pck(lod_out, name, mesh)
+
+# Scene Graph
+# Built once per export: every visible mesh becomes exactly one Surface,
+# numbered in depth-first order (parents before children).
+class SceneGraph:
+    def __init__(self, scene, use_modifiers=False):
+        # Visibility is checked once per object
+        meshes = [ob for ob in scene.objects if ob.type == 'MESH' and ob.is_visible(scene)]
+        self.evaluate = scene if use_modifiers else None
+        self.use_modifiers = use_modifiers
+        self.names = set(ob.name for ob in meshes)
+        self.surfaces = []
+
+        # Roots: meshes without an exported parent
+        for obj in meshes:
+            if obj.parent is None or obj.parent.name not in self.names:
+                self.add(obj)
+
+    # Add a subtree
+    def add(self, root):
+        stack = [(root, None)]
+        while stack:
+            obj, parent = stack.pop()
+            surf = Surface(obj, len(self.surfaces))
+            surf.scene = self.evaluate
+            self.surfaces.append(surf)
+            if parent is not None:
+                parent.children.append(surf.uid)
+            children = [ob for ob in obj.children if ob.name in self.names]
+            stack.extend((ob, surf) for ob in reversed(children))
+
+    # Let instances share the PCK block of the first of them
+    # Returns the number of surfaces made instances.
+    def share(self):
+        sources = {}
+        shared = 0
+        for surf in self.surfaces:
+            obj = surf.obj
+            key = geometry.instance_key(obj)
+            # Evaluated meshes depend on the modifiers of each object
+            if self.use_modifiers and len(obj.modifiers):
+                key += (obj.name,)
+            source = sources.setdefault(key, surf)
+            if source is not surf:
+                surf.source = source
+                shared += 1
+        return shared
+
+    # Surfaces owning a PCK block
+    def parts(self):
+        return [surf for surf in self.surfaces if surf.source is surf]
+
+    def __iter__(self):
+        return iter(self.surfaces)
+
+    def __len__(self):
+        return len(self.surfaces)
 
 # Export DNM
 class ExportDNM(bpy.types.Operator, ExportHelper):
@@ -237,49 +241,214 @@ class ExportDNM(bpy.types.Operator, ExportHelper):
     )
     check_extension = True
     filename_ext = '.dnm'
+    report_memory = BoolProperty(
+        name = 'Report Peak Memory',
+        description = 'Measure peak memory used while exporting',
+        default = False,
+    )
+    workers = IntProperty(
+        name = 'Workers',
+        description = 'Number of processes formatting PCK blocks (1 = no parallel export)',
+        default = 1,
+        min = 1,
+        max = 64,
+    )
+    use_cache = BoolProperty(
+        name = 'Reuse Unchanged Parts',
+        description = 'Keep formatted parts in a cache next to the DNM and re-export only changed parts',
+        default = False,
+    )
+    use_instances = BoolProperty(
+        name = 'Share Instanced Meshes',
+        description = 'Write one PCK block for parts sharing mesh data, materials, rotation and scale',
+        default = False,
+    )
+    use_modifiers = BoolProperty(
+        name = 'Apply Modifiers',
+        description = 'Export meshes with their modifiers applied (the .blend is not changed)',
+        default = False,
+    )
+    use_weld = BoolProperty(
+        name = 'Weld Vertexs',
+        description = 'Merge vertexs printed at the same position with the same smoothing, and drop vertexs no face uses',
+        default = False,
+    )
+    use_merge = BoolProperty(
+        name = 'Merge Coplanar Faces',
+        description = 'Join neighbouring faces with the same material in one plane into convex polygons (no visual change)',
+        default = False,
+    )
+    lod_levels = IntProperty(
+        name = 'LOD Levels',
+        description = 'Number of reduced-detail models written next to the DNM (<name>_lod1.dnm, ...)',
+        default = 0,
+        min = 0,
+        max = 4,
+    )
+    lod_ratio = FloatProperty(
+        name = 'LOD Ratio',
+        description = 'Share of triangles each LOD level keeps of the level before',
+        default = 0.5,
+        min = 0.05,
+        max = 0.95,
+    )
+    use_profile = BoolProperty(
+        name = 'Profile Export',
+        description = 'Time every phase and part, report a summary and save <file>.profile.json next to the output',
+        default = False,
+    )
+    use_cprofile = BoolProperty(
+        name = 'Dump cProfile',
+        description = 'With Profile Export, also save <file>.prof for pstats',
+        default = False,
+    )
+    use_background = BoolProperty(
+        name = 'Run in Background',
+        description = 'Export in slices with a progress bar, the view can be moved meanwhile (Esc cancels)',
+        default = False,
+    )
 
     # On Click Save Button
     def execute(self, context):
+        return tasks.start(self, context, self.steps(context.scene), self.use_background)
+
+    def modal(self, context, event):
+        return tasks.step(self, context, event)
+
+    # Export Steps
+    # Yields (done, total) after every part. The DNM (and its LOD models)
+    # are written to temporary files and renamed when complete; closing the
+    # generator (Esc) removes them and leaves any earlier files untouched.
+    def steps(self, scene):
         # ==============================
         # Getting Data
         # ==============================
-        # Currently Scene
-        scene = context.scene
+        if self.report_memory:
+            tracemalloc.start()
+        profile = stats.Profile(self.filepath, self.use_cprofile) if self.use_profile else None
+        if profile is not None:
+            profile.start()
 
         # Selected Object
-        for obj in (ob for ob in scene.objects if ob.is_visible(scene) and ob.type == 'MESH'):
-            if obj.type == 'MESH':
-                SurfMan().addList(Surface(obj, scene))
+        with core.phase(profile, 'scene'):
+            graph = SceneGraph(scene, self.use_modifiers)
+            shared = graph.share() if self.use_instances else 0
+            parts = graph.parts()
 
         # ==============================
         # Output
         # ==============================
-        # Save File
-        filepath = os.fsencode(self.filepath)
-        fp = open(filepath, 'w')
-
-        # Header
-        fp.write('DYNAMODEL\n')
-        fp.write('DNMVER 1\n')
-
-        # PCK Node
-        for surf in SurfMan().getList():
-            fp.write(surf.pck())
-
-        # SRF Node
-        for surf in SurfMan().getList():
-            fp.write(surf.srf())
-
-        # Footer
-        fp.write('END\n')
+        # Save File (and LOD models)
+        targets = [self.filepath] + [lod.path(self.filepath, level) for level in range(1, self.lod_levels + 1)]
+        targets = [os.fsencode(target) for target in targets]
+        temps = [target + b'.tmp' for target in targets]
+        pck_cache = cache.Cache(self.filepath) if self.use_cache else None
+        welder = core.Welder() if self.use_weld else None
+        merger = core.Merger() if self.use_merge else None
+        try:
+            with contextlib.ExitStack() as files:
+                outs = [writer.Writer(files.enter_context(open(temp, 'wb')), profile=profile) for temp in temps]
+                out = outs[0]
+                lods = [(self.lod_ratio, lod_out) for lod_out in outs[1:]]
+
+                # Header
+                for o in outs:
+                    o.write('DYNAMODEL\n')
+                    o.write('DNMVER 1\n')
+
+                # PCK Node
+                pool = None
+                if self.workers > 1:
+                    pool, reason = parallel.start(self.workers, bpy.app.binary_path_python)
+                    if pool is None:
+                        self.report({'WARNING'}, 'Exporting without workers: {}'.format(reason))
+                if pool is not None:
+                    yield from self.pck_parallel(out, pool, parts, pck_cache, profile, welder, merger, lods)
+                else:
+                    for i, surf in enumerate(parts):
+                        surf.pck(out, pck_cache, profile, welder, merger, lods)
+                        yield i + 1, len(parts)
+
+                # SRF Node
+                with core.phase(profile, 'nodes'):
+                    for surf in graph:
+                        node = surf.srf()
+                        for o in outs:
+                            o.write(node)
+
+                # Footer
+                for o in outs:
+                    o.write('END\n')
+                    o.flush()
+            for temp, target in zip(temps, targets):
+                os.replace(temp, target)
+        finally:
+            for temp in temps:
+                if os.path.exists(temp):
+                    os.remove(temp)
+            if self.report_memory:
+                peak = tracemalloc.get_traced_memory()[1]
+                tracemalloc.stop()
+            if profile is not None:
+                profile.stop()
 
         # ==============================
         # Close
         # ==============================
-        SurfMan().free()
-        fp.close()
-
-        return {'FINISHED'}
+        if shared:
+            self.report({'INFO'}, '{:d} of {:d} parts share mesh data of another part'.format(shared, len(graph)))
+        if welder is not None:
+            self.report({'INFO'}, welder.summary())
+        if merger is not None:
+            self.report({'INFO'}, merger.summary())
+        if pck_cache is not None:
+            pck_cache.evict()
+            self.report({'INFO'}, pck_cache.summary())
+        if self.report_memory:
+            self.report({'INFO'}, 'Peak memory: {:.1f} MiB for {:d} bytes'.format(peak / 1048576.0, out.written))
+        if profile is not None:
+            profile.save()
+            self.report({'INFO'}, profile.summary())
+
+    # Parallel PCK Nodes
+    # Blender data is only read here; workers map the spilled arrays and
+    # format the blocks, which are joined back in scene graph order.
+    # Profiled part times cover the main process side only.
+    # Yields (done, total): reading parts, then joining their blocks.
+    # pool: a started parallel.Pool, terminated when done
+    def pck_parallel(self, out, pool, surfs, pck_cache=None, profile=None, welder=None, merger=None, lods=()):
+        tmpdir = tempfile.mkdtemp(prefix='ysfs_')
+        try:
+            with pool:
+                results = []
+                total = 2 * len(surfs)
+                ratios = [ratio for ratio, lod_out in lods]
+                for surf in surfs:
+                    start = time.perf_counter()
+                    key, path, job = surf.pck_job(tmpdir, pck_cache, profile, welder, merger, ratios)
+                    future = None
+                    if job is not None:
+                        future = pool.submit(parallel.format_pck, job)
+                    results.append((surf, key, path, future, time.perf_counter() - start))
+                    yield len(results), total
+                for i, (surf, key, path, future, seconds) in enumerate(results):
+                    lod_paths = ()
+                    if future is not None:
+                        with core.phase(profile, 'workers'):
+                            result, lod_paths = future.get()
+                        if path is None:
+                            path = result
+                            if key is not None:
+                                path = pck_cache.store(key, path)
+                    before = out.tell()
+                    out.append(path)
+                    for (ratio, lod_out), lod_path in zip(lods, lod_paths):
+                        lod_out.append(lod_path)
+                    if profile is not None:
+                        profile.part(surf.name, surf.counts[0], surf.counts[1], out.tell() - before, seconds)
+                    yield len(results) + i + 1, total
+        finally:
+            shutil.rmtree(tmpdir, ignore_errors=True)
 
 # Menu Button
 def menu_func_export(self, context):
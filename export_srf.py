@@ -1,9 +1,15 @@
 import os
+import time
 import bpy
-import bmesh
-import mathutils
 from bpy.props import (BoolProperty, FloatProperty, StringProperty, EnumProperty)
 from bpy_extras.io_utils import (ImportHelper, ExportHelper, unpack_list, unpack_face_list, axis_conversion)
+from . import evaluated, lazy
+
+# Loaded on first export
+core = lazy.Module('.core')
+geometry = lazy.Module('.geometry')
+writer = lazy.Module('.writer')
+stats = lazy.Module('.stats')
 
 # Infomation
 bl_info = {
@@ -19,105 +25,20 @@ bl_info = {
     'category'   : 'Airplanes 3D',
 }
 
-def export(obj):
-    # ==============================
-    # Getting Data
-    # ==============================
-    # Convert to BMesh(For N-Sided Polygon)
-    bm = bmesh.new()
-    bm.from_mesh(obj.data)
-    # Transform
-    ys_matrix = mathutils.Matrix((
-        (-1.0,  0.0,  0.0,  0.0),
-        ( 0.0,  0.0,  1.0,  0.0),
-        ( 0.0, -1.0,  0.0,  0.0),
-        ( 0.0,  0.0,  0.0,  1.0),
-    ))
-    bm.transform(ys_matrix * obj.matrix_world)
-    bm.normal_update()
-    # Set Axis
-    local_axis = ys_matrix.to_3x3() * obj.location
-    # Vertexs and Faces
-    verts = bm.verts
-    faces = bm.faces
-
-    # ==============================
-    # Output
-    # ==============================
-    output = ''
-    za = ''
-    zacount = 0
-
-    # Header
-    output += 'SURF\n'
-
-    # Vertexs
-    for vert in verts:
-        vertex = vert.co - local_axis
-        output += 'V {:.4f} {:.4f} {:.4f} '.format(*vertex)
-        # Smoothing
-        smooth = True
-        for edge in vert.link_edges:
-            if edge.smooth == False:
-                smooth = False
-                break
-        if smooth:
-            for face in vert.link_faces:
-                if face.smooth:
-                    output += 'R'
-                    break
-        output += '\n'
-
-    # Faces
-    for face in faces:
-        output += 'F\n'
-
-        # Has Material?
-        if len(obj.material_slots):
-            # Getting Material
-            material = obj.material_slots[face.material_index].material
-            # Color
-            color = material.diffuse_color * 255.0
-            output += 'C {:.0f} {:.0f} {:.0f}\n'.format(*color)
-            # Lighting
-            if material.emit > 0.0:
-                output += 'B\n'
-            # Transparent
-            if material.alpha < 1.0:
-                if zacount == 0:
-                    za += 'ZA {:d} {:.0f}'.format(face.index, (1.0 - material.alpha) * 228.0)
-                elif zacount % 8 == 0:
-                    za += '\nZA {:d} {:.0f}'.format(face.index, (1.0 - material.alpha) * 228.0)
-                else:
-                    za += ' {:d} {:.0f}'.format(face.index, (1.0 - material.alpha) * 228.0)
-                zacount = zacount + 1
-
-        # Median and Normal
-        median = face.calc_center_median_weighted() - local_axis
-        normal = -face.normal
-        output += 'N {:.4f} {:.4f} {:.4f} '.format(*median)
-        output += '{:.4f} {:.4f} {:.4f}\n'.format(*normal)
-
-        # Vertexs consist Face
-        output += 'V'
-        for vid in face.verts:
-            output += ' {:d}'.format(vid.index)
-        output += '\n'
-        output += 'E\n'
-
-    # Footer
-    output += 'E\n'
-
-    # For Transparent
-    if za != '':
-        output += za + '\n'
-
-    # ==============================
-    # Close
-    # ==============================
-    bm.free()
-
-    return output
+# raw: mesh data to use instead of obj.data (e.g. with modifiers applied)
+# welder: core.Welder to merge duplicate vertexs with, or None
+# merger: core.Merger to join coplanar faces with, or None
+def export(obj, fp, profile=None, raw=None, welder=None, merger=None):
+    start = time.perf_counter()
+    out = writer.Writer(fp, profile=profile)
+    mesh = geometry.extract(obj, raw=raw, profile=profile)
+    mesh = core.optimize(mesh, welder, merger, profile)
+    with core.phase(profile, 'format'):
+        core.write_srf(out, mesh)
+        out.flush()
+    if profile is not None:
+        profile.part(obj.name, len(mesh.co), len(mesh.face_total), out.written, time.perf_counter() - start)
+    return out.written
 
 # Export Form
 class ExportSRF(bpy.types.Operator, ExportHelper):
@@ -130,16 +51,61 @@ class ExportSRF(bpy.types.Operator, ExportHelper):
     )
     check_extension = True
     filename_ext = '.srf'
+    use_modifiers = BoolProperty(
+        name = 'Apply Modifiers',
+        description = 'Export meshes with their modifiers applied (the .blend is not changed)',
+        default = False,
+    )
+    use_weld = BoolProperty(
+        name = 'Weld Vertexs',
+        description = 'Merge vertexs printed at the same position with the same smoothing, and drop vertexs no face uses',
+        default = False,
+    )
+    use_merge = BoolProperty(
+        name = 'Merge Coplanar Faces',
+        description = 'Join neighbouring faces with the same material in one plane into convex polygons (no visual change)',
+        default = False,
+    )
+    use_profile = BoolProperty(
+        name = 'Profile Export',
+        description = 'Time every phase and part, report a summary and save <file>.profile.json next to the output',
+        default = False,
+    )
+    use_cprofile = BoolProperty(
+        name = 'Dump cProfile',
+        description = 'With Profile Export, also save <file>.prof for pstats',
+        default = False,
+    )
 
     # On Click Save Button
     def execute(self, context):
         # Currently Scene
         scene = context.scene
-        filepath = os.fsencode(self.filepath)
-        fp = open(filepath, 'w')
+        profile = stats.Profile(self.filepath, self.use_cprofile) if self.use_profile else None
+        if profile is not None:
+            profile.start()
 
         # Selected Object
-        fp.write(export(scene.objects.active))
+        obj = scene.objects.active
+        raw = None
+        if self.use_modifiers:
+            with core.phase(profile, 'read'):
+                raw = evaluated.read(obj, scene)
+
+        welder = core.Welder() if self.use_weld else None
+        merger = core.Merger() if self.use_merge else None
+        filepath = os.fsencode(self.filepath)
+        with open(filepath, 'wb') as fp:
+            export(obj, fp, profile, raw, welder, merger)
+        if welder is not None:
+            self.report({'INFO'}, welder.summary())
+        if merger is not None:
+            self.report({'INFO'}, merger.summary())
+
+        if profile is not None:
+            profile.stop()
+            profile.save()
+            self.report({'INFO'}, profile.summary())
 
         return {'FINISHED'}
 
@@ -0,0 +1,258 @@
+import os
+import time
+import contextlib
+import bpy
+from bpy.props import (BoolProperty, FloatProperty, IntProperty, StringProperty, EnumProperty)
+from bpy_extras.io_utils import (ImportHelper, ExportHelper, unpack_list, unpack_face_list, axis_conversion)
+from . import tasks, export_dnm, explode_srf, lazy
+
+# Loaded on first export
+core = lazy.Module('.core')
+geometry = lazy.Module('.geometry')
+writer = lazy.Module('.writer')
+stats = lazy.Module('.stats')
+lod = lazy.Module('.lod')
+
+# Infomation
+bl_info = {
+    'name'       : 'YSFS 2.0 - DNM, Parts and Merged SRF',
+    'description': 'YSFlight scripts | Export all objects in scene to DNM, SRF parts and one merged SRF at once.',
+    'author'     : 'Symbian9, Mr Mofumofu',
+    'version'    : (2, 0, 1),
+    'blender'    : (2, 75, 0),
+    'location'   : 'File > Import-Export',
+    'warning'    : '',
+    'wiki_url'   : '',
+    'tracker_url': 'http://github.com/Symbian9/ysfs_2_0/issues/new',
+    'category'   : 'Airplanes 3D',
+}
+
+# Merged SRF File: model.dnm -> model_merged.srf
+def merged_path(filepath):
+    return '{}_merged.srf'.format(os.path.splitext(filepath)[0])
+
+# Export Form
+# Every part is read, transformed and its normals computed once; the DNM
+# block is the same geometry moved to the part's axis, the part file and
+# the merged SRF use it as is. Each output matches its own exporter.
+class ExportVariants(bpy.types.Operator, ExportHelper):
+    # Settings
+    bl_idname = 'export_model.variants'
+    bl_label = 'Export Model Variants'
+    filter_glob = StringProperty(
+        default = '*.dnm',
+        options = {'HIDDEN'},
+    )
+    check_extension = True
+    filename_ext = '.dnm'
+    use_dnm = BoolProperty(
+        name = 'DNM Model',
+        description = 'Write the DNM model (Export DNM)',
+        default = True,
+    )
+    use_parts = BoolProperty(
+        name = 'DNM Parts',
+        description = 'Write one SRF per part next to the DNM (Export DNM Parts)',
+        default = True,
+    )
+    use_merged = BoolProperty(
+        name = 'Merged SRF',
+        description = 'Write all parts as one SRF, <name>_merged.srf (e.g. for a collision model)',
+        default = True,
+    )
+    use_instances = BoolProperty(
+        name = 'Share Instanced Meshes',
+        description = 'Write one PCK block for parts sharing mesh data, materials, rotation and scale',
+        default = False,
+    )
+    use_modifiers = BoolProperty(
+        name = 'Apply Modifiers',
+        description = 'Export meshes with their modifiers applied (the .blend is not changed)',
+        default = False,
+    )
+    use_weld = BoolProperty(
+        name = 'Weld Vertexs',
+        description = 'Merge vertexs printed at the same position with the same smoothing, and drop vertexs no face uses',
+        default = False,
+    )
+    use_merge = BoolProperty(
+        name = 'Merge Coplanar Faces',
+        description = 'Join neighbouring faces with the same material in one plane into convex polygons (no visual change)',
+        default = False,
+    )
+    lod_levels = IntProperty(
+        name = 'LOD Levels',
+        description = 'Number of reduced-detail versions of the DNM and part files (<name>_lod1.dnm, ...)',
+        default = 0,
+        min = 0,
+        max = 4,
+    )
+    lod_ratio = FloatProperty(
+        name = 'LOD Ratio',
+        description = 'Share of triangles each LOD level keeps of the level before',
+        default = 0.5,
+        min = 0.05,
+        max = 0.95,
+    )
+    use_profile = BoolProperty(
+        name = 'Profile Export',
+        description = 'Time every phase and part, report a summary and save <file>.profile.json next to the output',
+        default = False,
+    )
+    use_cprofile = BoolProperty(
+        name = 'Dump cProfile',
+        description = 'With Profile Export, also save <file>.prof for pstats',
+        default = False,
+    )
+    use_background = BoolProperty(
+        name = 'Run in Background',
+        description = 'Export in slices with a progress bar, the view can be moved meanwhile (Esc cancels)',
+        default = False,
+    )
+
+    # On Click Save Button
+    def execute(self, context):
+        return tasks.start(self, context, self.steps(context.scene), self.use_background)
+
+    def modal(self, context, event):
+        return tasks.step(self, context, event)
+
+    # Export Steps
+    # Yields (done, total) after every part. The DNM files and the merged
+    # SRF are written to temporary files and renamed when complete; part
+    # files are replaced one by one, as by Export DNM Parts.
+    def steps(self, scene):
+        # ==============================
+        # Getting Data
+        # ==============================
+        profile = stats.Profile(self.filepath, self.use_cprofile) if self.use_profile else None
+        if profile is not None:
+            profile.start()
+
+        # Visible meshes, as in the DNM
+        with core.phase(profile, 'scene'):
+            graph = export_dnm.SceneGraph(scene, self.use_modifiers)
+            shared = graph.share() if self.use_instances else 0
+        ratios = [self.lod_ratio] * self.lod_levels
+        # Separate passes per output, each reported on its own
+        outputs = [name for name, use in (('DNM', self.use_dnm), ('Parts', self.use_parts),
+                                          ('Merged SRF', self.use_merged)) if use]
+        welders = dict((name, core.Welder()) for name in outputs) if self.use_weld else {}
+        mergers = dict((name, core.Merger()) for name in outputs) if self.use_merge else {}
+
+        # ==============================
+        # Output
+        # ==============================
+        targets = []
+        if self.use_dnm:
+            targets += [self.filepath] + [lod.path(self.filepath, level) for level in range(1, self.lod_levels + 1)]
+        targets = [os.fsencode(target) for target in targets]
+        temps = [target + b'.tmp' for target in targets]
+        merged_target = os.fsencode(merged_path(self.filepath))
+        merged_temp = merged_target + b'.tmp'
+        written = 0
+        meshes = []
+        try:
+            with contextlib.ExitStack() as files:
+                outs = [writer.Writer(files.enter_context(open(temp, 'wb')), profile=profile) for temp in temps]
+                lods = [(self.lod_ratio, lod_out) for lod_out in outs[1:]]
+
+                # Header
+                for o in outs:
+                    o.write('DYNAMODEL\n')
+                    o.write('DNMVER 1\n')
+
+                # One extraction per part
+                for i, surf in enumerate(graph):
+                    start = time.perf_counter()
+                    raw = surf.read(profile)
+                    mesh = geometry.extract(surf.obj, offset=False, raw=raw, profile=profile)
+                    size = 0
+
+                    # PCK Node
+                    if outs and surf.source is surf:
+                        part = core.moved(mesh, geometry.local_axis(surf.obj))
+                        part = core.optimize(part, welders.get('DNM'), mergers.get('DNM'), profile)
+                        before = outs[0].tell()
+                        with core.phase(profile, 'format'):
+                            core.write_pck(outs[0], surf.name, part)
+                        export_dnm.write_lods(surf.name, part, lods, profile)
+                        size += outs[0].tell() - before
+
+                    # Part File
+                    if self.use_parts:
+                        part = core.optimize(mesh, welders.get('Parts'), mergers.get('Parts'), profile)
+                        written += explode_srf.save(surf.obj, self.filepath, part, profile, ratios)
+                        size += os.path.getsize(explode_srf.part_path(self.filepath, surf.obj))
+
+                    # Parts of the merged SRF
+                    if self.use_merged:
+                        meshes.append(mesh)
+
+                    if profile is not None:
+                        profile.part(surf.name, surf.counts[0], surf.counts[1], size, time.perf_counter() - start)
+                    yield i + 1, len(graph)
+
+                # SRF Node
+                with core.phase(profile, 'nodes'):
+                    for surf in graph:
+                        node = surf.srf()
+                        for o in outs:
+                            o.write(node)
+
+                # Footer
+                for o in outs:
+                    o.write('END\n')
+                    o.flush()
+
+                # Merged SRF
+                if meshes:
+                    with core.phase(profile, 'merge'):
+                        mesh = core.optimize(core.combine(meshes), welders.get('Merged SRF'), mergers.get('Merged SRF'), profile)
+                    with core.phase(profile, 'format'), open(merged_temp, 'wb') as fp:
+                        out = writer.Writer(fp, profile=profile)
+                        core.write_srf(out, mesh)
+                        out.flush()
+            for temp, target in zip(temps, targets):
+                os.replace(temp, target)
+            if meshes:
+                os.replace(merged_temp, merged_target)
+        finally:
+            for temp in temps + [merged_temp]:
+                if os.path.exists(temp):
+                    os.remove(temp)
+            if profile is not None:
+                profile.stop()
+
+        # ==============================
+        # Close
+        # ==============================
+        if shared and self.use_dnm:
+            self.report({'INFO'}, '{:d} of {:d} parts share mesh data of another part'.format(shared, len(graph)))
+        if self.use_parts:
+            self.report({'INFO'}, 'Wrote {:d} of {:d} part files ({:d} unchanged)'.format(
+                written, len(graph), len(graph) - written))
+        for name in outputs:
+            for optimizer in (welders.get(name), mergers.get(name)):
+                if optimizer is not None:
+                    self.report({'INFO'}, '{}: {}'.format(name, optimizer.summary()))
+        if profile is not None:
+            profile.save()
+            self.report({'INFO'}, profile.summary())
+
+# Menu Button
+def menu_func_export(self, context):
+    self.layout.operator(ExportVariants.bl_idname, text = 'DNM, Parts and Merged SRF (.dnm)')
+
+# Regist
+def register():
+    bpy.utils.register_module(__name__)
+    bpy.types.INFO_MT_file_export.append(menu_func_export)
+
+# Unregist
+def unregister():
+    bpy.utils.unregister_module(__name__)
+    bpy.types.INFO_MT_file_export.remove(menu_func_export)
+
+if __name__ == '__main__':
+    register()
@@ -0,0 +1,89 @@
+import hashlib
+import numpy as np
+import mathutils
+from . import core
+
+# Blender -> YSFlight Axis
+ys_matrix = mathutils.Matrix((
+    (-1.0,  0.0,  0.0,  0.0),
+    ( 0.0,  0.0,  1.0,  0.0),
+    ( 0.0, -1.0,  0.0,  0.0),
+    ( 0.0,  0.0,  0.0,  1.0),
+))
+
+# Bulk Read of Blender mesh data
+def read(me):
+    nverts = len(me.vertices)
+    nedges = len(me.edges)
+    nloops = len(me.loops)
+    nfaces = len(me.polygons)
+
+    co = np.empty(nverts * 3, dtype=np.float32)
+    me.vertices.foreach_get('co', co)
+    co.shape = (nverts, 3)
+
+    edge_verts = np.empty(nedges * 2, dtype=np.int32)
+    me.edges.foreach_get('vertices', edge_verts)
+    edge_verts.shape = (nedges, 2)
+    edge_sharp = np.empty(nedges, dtype=np.bool_)
+    me.edges.foreach_get('use_edge_sharp', edge_sharp)
+
+    loop_verts = np.empty(nloops, dtype=np.int32)
+    me.loops.foreach_get('vertex_index', loop_verts)
+
+    loop_start = np.empty(nfaces, dtype=np.int32)
+    me.polygons.foreach_get('loop_start', loop_start)
+    loop_total = np.empty(nfaces, dtype=np.int32)
+    me.polygons.foreach_get('loop_total', loop_total)
+    face_smooth = np.empty(nfaces, dtype=np.bool_)
+    me.polygons.foreach_get('use_smooth', face_smooth)
+    material_index = np.empty(nfaces, dtype=np.int32)
+    me.polygons.foreach_get('material_index', material_index)
+
+    return core.Raw(co, edge_verts, edge_sharp, loop_verts, loop_start, loop_total, face_smooth, material_index)
+
+# Content Hash of a part (mesh data, world matrix, materials)
+def fingerprint(obj, raw, name, offset=True, matrix=ys_matrix):
+    h = hashlib.sha1()
+    h.update(name.encode('utf-8'))
+    raw.update_hash(h)
+    h.update(np.array(matrix * obj.matrix_world, dtype=np.float32).tobytes())
+    if offset:
+        h.update(np.array(matrix.to_3x3() * obj.location, dtype=np.float32).tobytes())
+    h.update(repr(materials(obj)).encode('utf-8'))
+    return h
+
+# Instance Key: parts with equal keys get the same PCK block (same mesh
+# data and materials, placed with bit-identical rotation and scale)
+def instance_key(obj, matrix=ys_matrix):
+    world = np.array(matrix * obj.matrix_world, dtype=np.float32)
+    offset = world[:3, 3] - local_axis(obj, matrix)
+    return (obj.data.name, repr(materials(obj)), world[:3, :3].tobytes(), offset.tobytes())
+
+# Getting Data
+def extract(obj, offset=True, matrix=ys_matrix, raw=None, profile=None):
+    if raw is None:
+        with core.phase(profile, 'read'):
+            raw = read(obj.data)
+    world = np.array(matrix * obj.matrix_world, dtype=np.float32)
+    with core.phase(profile, 'materials'):
+        table = materials(obj)
+    return core.mesh(raw, world, local_axis(obj, matrix) if offset else None, table, profile)
+
+# Set Axis: offset of the part's vertexs in its PCK block
+def local_axis(obj, matrix=ys_matrix):
+    return np.array(matrix.to_3x3() * obj.location, dtype=np.float32)
+
+# Material Table
+def materials(obj):
+    if not len(obj.material_slots):
+        return None
+    table = []
+    for slot in obj.material_slots:
+        material = slot.material
+        if material is None:
+            table.append(None)
+            continue
+        color = material.diffuse_color * 255.0
+        table.append((tuple(color), material.emit > 0.0, material.alpha))
+    return table
@@ -0,0 +1,176 @@
+import os
+import bpy
+from bpy.props import (BoolProperty, FloatProperty, IntProperty, StringProperty, EnumProperty)
+from bpy_extras.io_utils import (ImportHelper, ExportHelper, unpack_list, unpack_face_list, axis_conversion)
+from . import lazy
+from .import_srf import mesh
+
+# Loaded on first import
+reader = lazy.Module('.reader')
+parallel = lazy.Module('.parallel')
+
+# Infomation
+bl_info = {
+    'name'       : 'YSFS 2.0 - DNM file',
+    'description': 'YSFlight scripts | Import DNM file as object hierarchy.',
+    'author'     : 'Symbian9, Mr Mofumofu',
+    'version'    : (2, 0, 1),
+    'blender'    : (2, 75, 0),
+    'location'   : 'File > Import-Export',
+    'warning'    : '',
+    'wiki_url'   : '',
+    'tracker_url': 'http://github.com/Symbian9/ysfs_2_0/issues/new',
+    'category'   : 'Airplanes 3D',
+}
+
+# YSFlight -> Blender Axis
+def location(x, y, z):
+    return (-x, -z, y)
+
+# Decode PCK blocks into meshes, one mesh per FIL
+# report: operator.report, warned if no worker pool could be started
+def load_meshes(filepath, dnm, names, workers=1, report=None):
+    names = [name for name in names if name in dnm.pck]
+    jobs = [(filepath, dnm.pck[name][0], dnm.pck[name][1]) for name in names]
+    pool = None
+    if workers > 1 and len(jobs) > 1:
+        pool, reason = parallel.start(workers, bpy.app.binary_path_python)
+        if pool is None and report is not None:
+            report({'WARNING'}, 'Importing without workers: {}'.format(reason))
+    if pool is not None:
+        with pool:
+            surfs = pool.map(reader.read_pck, jobs)
+    else:
+        surfs = [reader.read_pck(job) for job in jobs]
+    return dict((name, mesh(surf, os.path.splitext(name)[0])) for name, surf in zip(names, surfs))
+
+# Import Form
+class ImportDNM(bpy.types.Operator, ImportHelper):
+    # Settings
+    bl_idname = 'import_model.dnm'
+    bl_label = 'Import DNM Model'
+    filter_glob = StringProperty(
+        default = '*.dnm',
+        options = {'HIDDEN'},
+    )
+    filename_ext = '.dnm'
+    geometry = EnumProperty(
+        name = 'Geometry',
+        items = (
+            ('ALL', 'All Parts', 'Decode the meshes of all parts now'),
+            ('LAZY', 'On Demand', 'Import the hierarchy only, load part meshes later'),
+        ),
+        default = 'ALL',
+    )
+    workers = IntProperty(
+        name = 'Workers',
+        description = 'Number of processes decoding part meshes (1 = no parallel import)',
+        default = 1,
+        min = 1,
+        max = 64,
+    )
+
+    # On Click Open Button
+    def execute(self, context):
+        # ==============================
+        # Getting Data
+        # ==============================
+        # Currently Scene
+        scene = context.scene
+        try:
+            dnm = reader.read_dnm(self.filepath)
+
+            # Meshes
+            used = []
+            for node in dnm.nodes:
+                if node.fil is not None and node.fil not in used:
+                    used.append(node.fil)
+            if self.geometry == 'ALL':
+                meshes = load_meshes(self.filepath, dnm, used, self.workers, self.report)
+            else:
+                meshes = dict((name, bpy.data.meshes.new(os.path.splitext(name)[0])) for name in used)
+        except ValueError as error:
+            self.report({'ERROR'}, str(error))
+            return {'CANCELLED'}
+
+        # ==============================
+        # Hierarchy
+        # ==============================
+        objects = {}
+        for node in dnm.nodes:
+            me = meshes.get(node.fil)
+            if me is None:
+                me = bpy.data.meshes.new(node.name)
+            obj = bpy.data.objects.new(os.path.splitext(node.fil or node.name)[0], me)
+            # Pivot (relative to parent)
+            obj.location = location(*(p + c for p, c in zip(node.pos[:3], node.cnt)))
+            # Class and source of the part
+            obj['CLA'] = node.cla
+            obj['dnm_file'] = self.filepath
+            obj['dnm_pck'] = node.fil or ''
+            scene.objects.link(obj)
+            objects[node.name] = obj
+
+        for node in dnm.nodes:
+            if node.parent is not None:
+                objects[node.name].parent = objects[node.parent.name]
+
+        self.report({'INFO'}, 'Imported {:d} parts'.format(len(dnm.nodes)))
+        return {'FINISHED'}
+
+# Load Geometry of lazily imported parts
+class ImportDNMParts(bpy.types.Operator):
+    # Settings
+    bl_idname = 'import_model.dnm_parts'
+    bl_label = 'Load DNM Part Geometry'
+    bl_description = 'Decode the meshes of selected parts imported on demand'
+
+    # On Click Button
+    def execute(self, context):
+        # Selected parts, grouped by file
+        files = {}
+        for obj in context.selected_objects:
+            if obj.type == 'MESH' and obj.get('dnm_pck') and not len(obj.data.vertices):
+                files.setdefault(obj['dnm_file'], []).append(obj)
+
+        count = 0
+        for filepath, objs in files.items():
+            try:
+                dnm = reader.read_dnm(filepath)
+            except (IOError, ValueError) as error:
+                self.report({'ERROR'}, str(error))
+                return {'CANCELLED'}
+            names = []
+            for obj in objs:
+                if obj['dnm_pck'] not in names:
+                    names.append(obj['dnm_pck'])
+            try:
+                meshes = load_meshes(filepath, dnm, names)
+            except ValueError as error:
+                self.report({'ERROR'}, str(error))
+                return {'CANCELLED'}
+            for obj in objs:
+                me = meshes.get(obj['dnm_pck'])
+                if me is not None:
+                    obj.data = me
+                    count += 1
+
+        self.report({'INFO'}, 'Loaded {:d} parts'.format(count))
+        return {'FINISHED'}
+
+# Menu Button
+def menu_func_import(self, context):
+    self.layout.operator(ImportDNM.bl_idname, text = 'DNM Model (.dnm)')
+
+# Regist
+def register():
+    bpy.utils.register_module(__name__)
+    bpy.types.INFO_MT_file_import.append(menu_func_import)
+
+# Unregist
+def unregister():
+    bpy.utils.unregister_module(__name__)
+    bpy.types.INFO_MT_file_import.remove(menu_func_import)
+
+if __name__ == '__main__':
+    register()
@@ -0,0 +1,133 @@
+import os
+import bpy
+from bpy.props import (BoolProperty, FloatProperty, StringProperty, EnumProperty)
+from bpy_extras.io_utils import (ImportHelper, ExportHelper, unpack_list, unpack_face_list, axis_conversion)
+from . import lazy
+
+# Loaded on first import
+np = lazy.Module('numpy')
+core = lazy.Module('.core')
+reader = lazy.Module('.reader')
+
+# Infomation
+bl_info = {
+    'name'       : 'YSFS 2.0 - SRF file',
+    'description': 'YSFlight scripts | Import SRF file as mesh object.',
+    'author'     : 'Symbian9, Mr Mofumofu',
+    'version'    : (2, 0, 1),
+    'blender'    : (2, 75, 0),
+    'location'   : 'File > Import-Export',
+    'warning'    : '',
+    'wiki_url'   : '',
+    'tracker_url': 'http://github.com/Symbian9/ysfs_2_0/issues/new',
+    'category'   : 'Airplanes 3D',
+}
+
+# Build Mesh from parsed SRF
+def mesh(surf, name):
+    # ==============================
+    # Getting Data
+    # ==============================
+    # YSFlight -> Blender Axis (inverse of the export matrix)
+    co = np.empty_like(surf.co)
+    co[:, 0] = -surf.co[:, 0]
+    co[:, 1] = -surf.co[:, 2]
+    co[:, 2] = surf.co[:, 1]
+
+    # Lines and points can not be polygons
+    keep = surf.face_total >= 3
+    face_total = surf.face_total[keep]
+    face_verts = surf.face_verts[np.repeat(keep, surf.face_total)]
+    face_start = np.zeros(len(face_total), dtype=np.int32)
+    np.cumsum(face_total[:-1], out=face_start[1:])
+
+    # ==============================
+    # Mesh
+    # ==============================
+    me = bpy.data.meshes.new(name)
+    me.vertices.add(len(co))
+    me.vertices.foreach_set('co', co.ravel())
+    me.loops.add(len(face_verts))
+    me.loops.foreach_set('vertex_index', face_verts)
+    me.polygons.add(len(face_total))
+    me.polygons.foreach_set('loop_start', face_start)
+    me.polygons.foreach_set('loop_total', face_total)
+
+
+    # Materials
+    if surf.has_color:
+        keys = np.column_stack((surf.color, surf.bright, surf.za))[keep]
+        _, first, material_index = np.unique(core.row_keys(keys), return_index=True, return_inverse=True)
+        table = keys[first]
+        for i, (r, g, b, bright, za) in enumerate(table.tolist()):
+            material = bpy.data.materials.new('{}.{:03d}'.format(name, i))
+            material.diffuse_color = (r / 255.0, g / 255.0, b / 255.0)
+            material.emit = 1.0 if bright else 0.0
+            if za > 0:
+                material.use_transparency = True
+                material.alpha = 1.0 - za / 228.0
+            me.materials.append(material)
+        me.polygons.foreach_set('material_index', material_index.ravel().astype(np.int32))
+
+    me.update(calc_edges=True)
+
+    edge_verts = np.empty(len(me.edges) * 2, dtype=np.int32)
+    me.edges.foreach_get('vertices', edge_verts)
+    edge_verts.shape = (len(me.edges), 2)
+
+    # Smoothing (see reader.smoothing)
+    face_smooth, edge_sharp = reader.smoothing(surf.smooth, face_start, face_verts, edge_verts)
+    me.polygons.foreach_set('use_smooth', face_smooth)
+    me.edges.foreach_set('use_edge_sharp', edge_sharp)
+
+    me.validate()
+    me.update()
+    return me
+
+# Import Form
+class ImportSRF(bpy.types.Operator, ImportHelper):
+    # Settings
+    bl_idname = 'import_model.srf'
+    bl_label = 'Import SRF'
+    filter_glob = StringProperty(
+        default = '*.srf',
+        options = {'HIDDEN'},
+    )
+    filename_ext = '.srf'
+
+    # On Click Open Button
+    def execute(self, context):
+        # Currently Scene
+        scene = context.scene
+        name = os.path.splitext(os.path.basename(self.filepath))[0]
+
+        try:
+            surf = reader.read_srf(self.filepath)
+        except ValueError as error:
+            self.report({'ERROR'}, str(error))
+            return {'CANCELLED'}
+
+        # New Object
+        obj = bpy.data.objects.new(name, mesh(surf, name))
+        scene.objects.link(obj)
+        scene.objects.active = obj
+        obj.select = True
+
+        return {'FINISHED'}
+
+# Menu Button
+def menu_func_import(self, context):
+    self.layout.operator(ImportSRF.bl_idname, text = 'SRF Model (.srf)')
+
+# Regist
+def register():
+    bpy.utils.register_module(__name__)
+    bpy.types.INFO_MT_file_import.append(menu_func_import)
+
+# Unregist
+def unregister():
+    bpy.utils.unregister_module(__name__)
+    bpy.types.INFO_MT_file_import.remove(menu_func_import)
+
+if __name__ == '__main__':
+    register()
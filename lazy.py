@@ -0,0 +1,26 @@
+import importlib
+
+# ==============================
+# Deferred Imports
+# ==============================
+# Operator modules are imported when the add-on is enabled, but most
+# Blender sessions never export. Their implementation modules (numpy and
+# everything built on it, multiprocessing, ...) are bound to a Module
+# that imports them on first use, so enabling the add-on only costs the
+# operator and panel classes.
+class Module:
+    # name: absolute, or '.name' for a module of this add-on
+    def __init__(self, name):
+        self._name = name
+        self._module = None
+
+    def __getattr__(self, attr):
+        # Not set yet (copies and pickles skip __init__)
+        if attr in ('_name', '_module'):
+            raise AttributeError(attr)
+        if self._module is None:
+            self._module = importlib.import_module(self._name, __package__)
+        return getattr(self._module, attr)
+
+    def __repr__(self):
+        return '<deferred module {!r}>'.format(self._name)
@@ -0,0 +1,272 @@
+import os
+import heapq
+import itertools
+import numpy as np
+from . import core
+
+# Smallest cosine between a face normal before and after a collapse
+MIN_COS = 0.2
+
+# ==============================
+# Level of Detail
+# ==============================
+# Output file of a LOD level: model.dnm -> model_lod1.dnm
+def path(filepath, level):
+    stem, ext = os.path.splitext(filepath)
+    return '{}_lod{:d}{}'.format(stem, level, ext)
+
+# Quadric Error Simplification (Garland & Heckbert)
+# Collapses edges of the triangulated mesh, cheapest first, until ratio of
+# the triangles is left. Vertexs on open borders and material boundaries
+# are locked and edges between R and non-R vertexs never collapse, so
+# colors, transparency (ZA) and smoothing seams keep their shape.
+def simplify(mesh, ratio):
+    tris, tri_face = triangulate(mesh)
+    ntris = len(tris)
+    target = int(ntris * ratio)
+    if ratio >= 1.0 or ntris == 0 or target >= ntris:
+        return mesh
+
+    co = mesh.co.astype(np.float64)
+    smooth = mesh.smooth
+    tri_material = mesh.material_index[tri_face]
+    nverts = len(co)
+
+    # ==============================
+    # Quadrics
+    # ==============================
+    p0, p1, p2 = co[tris[:, 0]], co[tris[:, 1]], co[tris[:, 2]]
+    n = np.cross(p1 - p0, p2 - p0)
+    area = np.sqrt((n * n).sum(axis=1))
+    valid = area > 0.0
+    n[valid] /= area[valid, None]
+    plane = np.column_stack((n, -(n * p0).sum(axis=1)))
+    # Upper triangle of the symmetric 4x4 plane quadric, area weighted
+    rows, cols = np.triu_indices(4)
+    k = plane[:, rows] * plane[:, cols] * area[:, None]
+    quadric = np.zeros((nverts, 10))
+    for i in range(3):
+        np.add.at(quadric, tris[:, i], k)
+
+    # ==============================
+    # Locks
+    # ==============================
+    edges = np.sort(np.concatenate((tris[:, [0, 1]], tris[:, [1, 2]], tris[:, [2, 0]])), axis=1)
+    # One int64 key per edge (np.unique(axis=0) needs NumPy 1.13)
+    keys, count = np.unique(edges[:, 0] * nverts + edges[:, 1], return_counts=True)
+    edges = np.column_stack(divmod(keys, nverts))
+    locked = np.zeros(nverts, dtype=np.bool_)
+    locked[edges[count != 2].ravel()] = True
+    low = np.full(nverts, np.iinfo(np.int32).max, dtype=np.int64)
+    high = np.full(nverts, -1, dtype=np.int64)
+    for i in range(3):
+        np.minimum.at(low, tris[:, i], tri_material)
+        np.maximum.at(high, tris[:, i], tri_material)
+    locked |= (high >= 0) & (low != high)
+
+    # ==============================
+    # Edge Collapses
+    # ==============================
+    tris = tris.tolist()
+    points = co.tolist()
+    quadric = quadric.tolist()
+    alive = [True] * ntris
+    faces_of = [set() for _ in range(nverts)]
+    for t, tri in enumerate(tris):
+        for v in tri:
+            faces_of[v].add(t)
+    version = [0] * nverts
+    removed = [False] * nverts
+    locked = locked.tolist()
+    smooth_list = smooth.tolist()
+
+    heap = []
+    order = itertools.count()
+    def push(u, v):
+        if smooth_list[u] != smooth_list[v] or (locked[u] and locked[v]):
+            return
+        # The locked end stays
+        if locked[v]:
+            u, v = v, u
+        q = [a + b for a, b in zip(quadric[u], quadric[v])]
+        cost, p = collapse_cost(q, points[u], points[v], locked[u])
+        heapq.heappush(heap, (cost, next(order), u, v, version[u], version[v], p))
+
+    for u, v in edges.tolist():
+        push(u, v)
+
+    left = ntris
+    while left > target and heap:
+        cost, _, u, v, ver_u, ver_v, p = heapq.heappop(heap)
+        if removed[u] or removed[v] or version[u] != ver_u or version[v] != ver_v:
+            continue
+        shared = faces_of[u] & faces_of[v]
+        if not shared or not can_collapse(tris, points, faces_of, u, v, shared, p):
+            continue
+
+        # Move u, drop faces on the edge, hand the faces of v to u
+        points[u] = p
+        quadric[u] = [a + b for a, b in zip(quadric[u], quadric[v])]
+        for t in shared:
+            alive[t] = False
+            left -= 1
+            for w in tris[t]:
+                if w != u and w != v:
+                    faces_of[w].discard(t)
+        faces_of[u] -= shared
+        for t in faces_of[v] - shared:
+            tri = tris[t]
+            tri[tri.index(v)] = u
+            faces_of[u].add(t)
+        faces_of[v] = set()
+        removed[v] = True
+        version[u] += 1
+
+        # New costs of the edges around u (others are unchanged)
+        neighbors = set()
+        for t in faces_of[u]:
+            neighbors.update(tris[t])
+        neighbors.discard(u)
+        for w in neighbors:
+            push(u, w)
+
+    # ==============================
+    # Output
+    # ==============================
+    keep = np.array(alive, dtype=np.bool_)
+    tris = np.array(tris, dtype=np.int32).reshape(-1, 3)[keep]
+    used = np.zeros(nverts, dtype=np.bool_)
+    used[tris.ravel()] = True
+    remap = np.cumsum(used, dtype=np.int32) - 1
+    new_co = np.array(points, dtype=np.float64)[used].astype(np.float32)
+    face_verts = remap[tris]
+
+    fco = new_co[face_verts]
+    nfaces = len(face_verts)
+    return core.Mesh(new_co, smooth[used], np.arange(nfaces, dtype=np.int32) * 3,
+                     np.full(nfaces, 3, dtype=np.int32), face_verts.ravel(),
+                     core.median_weighted(fco), -core.face_normal(fco),
+                     tri_material[keep], mesh.materials)
+
+# Triangulation: (triangles, face of every triangle)
+# Convex faces are fanned from their first corner; faces with a reflex
+# corner are ear clipped, so concave n-gons give no overlapping or
+# inverted triangles. Triangles keep the winding of their face.
+def triangulate(mesh):
+    total = mesh.face_total.astype(np.int64)
+    count = np.maximum(total - 2, 0)
+    tri_face = np.repeat(np.arange(len(total)), count)
+    ntris = len(tri_face)
+    first = np.zeros(len(total), dtype=np.int64)
+    np.cumsum(count[:-1], out=first[1:])
+    i = np.arange(ntris) - first[tri_face]
+    start = mesh.face_start[tri_face]
+    fv = mesh.face_verts
+    tris = np.column_stack((fv[start], fv[start + 1 + i], fv[start + 2 + i])).astype(np.int64)
+    for face in concave(mesh):
+        corners = fv[mesh.face_start[face]:mesh.face_start[face] + total[face]]
+        tris[first[face]:first[face] + count[face]] = corners[ear_clip(mesh.co[corners].astype(np.float64))]
+    return tris, tri_face
+
+# Faces with a reflex corner (turning against the face normal)
+def concave(mesh):
+    co = mesh.co.astype(np.float64)
+    total = mesh.face_total
+    faces = []
+    for size in np.unique(total[total > 3]):
+        index = np.flatnonzero(total == size)
+        fco = co[mesh.face_verts[mesh.face_start[index, None] + np.arange(size)]]
+        fco -= fco[:, :1]
+        edge = np.roll(fco, -1, axis=1) - fco
+        turn = np.cross(edge, np.roll(edge, -1, axis=1))
+        normal = np.cross(fco, np.roll(fco, -1, axis=1)).sum(axis=1)
+        # Nearly straight corners count as convex
+        dot = (turn * normal[:, None]).sum(axis=2)
+        scale = np.sqrt((turn * turn).sum(axis=2) * (normal * normal).sum(axis=1)[:, None])
+        faces.extend(index[(dot < -1.0e-9 * scale).any(axis=1)].tolist())
+    return faces
+
+# Ear Clipping of one polygon, points (k, 3): k - 2 triangles of corner
+# numbers. The polygon is projected onto the plane of its largest normal
+# component and turned counter-clockwise.
+def ear_clip(points):
+    origin = points - points[0]
+    normal = np.cross(origin, np.roll(origin, -1, axis=0)).sum(axis=0)
+    axis = int(np.argmax(np.abs(normal)))
+    u, v = ((1, 2), (2, 0), (0, 1))[axis]
+    sign = 1.0 if normal[axis] >= 0.0 else -1.0
+    xy = [(x, y * sign) for x, y in points[:, [u, v]].tolist()]
+
+    def area(a, b, c):
+        return (b[0] - a[0]) * (c[1] - a[1]) - (b[1] - a[1]) * (c[0] - a[0])
+
+    corners = list(range(len(xy)))
+    tris = []
+    while len(corners) > 3:
+        n = len(corners)
+        for i in range(n):
+            a, b, c = corners[i - 1], corners[i], corners[(i + 1) % n]
+            pa, pb, pc = xy[a], xy[b], xy[c]
+            if area(pa, pb, pc) <= 0.0:
+                continue
+            # No other corner in (or on) the ear
+            if any(area(pa, pb, xy[p]) >= 0.0 and area(pb, pc, xy[p]) >= 0.0 and area(pc, pa, xy[p]) >= 0.0
+                   for p in corners if p not in (a, b, c) and xy[p] not in (pa, pb, pc)):
+                continue
+            tris.append((a, b, c))
+            del corners[i]
+            break
+        else:
+            # No ear left (self-intersecting or degenerate): fan the rest
+            tris.extend((corners[0], corners[j], corners[j + 1]) for j in range(1, n - 1))
+            return tris
+    tris.append(tuple(corners))
+    return tris
+
+# Cheapest of the two ends and the midpoint: (cost, position)
+def collapse_cost(q, a, b, keep_a):
+    if keep_a:
+        candidates = (a,)
+    else:
+        candidates = (a, b, [(a[0] + b[0]) * 0.5, (a[1] + b[1]) * 0.5, (a[2] + b[2]) * 0.5])
+    q00, q01, q02, q03, q11, q12, q13, q22, q23, q33 = q
+    best = None
+    for p in candidates:
+        x, y, z = p
+        cost = (x * (q00 * x + 2.0 * (q01 * y + q02 * z + q03))
+                + y * (q11 * y + 2.0 * (q12 * z + q13))
+                + z * (q22 * z + 2.0 * q23) + q33)
+        if best is None or cost < best[0]:
+            best = (cost, p)
+    return best
+
+def cross(a, b, c):
+    ux, uy, uz = b[0] - a[0], b[1] - a[1], b[2] - a[2]
+    vx, vy, vz = c[0] - a[0], c[1] - a[1], c[2] - a[2]
+    return (uy * vz - uz * vy, uz * vx - ux * vz, ux * vy - uy * vx)
+
+# Collapse keeps the mesh manifold and flips no face
+def can_collapse(tris, points, faces_of, u, v, shared, p):
+    # Link condition: u and v share only the vertexs opposite the edge
+    around_u = set()
+    for t in faces_of[u]:
+        around_u.update(tris[t])
+    around_v = set()
+    for t in faces_of[v]:
+        around_v.update(tris[t])
+    common = around_u & around_v
+    common.discard(u)
+    common.discard(v)
+    if len(common) != len(shared):
+        return False
+
+    # Faces around the moved vertexs must not flip
+    for x, others in ((u, faces_of[u] - shared), (v, faces_of[v] - shared)):
+        for t in others:
+            before = cross(*(points[w] for w in tris[t]))
+            after = cross(*(p if w == x else points[w] for w in tris[t]))
+            dot = before[0] * after[0] + before[1] * after[1] + before[2] * after[2]
+            length = (before[0] ** 2 + before[1] ** 2 + before[2] ** 2) * (after[0] ** 2 + after[1] ** 2 + after[2] ** 2)
+            if length == 0.0 or dot < MIN_COS * length ** 0.5:
+                return False
+    return True
@@ -0,0 +1,127 @@
+import os
+import runpy
+import importlib
+import multiprocessing
+import numpy as np
+from . import core, writer, lod
+
+# Run in every worker before its first job (see worker.py)
+WORKER = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'worker.py')
+# Seconds new workers get to import their modules
+START_TIMEOUT = 60.0
+
+# ==============================
+# Process Pool
+# ==============================
+# Inside Blender sys.executable is the Blender binary, and the add-on's
+# __init__ imports bpy. Workers of a spawning platform (Windows, macOS)
+# therefore run Blender's Python and import the bpy-free modules as the
+# package of worker.py; jobs are the functions of that package with the
+# names of the ones given here.
+class Pool:
+    def __init__(self, pool, package):
+        self.pool = pool
+        self.package = package
+
+    # Worker side copy of a function of this package
+    def job(self, func):
+        module = importlib.import_module('{}.{}'.format(self.package, func.__module__.rpartition('.')[2]))
+        return getattr(module, func.__name__)
+
+    def submit(self, func, job):
+        return self.pool.apply_async(self.job(func), (job,))
+
+    def map(self, func, jobs):
+        return self.pool.map(self.job(func), jobs)
+
+    # Stop the workers (unfinished jobs are dropped)
+    def close(self):
+        self.pool.terminate()
+        self.pool.join()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+# Start a pool of processes workers
+# executable: Blender's Python (bpy.app.binary_path_python), needed
+# unless workers are forked. Returns (Pool, None), or (None, reason) if
+# no pool could be started; callers then run the jobs themselves.
+def start(processes, executable=None):
+    if multiprocessing.get_start_method() != 'fork':
+        if not executable or not os.path.isfile(executable):
+            return None, 'Python executable not found'
+        multiprocessing.set_executable(executable)
+    try:
+        package = runpy.run_path(WORKER)['PACKAGE']
+        pool = Pool(multiprocessing.Pool(processes, runpy.run_path, (WORKER,)), package)
+    except (OSError, ValueError) as error:
+        return None, str(error)
+
+    # Workers failing to import are restarted forever instead of failing
+    try:
+        pool.submit(ready, None).get(START_TIMEOUT)
+    except Exception as error:
+        pool.close()
+        return None, str(error) or 'workers did not start'
+    return pool, None
+
+# First job of a new pool (worker process)
+def ready(job):
+    return job
+
+# Write arrays of a mesh into one spill file (main process)
+def spill(mesh, path):
+    layout = []
+    offset = 0
+    with open(path, 'wb') as fp:
+        for field in core.Mesh.ARRAYS:
+            array = np.ascontiguousarray(getattr(mesh, field))
+            array.tofile(fp)
+            layout.append((field, array.dtype.str, array.shape, offset))
+            offset += array.nbytes
+    return layout
+
+# Map arrays of a spill file without copying them (worker process)
+def load(path, layout, materials):
+    arrays = {}
+    for field, dtype, shape, offset in layout:
+        if 0 in shape:
+            arrays[field] = np.empty(shape, dtype=dtype)
+        else:
+            arrays[field] = np.memmap(path, dtype=dtype, mode='r', offset=offset, shape=shape)
+    return core.Mesh(materials=materials, **arrays)
+
+# Format one PCK block into its own file (worker process)
+# result is None if only LOD blocks are wanted; lods are (ratio, result),
+# each level simplified from the one before.
+# Returns (result, LOD results).
+def format_pck(job):
+    name, path, layout, materials, result, lods = job
+    part = load(path, layout, materials)
+    if result is not None:
+        write_pck(result, name, part)
+    results = []
+    for ratio, lod_result in lods:
+        part = lod.simplify(part, ratio)
+        write_pck(lod_result, name, part)
+        results.append(lod_result)
+    return result, results
+
+def write_pck(path, name, part):
+    with open(path, 'wb') as fp:
+        out = writer.Writer(fp)
+        core.write_pck(out, name, part)
+        out.flush()
+
+# Format one SRF file and its LOD files, skipped if unchanged (worker process)
+def format_srf(job):
+    path, layout, materials, target, ratios = job
+    part = load(path, layout, materials)
+    written = writer.save_if_changed(target, core.srf(part).encode('utf-8'))
+    for level, ratio in enumerate(ratios, 1):
+        part = lod.simplify(part, ratio)
+        writer.save_if_changed(lod.path(target, level), core.srf(part).encode('utf-8'))
+    return written
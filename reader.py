@@ -0,0 +1,282 @@
+import os
+import mmap
+import numpy as np
+
+# Record Bytes
+WHITESPACE = (9, 10, 13, 32)
+# Byte -> is whitespace (np.isin needs NumPy 1.13, np.in1d is gone in 2.x)
+SPACE = np.zeros(256, dtype=np.bool_)
+SPACE[list(WHITESPACE)] = True
+V, F, C, B, N, E, Z, A, R = (ord(c) for c in 'VFCBNEZAR')
+
+# Parsed Surface (YSFlight axis)
+class Surf:
+    def __init__(self, co, smooth, face_start, face_total, face_verts, color, bright, za, has_color):
+        # Vertexs
+        self.co = co
+        self.smooth = smooth
+        # Faces (vertex indices of face i are face_verts[face_start[i]:face_start[i] + face_total[i]])
+        self.face_start = face_start
+        self.face_total = face_total
+        self.face_verts = face_verts
+        # Face Attributes
+        self.color = color
+        self.bright = bright
+        self.za = za
+        self.has_color = has_color
+
+# DNM Node (SRF ... END)
+class Node:
+    def __init__(self, name):
+        self.name = name
+        self.fil = None
+        self.cla = 0
+        self.pos = (0.0, 0.0, 0.0, 0.0, 0.0, 0.0, 1.0)
+        self.cnt = (0.0, 0.0, 0.0)
+        self.children = []
+        self.parent = None
+
+# DNM Index: byte ranges of PCK blocks and the node hierarchy, no geometry
+class Dnm:
+    def __init__(self):
+        self.pck = {}
+        self.nodes = []
+        self.index = {}
+
+    # Nodes nobody refers to as a child
+    def roots(self):
+        return [node for node in self.nodes if node.parent is None]
+
+# Memory-Mapped File
+class Mapped:
+    def __init__(self, path):
+        self.fp = open(path, 'rb')
+        size = os.fstat(self.fp.fileno()).st_size
+        self.mm = mmap.mmap(self.fp.fileno(), 0, access=mmap.ACCESS_READ) if size else b''
+
+    def __enter__(self):
+        return self.mm
+
+    def __exit__(self, *exc):
+        if isinstance(self.mm, mmap.mmap):
+            self.mm.close()
+        self.fp.close()
+
+# Read SRF File
+def read_srf(path):
+    with Mapped(path) as buf:
+        return parse(buf)
+
+# Read DNM Index
+def read_dnm(path):
+    with Mapped(path) as buf:
+        return scan_dnm(buf)
+
+# Decode one PCK block of a DNM file (usable from worker processes)
+def read_pck(job):
+    path, start, end = job
+    with Mapped(path) as buf:
+        return parse(buf, start, end)
+
+# Scan a DNM once: PCK blocks are skipped by their line count
+def scan_dnm(buf):
+    data = np.frombuffer(buf, dtype=np.uint8)
+    newline = np.flatnonzero(data == 10)
+    starts = np.concatenate(([0], newline + 1)).tolist()
+    ends = np.concatenate((newline, [len(data)])).tolist()
+    del data
+    nlines = len(starts)
+    if not nlines or not buf[:9] == b'DYNAMODEL':
+        raise ValueError('DNM: missing DYNAMODEL header')
+
+    dnm = Dnm()
+    node = None
+    i = 0
+    while i < nlines:
+        words = buf[starts[i]:ends[i]].split()
+        i += 1
+        if not words:
+            continue
+        key = words[0]
+        # PCK name lines
+        if key == b'PCK':
+            first = i
+            i = min(i + int(words[-1]), nlines)
+            end = starts[i] if i < nlines else len(buf)
+            dnm.pck[b' '.join(words[1:-1]).decode('utf-8')] = (starts[first] if first < nlines else end, end)
+        # SRF "name"
+        elif key == b'SRF':
+            node = Node(b' '.join(words[1:]).decode('utf-8').strip('"'))
+            dnm.nodes.append(node)
+            dnm.index[node.name] = node
+        elif node is None:
+            continue
+        elif key == b'FIL':
+            node.fil = b' '.join(words[1:]).decode('utf-8')
+        elif key == b'CLA':
+            node.cla = int(words[1])
+        elif key == b'POS':
+            node.pos = tuple(float(w) for w in words[1:8])
+        elif key == b'CNT':
+            node.cnt = tuple(float(w) for w in words[1:4])
+        elif key == b'CLD':
+            node.children.append(b' '.join(words[1:]).decode('utf-8').strip('"'))
+        elif key == b'END':
+            node = None
+
+    # Hierarchy
+    for parent in dnm.nodes:
+        for name in parent.children:
+            child = dnm.index.get(name)
+            if child is not None:
+                child.parent = parent
+    return dnm
+
+# Line Table of a buffer region: (data, starts, ends); ends point at '\n'
+def lines(buf, start=0, end=None):
+    if end is None:
+        end = len(buf)
+    data = np.frombuffer(buf, dtype=np.uint8, count=end - start, offset=start)
+    newline = np.flatnonzero(data == 10)
+    starts = np.concatenate(([0], newline + 1))
+    ends = np.concatenate((newline, [len(data)]))
+    if starts[-1] == len(data):
+        starts, ends = starts[:-1], ends[:-1]
+    return data, starts, ends
+
+# Byte at offset of every line (newline if the line is shorter)
+def column(data, starts, ends, offset):
+    pos = starts + offset
+    inside = pos < ends
+    result = np.full(len(starts), 10, dtype=np.uint8)
+    result[inside] = data[pos[inside]]
+    return result
+
+# Keyword masks of every line
+def keywords(data, starts, ends):
+    c0 = column(data, starts, ends, 0)
+    c1 = column(data, starts, ends, 1)
+    c2 = column(data, starts, ends, 2)
+    single = SPACE[c1]
+    kinds = {}
+    for name, code in (('V', V), ('F', F), ('C', C), ('B', B), ('N', N), ('E', E)):
+        kinds[name] = single & (c0 == code)
+    kinds['ZA'] = (c0 == Z) & (c1 == A) & SPACE[c2]
+    return kinds
+
+# Numbers of many lines parsed in one pass
+# Returns (values, count per line, lines containing the flag byte)
+def fields(data, starts, ends, skip, flag=None):
+    nlines = len(starts)
+    first = starts + skip
+    stop = np.minimum(ends + 1, len(data))
+    lengths = np.maximum(stop - first, 0)
+    offsets = np.zeros(nlines, dtype=np.int64)
+    np.cumsum(lengths[:-1], out=offsets[1:])
+    index = np.repeat(first - offsets, lengths) + np.arange(lengths.sum(), dtype=np.int64)
+    text = data[index]
+    line = np.repeat(np.arange(nlines), lengths)
+
+    flagged = None
+    if flag is not None:
+        hit = text == flag
+        flagged = np.zeros(nlines, dtype=np.bool_)
+        flagged[line[hit]] = True
+        text[hit] = 32
+
+    # Tokens per line
+    space = SPACE[text]
+    token = ~space
+    token[1:] &= space[:-1]
+    counts = np.bincount(line[token], minlength=nlines)
+
+    values = np.fromstring(text.tobytes(), dtype=np.float64, sep=' ')
+    if len(values) != counts.sum():
+        raise ValueError('SRF: unreadable numbers')
+    return values, counts, flagged
+
+# Parse SRF records of a buffer region
+def parse(buf, start=0, end=None):
+    data, starts, ends = lines(buf, start, end)
+    if not len(starts) or bytes(data[starts[0]:starts[0] + 4]) != b'SURF':
+        raise ValueError('SRF: missing SURF header')
+    kinds = keywords(data, starts, ends)
+
+    # ==============================
+    # Face Blocks
+    # ==============================
+    index = np.arange(len(starts))
+    last_f = np.maximum.accumulate(np.where(kinds['F'], index, -1))
+    last_e = np.maximum.accumulate(np.where(kinds['E'], index, -1))
+    in_face = last_f > last_e
+    face = np.cumsum(kinds['F']) - 1
+    nfaces = int(kinds['F'].sum())
+
+    # ==============================
+    # Vertexs
+    # ==============================
+    sel = kinds['V'] & ~in_face
+    values, counts, smooth = fields(data, starts[sel], ends[sel], 1, flag=R)
+    if np.any(counts != 3):
+        raise ValueError('SRF: vertex without 3 coordinates')
+    co = values.reshape(-1, 3).astype(np.float32)
+
+    # ==============================
+    # Faces
+    # ==============================
+    sel = kinds['V'] & in_face
+    values, counts, _ = fields(data, starts[sel], ends[sel], 1)
+    face_verts = values.astype(np.int32)
+    if len(face_verts) and (face_verts.min() < 0 or face_verts.max() >= len(co)):
+        raise ValueError('SRF: face refers to a missing vertex')
+    face_total = np.bincount(face[sel], weights=counts, minlength=nfaces).astype(np.int32)
+    face_start = np.zeros(nfaces, dtype=np.int32)
+    np.cumsum(face_total[:-1], out=face_start[1:])
+
+    # Color (C r g b, or 15-bit C grb)
+    sel = kinds['C'] & in_face
+    values, counts, _ = fields(data, starts[sel], ends[sel], 1)
+    offsets = np.cumsum(counts) - counts
+    rgb = np.zeros((len(counts), 3))
+    full = counts >= 3
+    for i in range(3):
+        rgb[full, i] = values[offsets[full] + i]
+    packed = values[offsets[counts == 1]].astype(np.int64)
+    rgb[counts == 1] = np.column_stack(((packed >> 5) & 31, (packed >> 10) & 31, packed & 31)) * (255.0 / 31.0)
+    color = np.zeros((nfaces, 3))
+    color[face[sel]] = rgb
+
+    # Lighting
+    bright = np.zeros(nfaces, dtype=np.bool_)
+    bright[face[kinds['B'] & in_face]] = True
+
+    # Transparent (ZA face alpha ...)
+    sel = kinds['ZA']
+    values, counts, _ = fields(data, starts[sel], ends[sel], 2)
+    pairs = values[:len(values) // 2 * 2].reshape(-1, 2).astype(np.int64)
+    pairs = pairs[(pairs[:, 0] >= 0) & (pairs[:, 0] < nfaces)]
+    za = np.zeros(nfaces, dtype=np.int32)
+    za[pairs[:, 0]] = pairs[:, 1]
+
+    has_color = bool((kinds['C'] & in_face).any() or kinds['ZA'].any())
+    return Surf(co, smooth, face_start, face_total, face_verts, color, bright, za, has_color)
+
+# ==============================
+# Smoothing
+# ==============================
+# Blender flags that export the same R vertexs again: the exporter makes
+# a vertex R if one of its faces is smooth and none of its edges is sharp.
+# Edges between two non-R vertexs are sharp. A non-R vertex with only R
+# neighbours has no such edge, so its faces stay flat instead; every other
+# face with an R vertex is smooth.
+# Faces are contiguous in face_verts. Returns (face_smooth, edge_sharp).
+def smoothing(smooth, face_start, face_verts, edge_verts):
+    edge_sharp = ~(smooth[edge_verts[:, 0]] | smooth[edge_verts[:, 1]])
+    hard = np.zeros(len(smooth), dtype=np.bool_)
+    hard[edge_verts[edge_sharp].ravel()] = True
+    isolated = ~smooth & ~hard
+    if not len(face_start):
+        return np.zeros(0, dtype=np.bool_), edge_sharp
+    face_smooth = (np.logical_or.reduceat(smooth[face_verts], face_start)
+                   & ~np.logical_or.reduceat(isolated[face_verts], face_start))
+    return face_smooth, edge_sharp
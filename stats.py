@@ -0,0 +1,96 @@
+import os
+import json
+import time
+import cProfile
+
+# Export Profile
+# Wall time per phase (self time: nested phases are not counted twice),
+# per-part counts and output size. Saved as '<output>.profile.json' and,
+# with use_cprofile, '<output>.prof' for pstats/snakeviz.
+class Profile:
+    def __init__(self, filepath, use_cprofile=False):
+        self.filepath = filepath
+        self.phases = {}
+        self.parts = []
+        self.stack = []
+        self.profiler = cProfile.Profile() if use_cprofile else None
+        self.started = None
+        self.wall = 0.0
+
+    def start(self):
+        self.started = time.perf_counter()
+        if self.profiler is not None:
+            self.profiler.enable()
+
+    def stop(self):
+        if self.profiler is not None:
+            self.profiler.disable()
+        self.wall = time.perf_counter() - self.started
+
+    # with profile.phase('format'): ...
+    def phase(self, name):
+        return Phase(self, name)
+
+    # One exported part
+    def part(self, name, vertices, faces, nbytes, seconds):
+        self.parts.append({
+            'name': name,
+            'vertices': vertices,
+            'faces': faces,
+            'bytes': nbytes,
+            'seconds': seconds,
+        })
+
+    def totals(self):
+        return (sum(part['vertices'] for part in self.parts),
+                sum(part['faces'] for part in self.parts),
+                sum(part['bytes'] for part in self.parts))
+
+    # One line for Operator.report
+    def summary(self):
+        vertices, faces, nbytes = self.totals()
+        phases = sorted(self.phases.items(), key=lambda item: -item[1])
+        return '{:d} parts, {:d} vertexs, {:d} faces, {:d} bytes in {:.3f}s ({})'.format(
+            len(self.parts), vertices, faces, nbytes, self.wall,
+            ', '.join('{} {:.3f}s'.format(name, seconds) for name, seconds in phases))
+
+    # Returns the written paths
+    def save(self):
+        vertices, faces, nbytes = self.totals()
+        path = '{}.profile.json'.format(self.filepath)
+        with open(path, 'w') as fp:
+            json.dump({
+                'output': os.path.basename(self.filepath),
+                'wall': self.wall,
+                'vertices': vertices,
+                'faces': faces,
+                'bytes': nbytes,
+                'phases': self.phases,
+                'parts': self.parts,
+            }, fp, indent=2, sort_keys=True)
+        paths = [path]
+        if self.profiler is not None:
+            path = '{}.prof'.format(self.filepath)
+            self.profiler.dump_stats(path)
+            paths.append(path)
+        return paths
+
+# Timed Phase
+class Phase:
+    def __init__(self, profile, name):
+        self.profile = profile
+        self.name = name
+
+    def __enter__(self):
+        # [name, start, time of nested phases]
+        self.profile.stack.append([self.name, time.perf_counter(), 0.0])
+        return self
+
+    def __exit__(self, *exc):
+        name, start, nested = self.profile.stack.pop()
+        elapsed = time.perf_counter() - start
+        phases = self.profile.phases
+        phases[name] = phases.get(name, 0.0) + elapsed - nested
+        if self.profile.stack:
+            self.profile.stack[-1][2] += elapsed
+        return False
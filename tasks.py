@@ -0,0 +1,71 @@
+import time
+
+# Seconds of work done per timer event, and timer interval
+TIME_SLICE = 0.1
+TIMER_STEP = 0.01
+
+# Events passed on while a task runs: viewing the scene only. Anything
+# else could delete or edit objects and meshes the steps still hold.
+VIEW_EVENTS = {
+    'MOUSEMOVE', 'INBETWEEN_MOUSEMOVE', 'MIDDLEMOUSE', 'WHEELUPMOUSE', 'WHEELDOWNMOUSE',
+    'TRACKPADPAN', 'TRACKPADZOOM', 'MOUSEROTATE', 'WINDOW_DEACTIVATE',
+}
+VIEW_PREFIXES = ('NDOF_', 'NUMPAD_')
+
+# Time-Sliced Operator Task
+# steps is a generator yielding (done, total) after every unit of work.
+# Without a window (background mode) or when not wanted it runs to the end
+# at once; otherwise the operator goes modal and runs it in slices from
+# timer events, with a progress bar, while Esc closes the generator. The
+# view can be moved meanwhile, but other input waits until it is done.
+def start(operator, context, steps, background=True):
+    if not background or context.window is None:
+        for done, total in steps:
+            pass
+        return {'FINISHED'}
+
+    wm = context.window_manager
+    operator._steps = steps
+    operator._timer = wm.event_timer_add(TIMER_STEP, context.window)
+    wm.progress_begin(0.0, 1.0)
+    wm.modal_handler_add(operator)
+    return {'RUNNING_MODAL'}
+
+# Operator.modal
+def step(operator, context, event):
+    if event.type == 'ESC':
+        operator._steps.close()
+        finish(operator, context)
+        operator.report({'WARNING'}, 'Export cancelled')
+        return {'CANCELLED'}
+    if event.type != 'TIMER':
+        if event.type in VIEW_EVENTS or event.type.startswith(VIEW_PREFIXES):
+            return {'PASS_THROUGH'}
+        return {'RUNNING_MODAL'}
+
+    try:
+        done, total = run_slice(operator._steps)
+        if total:
+            context.window_manager.progress_update(done / total)
+    except StopIteration:
+        finish(operator, context)
+        return {'FINISHED'}
+    except Exception as error:
+        finish(operator, context)
+        operator.report({'ERROR'}, 'Export failed: {}'.format(error))
+        return {'CANCELLED'}
+    return {'RUNNING_MODAL'}
+
+# Advance steps for one time slice (at least one step) and return the
+# last (done, total); StopIteration once the steps are done
+def run_slice(steps, seconds=TIME_SLICE):
+    deadline = time.perf_counter() + seconds
+    while True:
+        done, total = next(steps)
+        if time.perf_counter() >= deadline:
+            return done, total
+
+def finish(operator, context):
+    wm = context.window_manager
+    wm.event_timer_remove(operator._timer)
+    wm.progress_end()
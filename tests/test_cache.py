@@ -0,0 +1,47 @@
+# PCK block cache, without Blender:
+#   python -m pytest --rootdir=tests tests
+import os
+import sys
+import types
+import hashlib
+import importlib
+
+# Add-on modules as a package, without its __init__ (that one needs bpy)
+ADDON = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PACKAGE = 'ysfs_tests'
+if PACKAGE not in sys.modules:
+    package = types.ModuleType(PACKAGE)
+    package.__path__ = [ADDON]
+    sys.modules[PACKAGE] = package
+cache = importlib.import_module(PACKAGE + '.cache')
+
+def store(parts, key, text):
+    temp = parts.temp(key)
+    with open(temp, 'wb') as fp:
+        fp.write(text)
+    return parts.store(key, temp)
+
+def test_cache_hit_after_store(tmpdir):
+    parts = cache.Cache(os.path.join(str(tmpdir), 'model.dnm'))
+    key = parts.key(hashlib.sha1(b'part'))
+    assert key == parts.key(hashlib.sha1(b'part'))
+    assert parts.lookup(key) is None
+    path = store(parts, key, b'PCK "part" 1\n')
+    assert parts.lookup(key) == path
+    assert not os.path.exists(parts.temp(key))
+    assert parts.summary() == 'Cache: 1 hit, 1 miss'
+
+def test_evict_removes_entries_not_used(tmpdir):
+    filepath = os.path.join(str(tmpdir), 'model.dnm')
+    old = cache.Cache(filepath)
+    kept = old.key(hashlib.sha1(b'kept'))
+    gone = old.key(hashlib.sha1(b'gone'))
+    store(old, kept, b'kept')
+    store(old, gone, b'gone')
+    with open(old.temp('left'), 'wb'):
+        pass
+    # The next export only uses one of them
+    new = cache.Cache(filepath)
+    assert new.lookup(kept) is not None
+    assert new.evict() == 2
+    assert os.listdir(new.dir) == [kept + '.pck']
@@ -0,0 +1,61 @@
+# Chunk assignment and split, without Blender:
+#   python -m pytest --rootdir=tests tests
+import os
+import sys
+import types
+import importlib
+import numpy as np
+
+# Add-on modules as a package, without its __init__ (that one needs bpy)
+ADDON = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PACKAGE = 'ysfs_tests'
+if PACKAGE not in sys.modules:
+    package = types.ModuleType(PACKAGE)
+    package.__path__ = [ADDON]
+    sys.modules[PACKAGE] = package
+core = importlib.import_module(PACKAGE + '.core')
+chunks = importlib.import_module(PACKAGE + '.chunks')
+
+IDENTITY = np.identity(4, dtype=np.float32)
+
+def mesh(co, faces):
+    loop_total = np.array([len(face) for face in faces], dtype=np.int32)
+    loop_start = np.zeros(len(faces), dtype=np.int32)
+    np.cumsum(loop_total[:-1], out=loop_start[1:])
+    raw = core.Raw(np.array(co, dtype=np.float32), np.zeros((0, 2), dtype=np.int32), np.zeros(0, dtype=np.bool_),
+                   np.array([v for face in faces for v in face], dtype=np.int32), loop_start, loop_total,
+                   np.zeros(len(faces), dtype=np.bool_), np.zeros(len(faces), dtype=np.int32))
+    return core.mesh(raw, IDENTITY, None, None)
+
+# A row of unit squares along x, 10 units apart
+def squares(count):
+    co = []
+    faces = []
+    for i in range(count):
+        x = 10.0 * i
+        faces.append([len(co), len(co) + 1, len(co) + 2, len(co) + 3])
+        co += [(x, 0, 0), (x + 1, 0, 0), (x + 1, 1, 0), (x, 1, 0)]
+    return mesh(co, faces)
+
+def test_grid_puts_far_faces_apart():
+    part = squares(3)
+    assert chunks.grid(part, 5.0).tolist() == [0, 1, 2]
+    assert chunks.grid(part, 100.0).tolist() == [0, 0, 0]
+
+def test_octree_cells_hold_max_faces():
+    part = squares(8)
+    chunk = chunks.octree(part, 2)
+    assert np.bincount(chunk).max() <= 2
+    assert chunks.octree(part, 8).tolist() == [0] * 8
+
+def test_split_centers_every_chunk():
+    part = squares(3)
+    parts = chunks.split(part, np.array([1, 0, 1]))
+    assert len(parts) == 2
+    (center0, part0), (center1, part1) = parts
+    assert part0.face_total.tolist() == [4] and part1.face_total.tolist() == [4, 4]
+    assert len(part0.co) == 4 and len(part1.co) == 8
+    assert np.allclose(center0, (10.5, 0.5, 0)) and np.allclose(center1, (10.5, 0.5, 0))
+    # Same faces as before, only moved by the chunk center
+    assert np.allclose(part1.co[part1.face_verts[:4]] + center1, part.co[part.face_verts[:4]])
+    assert np.allclose(part0.median + center0, part.median[1])
@@ -0,0 +1,12 @@
+# Export paths against the reference exporters (a few cases of
+# benchmarks/golden.py, which checks many more), without Blender:
+#   python -m pytest --rootdir=tests tests
+import os
+import runpy
+
+ADDON = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+golden = runpy.run_path(os.path.join(ADDON, 'benchmarks', 'golden.py'))
+
+def test_golden_output(capsys):
+    assert golden['main'](['--cases', '10', '--jobs', '1']) == 0
+    assert capsys.readouterr().out.startswith('60 of 60 outputs match')
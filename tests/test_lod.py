@@ -0,0 +1,82 @@
+# LOD triangulation and simplification, without Blender:
+#   python -m pytest --rootdir=tests tests
+import os
+import sys
+import types
+import importlib
+import numpy as np
+
+# Add-on modules as a package, without its __init__ (that one needs bpy)
+ADDON = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PACKAGE = 'ysfs_tests'
+if PACKAGE not in sys.modules:
+    package = types.ModuleType(PACKAGE)
+    package.__path__ = [ADDON]
+    sys.modules[PACKAGE] = package
+core = importlib.import_module(PACKAGE + '.core')
+lod = importlib.import_module(PACKAGE + '.lod')
+
+def mesh(co, faces):
+    face_total = np.array([len(face) for face in faces], dtype=np.int32)
+    face_start = np.zeros(len(faces), dtype=np.int32)
+    np.cumsum(face_total[:-1], out=face_start[1:])
+    nfaces = len(faces)
+    return core.Mesh(np.array(co, dtype=np.float32), np.zeros(len(co), dtype=np.bool_), face_start, face_total,
+                     np.array([v for face in faces for v in face], dtype=np.int32),
+                     np.zeros((nfaces, 3), dtype=np.float32), np.zeros((nfaces, 3), dtype=np.float32),
+                     np.zeros(nfaces, dtype=np.int32), None)
+
+# Area vector of each triangle
+def areas(co, tris):
+    co = np.asarray(co, dtype=np.float64)
+    return 0.5 * np.cross(co[tris[:, 1]] - co[tris[:, 0]], co[tris[:, 2]] - co[tris[:, 0]])
+
+def test_concave_ngon_is_ear_clipped():
+    # L shape, reflex at its first corner: a fan from there overlaps
+    co = [(1, 0, 1), (1, 0, 2), (0, 0, 2), (0, 0, 0), (2, 0, 0), (2, 0, 1)]
+    part = mesh(co, [[0, 1, 2, 3, 4, 5]])
+    assert lod.concave(part) == [0]
+    tris, tri_face = lod.triangulate(part)
+    assert len(tris) == 4 and tri_face.tolist() == [0, 0, 0, 0]
+    area = areas(co, tris)
+    # Same winding as the polygon, and together exactly its area (3)
+    assert (area[:, 1] < 0).all()
+    assert np.isclose(np.abs(area[:, 1]).sum(), 3.0)
+
+def test_convex_faces_are_fanned():
+    co = [(0, 0, 0), (1, 0, 0), (2, 1, 0), (1, 2, 0), (0, 1, 0)]
+    part = mesh(co, [[0, 1, 2, 3, 4]])
+    assert lod.concave(part) == []
+    tris, tri_face = lod.triangulate(part)
+    assert tris.tolist() == [[0, 1, 2], [0, 2, 3], [0, 3, 4]]
+
+# Closed UV sphere: no border, so nothing is locked
+def sphere(rings=12, segments=24):
+    co = [(0, 0, 1), (0, 0, -1)]
+    for i in range(1, rings):
+        theta = np.pi * i / rings
+        for j in range(segments):
+            phi = 2 * np.pi * j / segments
+            co.append((np.sin(theta) * np.cos(phi), np.sin(theta) * np.sin(phi), np.cos(theta)))
+    def ring(i, j):
+        return 2 + (i - 1) * segments + j % segments
+    faces = [[0, ring(1, j + 1), ring(1, j)] for j in range(segments)]
+    for i in range(1, rings - 1):
+        faces += [[ring(i, j), ring(i, j + 1), ring(i + 1, j + 1), ring(i + 1, j)] for j in range(segments)]
+    faces += [[1, ring(rings - 1, j), ring(rings - 1, j + 1)] for j in range(segments)]
+    return mesh(co, faces)
+
+def test_lod_face_count():
+    part = sphere()
+    ntris = len(lod.triangulate(part)[0])
+    half = lod.simplify(part, 0.5)
+    quarter = lod.simplify(half, 0.5)
+    assert len(half.face_total) <= ntris // 2
+    assert len(quarter.face_total) <= ntris // 4
+    assert (half.face_total == 3).all()
+    # Every vertex left is used by a face
+    assert np.array_equal(np.unique(quarter.face_verts), np.arange(len(quarter.co)))
+
+def test_full_ratio_keeps_the_mesh():
+    part = sphere()
+    assert lod.simplify(part, 1.0) is part
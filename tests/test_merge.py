@@ -0,0 +1,62 @@
+# Coplanar face merger, without Blender:
+#   python -m pytest --rootdir=tests tests
+import os
+import sys
+import types
+import importlib
+import numpy as np
+
+# Add-on modules as a package, without its __init__ (that one needs bpy)
+ADDON = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PACKAGE = 'ysfs_tests'
+if PACKAGE not in sys.modules:
+    package = types.ModuleType(PACKAGE)
+    package.__path__ = [ADDON]
+    sys.modules[PACKAGE] = package
+core = importlib.import_module(PACKAGE + '.core')
+
+IDENTITY = np.identity(4, dtype=np.float32)
+
+def mesh(co, faces, material_index=None):
+    loop_total = np.array([len(face) for face in faces], dtype=np.int32)
+    loop_start = np.zeros(len(faces), dtype=np.int32)
+    np.cumsum(loop_total[:-1], out=loop_start[1:])
+    if material_index is None:
+        material_index = [0] * len(faces)
+    raw = core.Raw(np.array(co, dtype=np.float32), np.zeros((0, 2), dtype=np.int32), np.zeros(0, dtype=np.bool_),
+                   np.array([v for face in faces for v in face], dtype=np.int32), loop_start, loop_total,
+                   np.zeros(len(faces), dtype=np.bool_), np.array(material_index, dtype=np.int32))
+    return core.mesh(raw, IDENTITY, None, None)
+
+def faces(mesh):
+    return [mesh.face_verts[s:s + t].tolist() for s, t in zip(mesh.face_start, mesh.face_total)]
+
+# L shape of three unit squares, each split in two triangles
+L_CO = [(0, 0, 0), (1, 0, 0), (2, 0, 0), (0, 1, 0), (1, 1, 0), (2, 1, 0), (0, 2, 0), (1, 2, 0)]
+L_FACES = [[0, 1, 4], [0, 4, 3], [1, 2, 5], [1, 5, 4], [3, 4, 7], [3, 7, 6]]
+
+def test_merge_keeps_convexity():
+    part = mesh(L_CO, L_FACES)
+    merger = core.Merger()
+    merged = merger.apply(part)
+    # The L itself is concave, so it takes two convex polygons at least
+    assert 2 <= len(merged.face_total) < len(part.face_total)
+    assert merger.faces == 6 and merger.polygons == len(merged.face_total)
+    points = merged.co.astype(np.float64).tolist()
+    for face, normal in zip(faces(merged), merged.normal.tolist()):
+        assert all(core.turns(face, i, points, normal) for i in range(len(face)))
+    assert np.isclose(np.abs(merged.normal[:, 2]), 1.0).all()
+
+def test_materials_are_not_merged():
+    part = mesh(L_CO, L_FACES, [0, 0, 1, 1, 0, 0])
+    merged = core.Merger().apply(part)
+    # The two squares of material 0 form a rectangle, the other stays apart
+    assert merged.material_index.tolist() == [0, 1]
+    assert merged.face_total.tolist() == [6, 4]
+
+def test_unmergeable_mesh_is_kept():
+    # Two triangles folded along their shared edge
+    part = mesh([(0, 0, 0), (1, 0, 0), (0, 1, 0), (1, 1, 1)], [[0, 1, 2], [1, 3, 2]])
+    merger = core.Merger()
+    assert merger.apply(part) is part
+    assert merger.summary() == 'Merged 0 faces into 0 polygons'
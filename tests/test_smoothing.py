@@ -0,0 +1,83 @@
+# Import -> export round trip of R (smooth) vertexs, without Blender:
+#   python -m pytest --rootdir=tests tests
+import os
+import sys
+import types
+import importlib
+import numpy as np
+
+# Add-on modules as a package, without its __init__ (that one needs bpy)
+ADDON = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PACKAGE = 'ysfs_tests'
+if PACKAGE not in sys.modules:
+    package = types.ModuleType(PACKAGE)
+    package.__path__ = [ADDON]
+    sys.modules[PACKAGE] = package
+core = importlib.import_module(PACKAGE + '.core')
+reader = importlib.import_module(PACKAGE + '.reader')
+
+IDENTITY = np.identity(4, dtype=np.float32)
+
+# Edges of the faces (what Blender's calc_edges makes)
+def edges(faces):
+    pairs = set()
+    for face in faces:
+        for i in range(len(face)):
+            pairs.add(tuple(sorted((face[i - 1], face[i]))))
+    return np.array(sorted(pairs), dtype=np.int32).reshape(-1, 2)
+
+def raw(co, faces, face_smooth, edge_sharp):
+    loop_total = np.array([len(face) for face in faces], dtype=np.int32)
+    loop_start = np.zeros(len(faces), dtype=np.int32)
+    np.cumsum(loop_total[:-1], out=loop_start[1:])
+    return core.Raw(np.array(co, dtype=np.float32), edges(faces), np.asarray(edge_sharp, dtype=np.bool_),
+                    np.array([v for face in faces for v in face], dtype=np.int32), loop_start, loop_total,
+                    np.asarray(face_smooth, dtype=np.bool_), np.zeros(len(faces), dtype=np.int32))
+
+# SRF text -> Blender flags from the importer -> SRF text (medians and
+# normals come from 4 decimal coordinates, so only V records compare)
+def round_trip(text):
+    surf = reader.parse(text.encode('ascii'))
+    faces = [surf.face_verts[s:s + t].tolist() for s, t in zip(surf.face_start, surf.face_total)]
+    edge_verts = edges(faces)
+    face_smooth, edge_sharp = reader.smoothing(surf.smooth, surf.face_start, surf.face_verts, edge_verts)
+    again = core.mesh(raw(surf.co, faces, face_smooth, edge_sharp), IDENTITY, None, None)
+    return core.srf(again)
+
+# Closed fan: apex 0, ring 1..n, base polygon under the ring
+def fan(n=6):
+    co = [(0.0, 0.0, 1.0)] + [(np.cos(a), np.sin(a), 0.0) for a in np.arange(n) * (2.0 * np.pi / n)]
+    faces = [[0, 1 + i, 1 + (i + 1) % n] for i in range(n)] + [list(range(n, 0, -1))]
+    return co, faces
+
+# V records of the vertex table ('V x y z [R]')
+def vertex_lines(text):
+    return [line for line in text.splitlines() if line.startswith('V ') and '.' in line]
+
+def smooth_flags(text):
+    return [line.endswith('R') for line in vertex_lines(text)]
+
+# Hard apex over a smooth ring: every neighbour of the apex is R
+def test_hard_vertex_among_smooth_neighbours():
+    co, faces = fan()
+    sides = len(faces) - 1
+    text = core.srf(core.mesh(raw(co, faces, [False] * sides + [True], [False] * len(edges(faces))), IDENTITY, None, None))
+    assert smooth_flags(text) == [False] + [True] * sides
+    assert vertex_lines(round_trip(text)) == vertex_lines(text)
+
+# Smooth apex over a ring with a hard pair (sharp edge between them)
+def test_mixed_fan():
+    co, faces = fan()
+    edge_verts = edges(faces)
+    sharp = [tuple(edge) == (1, 2) for edge in edge_verts.tolist()]
+    text = core.srf(core.mesh(raw(co, faces, [True] * len(faces), sharp), IDENTITY, None, None))
+    assert smooth_flags(text) == [True, False, False, True, True, True, True]
+    assert vertex_lines(round_trip(text)) == vertex_lines(text)
+
+# Everything smooth, and everything flat
+def test_uniform_fans():
+    co, faces = fan()
+    for smooth in (True, False):
+        text = core.srf(core.mesh(raw(co, faces, [smooth] * len(faces), [False] * len(edges(faces))), IDENTITY, None, None))
+        assert smooth_flags(text) == [smooth] * len(co)
+        assert vertex_lines(round_trip(text)) == vertex_lines(text)
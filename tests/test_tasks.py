@@ -0,0 +1,112 @@
+# Time-sliced operator tasks, without Blender:
+#   python -m pytest --rootdir=tests tests
+import os
+import sys
+import types
+import importlib
+import pytest
+
+# Add-on modules as a package, without its __init__ (that one needs bpy)
+ADDON = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PACKAGE = 'ysfs_tests'
+if PACKAGE not in sys.modules:
+    package = types.ModuleType(PACKAGE)
+    package.__path__ = [ADDON]
+    sys.modules[PACKAGE] = package
+tasks = importlib.import_module(PACKAGE + '.tasks')
+
+# Window manager, context and operator as far as tasks uses them
+class WindowManager:
+    def __init__(self):
+        self.timers = 0
+        self.progress = []
+
+    def event_timer_add(self, step, window):
+        self.timers += 1
+        return 'timer'
+
+    def event_timer_remove(self, timer):
+        self.timers -= 1
+
+    def modal_handler_add(self, operator):
+        pass
+
+    def progress_begin(self, low, high):
+        pass
+
+    def progress_update(self, value):
+        self.progress.append(value)
+
+    def progress_end(self):
+        pass
+
+class Operator:
+    def __init__(self):
+        self.reports = []
+
+    def report(self, kind, message):
+        self.reports.append((kind.pop(), message))
+
+def event(kind):
+    return types.SimpleNamespace(type=kind)
+
+def context():
+    return types.SimpleNamespace(window='window', window_manager=WindowManager())
+
+def steps(total, fail_at=None):
+    for i in range(total):
+        if i == fail_at:
+            raise ValueError('part {:d} is broken'.format(i))
+        yield i + 1, total
+
+def test_run_slice_does_one_step_at_least():
+    work = steps(3)
+    assert tasks.run_slice(work, seconds=0.0) == (1, 3)
+    assert tasks.run_slice(work, seconds=0.0) == (2, 3)
+
+def test_run_slice_raises_what_the_steps_raise():
+    work = steps(5, fail_at=2)
+    assert tasks.run_slice(work, seconds=0.0) == (1, 5)
+    assert tasks.run_slice(work, seconds=0.0) == (2, 5)
+    with pytest.raises(ValueError):
+        tasks.run_slice(work, seconds=0.0)
+    with pytest.raises(StopIteration):
+        tasks.run_slice(work, seconds=0.0)
+
+def test_failing_steps_cancel_the_operator():
+    operator, ctx = Operator(), context()
+    assert tasks.start(operator, ctx, steps(1000, fail_at=500)) == {'RUNNING_MODAL'}
+    result = {'RUNNING_MODAL'}
+    while result == {'RUNNING_MODAL'}:
+        result = tasks.step(operator, ctx, event('TIMER'))
+    assert result == {'CANCELLED'}
+    assert operator.reports == [('ERROR', 'Export failed: part 500 is broken')]
+    assert ctx.window_manager.timers == 0
+
+def test_finished_steps():
+    operator, ctx = Operator(), context()
+    tasks.start(operator, ctx, steps(3))
+    assert tasks.step(operator, ctx, event('TIMER')) == {'FINISHED'}
+    assert ctx.window_manager.timers == 0
+
+def test_escape_closes_the_steps():
+    operator, ctx = Operator(), context()
+    work = steps(3)
+    tasks.start(operator, ctx, work)
+    assert tasks.step(operator, ctx, event('ESC')) == {'CANCELLED'}
+    assert operator.reports == [('WARNING', 'Export cancelled')]
+    with pytest.raises(StopIteration):
+        next(work)
+
+def test_only_view_events_pass_through():
+    operator, ctx = Operator(), context()
+    tasks.start(operator, ctx, steps(3))
+    for kind in ('MOUSEMOVE', 'WHEELUPMOUSE', 'MIDDLEMOUSE', 'NUMPAD_1', 'NDOF_MOTION'):
+        assert tasks.step(operator, ctx, event(kind)) == {'PASS_THROUGH'}
+    for kind in ('X', 'DEL', 'LEFTMOUSE', 'RIGHTMOUSE', 'TAB', 'G'):
+        assert tasks.step(operator, ctx, event(kind)) == {'RUNNING_MODAL'}
+
+def test_without_window_runs_at_once():
+    operator, ctx = Operator(), context()
+    ctx.window = None
+    assert tasks.start(operator, ctx, steps(3)) == {'FINISHED'}
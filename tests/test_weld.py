@@ -0,0 +1,59 @@
+# Vertex welder, without Blender:
+#   python -m pytest --rootdir=tests tests
+import os
+import sys
+import types
+import importlib
+import numpy as np
+
+# Add-on modules as a package, without its __init__ (that one needs bpy)
+ADDON = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PACKAGE = 'ysfs_tests'
+if PACKAGE not in sys.modules:
+    package = types.ModuleType(PACKAGE)
+    package.__path__ = [ADDON]
+    sys.modules[PACKAGE] = package
+core = importlib.import_module(PACKAGE + '.core')
+
+IDENTITY = np.identity(4, dtype=np.float32)
+
+def mesh(co, faces, materials=None):
+    loop_total = np.array([len(face) for face in faces], dtype=np.int32)
+    loop_start = np.zeros(len(faces), dtype=np.int32)
+    np.cumsum(loop_total[:-1], out=loop_start[1:])
+    raw = core.Raw(np.array(co, dtype=np.float32), np.zeros((0, 2), dtype=np.int32), np.zeros(0, dtype=np.bool_),
+                   np.array([v for face in faces for v in face], dtype=np.int32), loop_start, loop_total,
+                   np.zeros(len(faces), dtype=np.bool_), np.zeros(len(faces), dtype=np.int32))
+    return core.mesh(raw, IDENTITY, None, materials)
+
+def faces(mesh):
+    return [mesh.face_verts[s:s + t].tolist() for s, t in zip(mesh.face_start, mesh.face_total)]
+
+def test_weld_then_count():
+    # Two triangles sharing an edge, stored with their own vertexs
+    part = mesh([(0, 0, 0), (1, 0, 0), (0, 1, 0), (1, 0, 0), (1, 1, 0), (0, 1, 0)], [[0, 1, 2], [3, 4, 5]])
+    welder = core.Welder()
+    welded = welder.apply(part)
+    assert len(welded.co) == 4
+    assert faces(welded) == [[0, 1, 2], [1, 3, 2]]
+    assert welder.vertices == 2 and welder.faces == 0
+    assert welder.bytes == len(core.srf(part)) - len(core.srf(welded))
+
+def test_unchanged_mesh_is_kept():
+    part = mesh([(0, 0, 0), (1, 0, 0), (0, 1, 0)], [[0, 1, 2]])
+    welder = core.Welder()
+    assert welder.apply(part) is part
+    assert welder.summary() == 'Welded 0 vertexs, dropped 0 faces, 0 bytes saved'
+
+def test_collapsed_corners_and_faces_are_dropped():
+    co = [(0, 0, 0), (1, 0, 0), (1, 1, 0), (1.00001, 1, 0), (0, 1, 0), (5, 5, 5), (5.00002, 5, 5), (6, 5, 5)]
+    part = mesh(co, [[0, 1, 2, 3, 4], [5, 6, 7], [0, 1, 4]], [((255.0, 0.0, 0.0), False, 0.5)])
+    welder = core.Welder()
+    welded = welder.apply(part)
+    # The pentagon is a quad, the sliver and its vertexs are gone
+    assert faces(welded) == [[0, 1, 2, 3], [0, 1, 3]]
+    assert len(welded.co) == 4
+    assert welder.faces == 1
+    assert welder.bytes == len(core.srf(part)) - len(core.srf(welded))
+    for face in faces(welded):
+        assert len(set(face)) == len(face) >= 3
@@ -0,0 +1,57 @@
+# Buffered writer, without Blender:
+#   python -m pytest --rootdir=tests tests
+import io
+import os
+import sys
+import types
+import importlib
+
+# Add-on modules as a package, without its __init__ (that one needs bpy)
+ADDON = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PACKAGE = 'ysfs_tests'
+if PACKAGE not in sys.modules:
+    package = types.ModuleType(PACKAGE)
+    package.__path__ = [ADDON]
+    sys.modules[PACKAGE] = package
+writer = importlib.import_module(PACKAGE + '.writer')
+
+def test_tell_counts_bytes_of_non_ascii_names():
+    fp = io.BytesIO()
+    out = writer.Writer(fp)
+    out.write('PCK "Flügel.srf" 3\n')
+    size = out.tell()
+    out.flush()
+    assert size == out.tell() == len(fp.getvalue()) == len('PCK "Flügel.srf" 3\n'.encode('utf-8'))
+
+def test_chunks_are_flushed_by_size():
+    fp = io.BytesIO()
+    out = writer.Writer(fp, chunk_size=8)
+    out.write('ééé')
+    assert fp.getvalue() == b''
+    out.write('é')
+    assert fp.getvalue() == 'éééé'.encode('utf-8')
+    assert out.tell() == 8
+
+def test_append_copies_and_counts(tmpdir):
+    path = os.path.join(str(tmpdir), 'part.pck')
+    with open(path, 'wb') as fp:
+        fp.write('PCK "Flügel.srf" 1\n'.encode('utf-8'))
+    fp = io.BytesIO()
+    out = writer.Writer(fp)
+    out.write('DNMVER 1\n')
+    out.append(path)
+    out.write('END\n')
+    assert out.tell() == 9 + os.path.getsize(path) + 4
+    out.flush()
+    assert fp.getvalue() == 'DNMVER 1\nPCK "Flügel.srf" 1\nEND\n'.encode('utf-8')
+
+def test_save_if_changed(tmpdir):
+    path = os.path.join(str(tmpdir), 'model.dnm')
+    assert writer.save_if_changed(path, b'DNMVER 1\n')
+    mtime = os.stat(path).st_mtime_ns
+    assert not writer.save_if_changed(path, b'DNMVER 1\n')
+    assert os.stat(path).st_mtime_ns == mtime
+    assert writer.save_if_changed(path, b'DNMVER 2\n')
+    with open(path, 'rb') as fp:
+        assert fp.read() == b'DNMVER 2\n'
+    assert os.listdir(str(tmpdir)) == ['model.dnm']
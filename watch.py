@@ -0,0 +1,151 @@
+import os
+import time
+import bpy
+from bpy.props import StringProperty
+from bpy.app.handlers import persistent
+from . import tasks, export_dnm
+
+# Seconds without edits before exporting, and timer interval
+DELAY = 1.0
+TIMER_STEP = 0.25
+
+# Watch State
+# generation counts edits of scene objects and materials; exported is
+# the generation the file on disk was written from. handler is the token
+# of the current modal handler: one left over from a quick Stop and start
+# again sees a newer token and ends.
+class State:
+    def __init__(self):
+        self.running = False
+        self.handler = 0
+        self.generation = 0
+        self.changed = 0.0
+        self.exported = -1
+
+state = State()
+
+# Settings of a watched export (ExportDNM without the operator)
+# The options Export DNM was last run with (its defaults before that),
+# except that parts always come from the PCK cache unless their geometry,
+# transform or materials changed, so an edit costs about the size of the
+# edited parts.
+class Export:
+    def __init__(self, filepath, settings):
+        for prop in settings.bl_rna.properties:
+            if not prop.is_readonly:
+                setattr(self, prop.identifier, getattr(settings, prop.identifier))
+        self.use_cache = True
+        self.filepath = filepath
+        self.messages = []
+
+    def report(self, kind, message):
+        self.messages.append(message)
+
+    steps = export_dnm.ExportDNM.steps
+    pck_parallel = export_dnm.ExportDNM.pck_parallel
+
+# Count edits (the export itself only adds and removes temporary meshes)
+@persistent
+def scene_update(scene):
+    if not state.running:
+        return
+    changed = bpy.data.materials.is_updated
+    if not changed and bpy.data.objects.is_updated:
+        changed = any(obj.is_updated or obj.is_updated_data for obj in scene.objects)
+    if changed:
+        state.generation += 1
+        state.changed = time.perf_counter()
+
+# Modal operators end with the file they run in
+@persistent
+def reset(dummy):
+    state.running = False
+
+# Watch Toggle
+# Re-exports the DNM a moment after the last edit, in time slices, while
+# Blender stays usable. Running it again stops watching.
+class WatchDNM(bpy.types.Operator):
+    bl_idname = 'export_model.dnm_watch'
+    bl_label = 'Auto Export DNM'
+    bl_description = 'Export the DNM again whenever the scene changes (click again to stop)'
+
+    def invoke(self, context, event):
+        if state.running:
+            state.running = False
+            return {'FINISHED'}
+        filepath = bpy.path.abspath(context.scene.ysfs_watch_path)
+        if not filepath or os.path.isdir(filepath):
+            self.report({'ERROR'}, 'Set the DNM file to export to first')
+            return {'CANCELLED'}
+        if not filepath.lower().endswith('.dnm'):
+            filepath += '.dnm'
+
+        self._filepath = filepath
+        self._export = None
+        self._steps = None
+        state.running = True
+        state.handler += 1
+        self._handler = state.handler
+        state.exported = -1
+        wm = context.window_manager
+        self._timer = wm.event_timer_add(TIMER_STEP, context.window)
+        wm.modal_handler_add(self)
+        return {'RUNNING_MODAL'}
+
+    def modal(self, context, event):
+        if not state.running or self._handler != state.handler:
+            if self._steps is not None:
+                self._steps.close()
+            context.window_manager.event_timer_remove(self._timer)
+            self.report({'INFO'}, 'Auto export stopped')
+            return {'CANCELLED'}
+        if event.type != 'TIMER':
+            return {'PASS_THROUGH'}
+
+        # Wait for a quiet moment after the latest edit
+        if self._steps is None:
+            if state.exported == state.generation or time.perf_counter() - state.changed < DELAY:
+                return {'PASS_THROUGH'}
+            self._generation = state.generation
+            settings = context.window_manager.operator_properties_last(export_dnm.ExportDNM.bl_idname)
+            self._export = Export(self._filepath, settings)
+            self._steps = self._export.steps(context.scene)
+
+        try:
+            tasks.run_slice(self._steps)
+        except StopIteration:
+            # Edits made meanwhile bumped the generation: export again
+            self._steps = None
+            state.exported = self._generation
+            self.report({'INFO'}, 'Auto exported {} ({})'.format(
+                os.path.basename(self._filepath), '; '.join(self._export.messages)))
+        except Exception as error:
+            self._steps = None
+            state.exported = self._generation
+            self.report({'ERROR'}, 'Auto export failed: {}'.format(error))
+        return {'PASS_THROUGH'}
+
+HANDLERS = (
+    (bpy.app.handlers.scene_update_post, scene_update),
+    (bpy.app.handlers.load_pre, reset),
+)
+
+# Regist
+def register():
+    bpy.types.Scene.ysfs_watch_path = StringProperty(
+        name = 'Auto Export File',
+        description = 'DNM file Auto Export writes',
+        subtype = 'FILE_PATH',
+        default = '',
+    )
+    for handlers, handler in HANDLERS:
+        if handler not in handlers:
+            handlers.append(handler)
+
+# Unregist
+def unregister():
+    state.running = False
+    for handlers, handler in HANDLERS:
+        if handler in handlers:
+            handlers.remove(handler)
+    del bpy.types.Scene.ysfs_watch_path
@@ -0,0 +1,17 @@
+# ==============================
+# Worker Package
+# ==============================
+# Run by path (runpy.run_path) in Blender and in every worker process.
+# Makes the bpy-free modules of this folder importable as the package
+# PACKAGE, so workers never import the add-on's __init__, which needs
+# bpy. Imports nothing from the add-on itself.
+import os
+import sys
+import types
+
+PACKAGE = 'ysfs_worker'
+
+if PACKAGE not in sys.modules:
+    package = types.ModuleType(PACKAGE)
+    package.__path__ = [os.path.dirname(os.path.abspath(__file__))]
+    sys.modules[PACKAGE] = package
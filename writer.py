@@ -0,0 +1,72 @@
+import os
+import shutil
+import hashlib
+
+# Flush to disk every 1 MiB of output
+CHUNK_SIZE = 1 << 20
+
+# Buffered Writer
+# Collects records, encoded as UTF-8 (names may be non-ASCII), and writes
+# them to a binary file handle in large chunks.
+# Disk writes are timed as the 'write' phase of an optional stats.Profile.
+class Writer:
+    def __init__(self, fp, chunk_size=CHUNK_SIZE, profile=None):
+        self.fp = fp
+        self.chunk_size = chunk_size
+        self.profile = profile
+        self.buffer = []
+        self.size = 0
+        self.written = 0
+
+    def write(self, text):
+        data = text.encode('utf-8')
+        self.buffer.append(data)
+        self.size += len(data)
+        if self.size >= self.chunk_size:
+            self.flush()
+
+    def flush(self):
+        if self.buffer:
+            data = b''.join(self.buffer)
+            if self.profile is None:
+                self.fp.write(data)
+            else:
+                with self.profile.phase('write'):
+                    self.fp.write(data)
+            self.written += len(data)
+            self.buffer = []
+            self.size = 0
+
+    # Bytes written so far, including the buffer
+    def tell(self):
+        return self.written + self.size
+
+    # Copy an already formatted file
+    def append(self, path):
+        self.flush()
+        with open(path, 'rb') as src:
+            if self.profile is None:
+                shutil.copyfileobj(src, self.fp, self.chunk_size)
+            else:
+                with self.profile.phase('write'):
+                    shutil.copyfileobj(src, self.fp, self.chunk_size)
+            self.written += src.tell()
+
+# SHA-1 of a file on disk
+def file_hash(path, chunk_size=CHUNK_SIZE):
+    h = hashlib.sha1()
+    with open(path, 'rb') as fp:
+        for chunk in iter(lambda: fp.read(chunk_size), b''):
+            h.update(chunk)
+    return h.digest()
+
+# Save a file, unless the same content is already on disk
+def save_if_changed(path, data):
+    path = os.fsencode(path)
+    if os.path.exists(path) and file_hash(path) == hashlib.sha1(data).digest():
+        return False
+    temp = path + b'.tmp'
+    with open(temp, 'wb') as fp:
+        fp.write(data)
+    os.replace(temp, path)
+    return True